@@ -1,120 +1,603 @@
 from specification import *
+from collections import deque
+from array import array
+from bisect import insort
+from functools import partial
 import heapq
+import json
+import random
+import sys
+import threading
+import time
 
-def UCS_ghost(graph, start_pos, target_pos):
-    """UCS algorithm for finding optimal path from ghost to player
-    
-    Uses priority queue to explore nodes in order of increasing cost.
-    Considers haunted points effect on movement costs.
+# Frontier disciplines understood by _search
+FIFO_FRONTIER = 'fifo'
+LIFO_FRONTIER = 'lifo'
+COST_FRONTIER = 'cost'
+BUCKET_FRONTIER = 'bucket'     # Cost ordered, Dial's bucket queue instead of a heap
+
+# Rank of each direction index when directions are compared as tuples
+DIRECTION_RANK = [sorted(DIRECTIONS).index(direction) for direction in DIRECTIONS]
+
+
+def step_cost(prev_dir, curr_dir):
+    """Weight of a single move given the previous and the new direction"""
+    if prev_dir == curr_dir:
+        return STRAIGHT
+    if prev_dir[0] == -curr_dir[0] and prev_dir[1] == -curr_dir[1]:
+        return BACK
+    return TURN
+
+
+class BucketQueue:
+    """Dial's circular bucket queue for small non negative integer priorities
+
+    Entries are tuples whose first item is the priority. Priorities pushed
+    must lie in [current, current + span], where current is the priority
+    being drained, so span + 1 buckets are reused circularly. Iterating the
+    queue pops every entry in the order heapq would give: a bucket is sorted
+    once when it is reached, and entries pushed to the bucket being drained
+    are inserted in order after the entries already read.
     """
-    # Make a copy of haunted points to prevent affecting other algorithms
-    original_haunted_points = set(graph.haunted_points)
-    
-    # Initialize priority queue with all possible starting directions
-    frontier = []
-    for direction in DIRECTIONS:
-        heapq.heappush(frontier, (0, start_pos, direction, [start_pos]))
-    
-    # Keep track of visited states and costs
-    visited = set()
-    cost_so_far = {(start_pos, direction): 0 for direction in DIRECTIONS}
-    haunted_steps = {(start_pos, direction): 0 for direction in DIRECTIONS}
-    
+
+    def __init__(self, span, start_priority=0):
+        self.buckets = [[] for _ in range(span + 1)]
+        self.current = start_priority
+        self.draining = False       # Current bucket sorted and being read
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry):
+        priority = entry[0]
+        bucket = self.buckets[priority % len(self.buckets)]
+        if priority == self.current and self.draining:
+            # Entries already read sort before it, insort lands after them
+            insort(bucket, entry)
+        else:
+            bucket.append(entry)
+        self.size += 1
+
+    def __iter__(self):
+        buckets = self.buckets
+        while self.size:
+            bucket = buckets[self.current % len(buckets)]
+            if bucket:
+                bucket.sort()
+                self.draining = True
+                yield from bucket   # List iterator also sees entries inserted later
+                self.draining = False
+                self.size -= len(bucket)
+                bucket.clear()
+            self.current += 1
+
+
+class SearchStats:
+    """Counters of one search, filled in when passed as stats= to a search
+
+    Only an instrumented search wraps its frontier to count pushes and pops
+    (and to feed the trace), so searches run without stats pay nothing.
+    """
+
+    def __init__(self, trace=None):
+        self.expanded = 0           # States popped for the first time
+        self.pushes = 0
+        self.pops = 0
+        self.duplicate_pops = 0     # Pops of states already expanded
+        self.peak_frontier = 0
+        self.path_length = 0        # Cells of the path found, start included
+        self.elapsed_ns = 0
+        self.trace = trace          # ExpansionTrace receiving sampled pops
+        self.query = None
+
+    def begin(self, start_pos, target_pos):
+        self.start_pos, self.target_pos = start_pos, target_pos
+        if self.trace is not None:
+            self.query = self.trace.next_query()
+        self._start_ns = time.perf_counter_ns()
+
+    def finish(self, expanded, path):
+        self.elapsed_ns = time.perf_counter_ns() - self._start_ns
+        self.expanded = expanded
+        self.duplicate_pops = max(self.pops - expanded, 0)
+        self.path_length = len(path) if path else 0
+        if self.trace is not None:
+            self.trace.write({'query': self.query, 'start': self.start_pos, 'target': self.target_pos,
+                              **self.snapshot()})
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in SEARCH_STATS_FIELDS}
+
+    def pushed(self, count=1):
+        self.pushes += count
+        size = self.pushes - self.pops
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def counting_push(self, push):
+        def counted_push(entry):
+            push(entry)
+            self.pushed()
+        return counted_push
+
+    def counting_pops(self, entries, fields):
+        """Count the pops of entries; every trace.sample_every-th pop is traced with its fields"""
+        if self.trace is None:
+            for entry in entries:
+                self.pops += 1
+                yield entry
+            return
+        trace, every = self.trace, self.trace.sample_every
+        for entry in entries:
+            self.pops += 1
+            if self.pops % every == 0:
+                trace.write({'query': self.query, 'pop': self.pops, **dict(zip(fields, entry))})
+            yield entry
+
+
+# Counters of a finished search, in the order they are reported
+SEARCH_STATS_FIELDS = ('expanded', 'pushes', 'pops', 'duplicate_pops', 'peak_frontier', 'path_length', 'elapsed_ns')
+
+
+class ExpansionTrace:
+    """JSONL sink of sampled frontier pops, shared by any number of searches
+
+    Each sampled pop is one line with the query number, the pop number and
+    the fields of the frontier entry; each finished search adds a summary
+    line with its start, target and counters.
+    """
+
+    def __init__(self, path, sample_every=SEARCH_TRACE_SAMPLE):
+        self.file = open(path, 'w')
+        self.sample_every = sample_every
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def next_query(self):
+        with self.lock:
+            self.queries += 1
+            return self.queries
+
+    def write(self, record):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class _CountingDeque(deque):
+    """FIFO / LIFO frontier reporting its appends to a SearchStats"""
+
+    def __init__(self, entries, stats):
+        super().__init__(entries)
+        self.stats = stats
+        stats.pushed(len(self))
+
+    def append(self, entry):
+        super().append(entry)
+        self.stats.pushed()
+
+
+def _drain(frontier, pop):
+    """Pop entries from a heap or deque frontier until it is empty"""
     while frontier:
-        # Get state with lowest cost from priority queue
-        total_cost, current_pos, prev_direction, path = heapq.heappop(frontier)
-        
+        yield pop()
+
+
+def _frontier_span(heuristic):
+    """Largest priority increase of a single push
+
+    A move adds at most the largest weight to g; a consistent heuristic like
+    get_heuristic may also grow by up to STRAIGHT per move.
+    """
+    largest = max(STRAIGHT, TURN, BACK)
+    return largest if heuristic is None else largest + STRAIGHT
+
+
+def _rebuild_path(closed, state):
+    """Walk parent pointers back from state and return the list of positions"""
+    path = []
+    while state is not None:
+        path.append(state[0])
+        state = closed[state][0]
+    path.reverse()
+    return path
+
+
+# Field names of the frontier entries of each search core, used by the trace
+COST_ENTRY_FIELDS = ('f', 'g', 'tie', 'pos', 'dir', 'parent')
+ENTRY_FIELDS = ('pos', 'dir', 'parent')
+COMPACT_COST_ENTRY_FIELDS = ('f', 'g', 'tie', 'state', 'parent')
+COMPACT_ENTRY_FIELDS = ('state', 'parent')
+EXACT_ENTRY_FIELDS = ('f', 'g', 'state', 'parent')
+
+
+def _search(graph, start_pos, target_pos, frontier_type, heuristic=None, stats=None):
+    """Shared search core used by UCS, BFS, DFS and A*
+
+    Every frontier entry only references its parent state instead of carrying
+    a copy of the whole path. When a state is popped for the first time its
+    parent pointer is frozen in `closed` together with the path cost, which is
+    accumulated with the same rules as calculate_path_cost. The path itself is
+    rebuilt once, when the target is reached.
+
+    closed maps (pos, direction) -> (parent_state, path_cost, haunted_remaining)
+    """
+    # Array backed graphs (CompactMapGraph) use integer states
+    if hasattr(graph, 'offsets'):
+        return _search_compact(graph, start_pos, target_pos, frontier_type, heuristic, stats)
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+
+    haunted_points = graph.haunted_points
+    edges = graph.graph
+    closed = {}
+
+    # Cost ordered searches keep the per state haunted counter used to weight
+    # the edges, exactly like the original UCS and A* implementations
+    cost_ordered = frontier_type in (COST_FRONTIER, BUCKET_FRONTIER)
+    if cost_ordered:
+        if frontier_type == BUCKET_FRONTIER:
+            start_priority = 0 if heuristic is None else heuristic(start_pos)
+            frontier = BucketQueue(_frontier_span(heuristic), start_priority)
+            push, entries = frontier.push, iter(frontier)
+        else:
+            frontier = []
+            push = partial(heapq.heappush, frontier)
+            entries = _drain(frontier, partial(heapq.heappop, frontier))
+        if stats is not None:
+            push, entries = stats.counting_push(push), stats.counting_pops(entries, COST_ENTRY_FIELDS)
+        cost_so_far = {}
+        haunted_steps = {}
+        counter = 0
+        for direction in DIRECTIONS:
+            state = (start_pos, direction)
+            cost_so_far[state] = 0
+            haunted_steps[state] = 0
+            if heuristic is None:
+                # (cost, pos, direction) ordering, ties resolved like the original UCS
+                entry = (0, 0, 0, start_pos, direction, None)
+            else:
+                entry = (heuristic(start_pos), 0, counter, start_pos, direction, None)
+                counter += 1
+            push(entry)
+    else:
+        start_entries = ((start_pos, direction, None) for direction in DIRECTIONS)
+        frontier = deque(start_entries) if stats is None else _CountingDeque(start_entries, stats)
+        entries = _drain(frontier, frontier.popleft if frontier_type == FIFO_FRONTIER else frontier.pop)
+        if stats is not None:
+            entries = stats.counting_pops(entries, ENTRY_FIELDS)
+
+    for entry in entries:
+        if cost_ordered:
+            _, g_score, _, current_pos, current_dir, parent = entry
+        else:
+            current_pos, current_dir, parent = entry
+
+        # Skip if already visited
+        state = (current_pos, current_dir)
+        if state in closed:
+            continue
+
+        # Accumulate the path cost from the parent record
+        if parent is None:
+            path_cost, remaining = 0, 0
+        else:
+            grand_parent, path_cost, remaining = closed[parent]
+            parent_pos, parent_dir = parent
+            if parent_pos in haunted_points:
+                remaining = HAUNTED_POINT_INDEX
+            if remaining > 0:
+                path_cost += STRAIGHT
+                remaining -= 1
+            elif grand_parent is None:
+                # First movement
+                path_cost += STRAIGHT
+            else:
+                path_cost += step_cost(parent_dir, current_dir)
+        closed[state] = (parent, path_cost, remaining)
+
         # Goal test - return path, cost, and next step
         if current_pos == target_pos:
-            final_cost = calculate_path_cost(path, original_haunted_points)
+            path = _rebuild_path(closed, state)
             next_pos = path[1] if len(path) > 1 else start_pos
-            return path, final_cost, next_pos
-            
-        # Skip if already visited
-        state = (current_pos, prev_direction)
-        if state in visited:
+            if stats is not None:
+                stats.finish(len(closed), path)
+            return path, path_cost, next_pos
+
+        neighbors = edges.get(state, {})
+
+        if not cost_ordered:
+            for next_pos in neighbors:
+                next_state = (next_pos, (next_pos[0] - current_pos[0], next_pos[1] - current_pos[1]))
+                if next_state not in closed:
+                    frontier.append((next_state[0], next_state[1], state))
             continue
-            
-        visited.add(state)
-        
-        # Check if current position is a haunted point
+
+        # If within haunted effect, all movements cost STRAIGHT
         current_haunted_steps = haunted_steps[state]
-        if current_pos in original_haunted_points:
-            # Reset counter when on a haunted point
+        if current_pos in haunted_points:
             current_haunted_steps = 0
-        
-        # Apply haunted point effect to movement costs
-        neighbors = {}
-        raw_neighbors = graph.graph.get((current_pos, prev_direction), {})
-        
-        for next_pos, base_weight in raw_neighbors.items():
-            # If within haunted effect, all movements cost STRAIGHT
-            weight = STRAIGHT if current_haunted_steps < HAUNTED_POINT_INDEX else base_weight
-            neighbors[next_pos] = weight
-        
-        # Explore neighbors
-        for next_pos, weight in neighbors.items():
-            # Calculate direction to next position
+        haunted = current_haunted_steps < HAUNTED_POINT_INDEX
+
+        for next_pos, base_weight in neighbors.items():
             next_direction = (next_pos[0] - current_pos[0], next_pos[1] - current_pos[1])
             next_state = (next_pos, next_direction)
-            new_cost = total_cost + weight
-            
+            if next_state in closed:
+                continue
+
+            new_cost = g_score + (STRAIGHT if haunted else base_weight)
+
             # Update if found better path
             if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
                 cost_so_far[next_state] = new_cost
-                new_path = path + [next_pos]
                 haunted_steps[next_state] = current_haunted_steps + 1
-                heapq.heappush(frontier, (new_cost, next_pos, next_direction, new_path))
-    
+                if heuristic is None:
+                    entry = (new_cost, new_cost, 0, next_pos, next_direction, state)
+                else:
+                    entry = (new_cost + heuristic(next_pos), new_cost, counter, next_pos, next_direction, state)
+                    counter += 1
+                push(entry)
+
     # No path found
+    if stats is not None:
+        stats.finish(len(closed), None)
     return None, None, None
 
 
-def BFS_ghost(graph, start_pos, target_pos):
-    """BFS algorithm for finding shortest path from ghost to player
-    
-    Explores all nodes at present depth before moving to next depth.
-    Guarantees shortest path in terms of number of steps.
+def _search_compact(graph, start_pos, target_pos, frontier_type, heuristic=None, stats=None):
+    """Array based variant of _search for CompactMapGraph
+
+    States are the integer ids of the CSR layout. Parent pointers, path costs,
+    haunted counters and best known costs live in flat arrays indexed by state
+    id instead of dictionaries keyed by tuples.
     """
-    # Initialize queue with all possible starting directions
-    queue = []
-    for direction in DIRECTIONS:
-        queue.append((start_pos, direction, [start_pos]))
-    
-    visited = set()
+    width, height = graph.width, graph.map.height
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    haunted_mask, blocked = graph.haunted_mask, graph.blocked
+    num_states = graph.num_state_ids
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+
+    UNSEEN = -2
+    ROOT = -1
+    parents = array('l', [UNSEEN]) * num_states
+    path_costs = array('l', [0]) * num_states
+    remaining_steps = bytearray(num_states)
+    target_cell = target_pos[1] * width + target_pos[0]
+    start_cell = start_pos[1] * width + start_pos[0]
+    start_states = range(start_cell * 4, start_cell * 4 + 4)
+
+    cost_ordered = frontier_type in (COST_FRONTIER, BUCKET_FRONTIER)
+    if cost_ordered:
+        INFINITY = 1 << 60
+        cost_so_far = array('q', [INFINITY]) * num_states
+        haunted_steps = array('l', [0]) * num_states
+        if frontier_type == BUCKET_FRONTIER:
+            start_priority = 0 if heuristic is None else heuristic(start_pos)
+            frontier = BucketQueue(_frontier_span(heuristic), start_priority)
+            push, entries = frontier.push, iter(frontier)
+        else:
+            frontier = []
+            push = partial(heapq.heappush, frontier)
+            entries = _drain(frontier, partial(heapq.heappop, frontier))
+        if stats is not None:
+            push, entries = stats.counting_push(push), stats.counting_pops(entries, COMPACT_COST_ENTRY_FIELDS)
+        counter = 0
+        for state in start_states:
+            cost_so_far[state] = 0
+            if heuristic is None:
+                # Ties resolved on (pos, direction) like the tuple based search
+                tie = ((start_cell % width) * height + start_cell // width) * 4 + DIRECTION_RANK[state & 3]
+                entry = (0, 0, tie, state, ROOT)
+            else:
+                entry = (heuristic(start_pos), 0, counter, state, ROOT)
+                counter += 1
+            push(entry)
+    else:
+        start_entries = ((state, ROOT) for state in start_states)
+        frontier = deque(start_entries) if stats is None else _CountingDeque(start_entries, stats)
+        entries = _drain(frontier, frontier.popleft if frontier_type == FIFO_FRONTIER else frontier.pop)
+        if stats is not None:
+            entries = stats.counting_pops(entries, COMPACT_ENTRY_FIELDS)
+
+    for entry in entries:
+        if cost_ordered:
+            _, g_score, _, state, parent = entry
+        else:
+            state, parent = entry
 
-    while queue:
-        # Get first state from queue (FIFO)
-        current_pos, current_dir, path = queue.pop(0)
-        
-        # Goal test
-        if current_pos == target_pos:
-            total_cost = calculate_path_cost(path, graph.haunted_points)
-            next_pos = path[1] if len(path) > 1 else start_pos
-            return path, total_cost, next_pos
-        
         # Skip if already visited
-        state = (current_pos, current_dir)
-        if state in visited:
+        if parents[state] != UNSEEN:
             continue
-            
-        visited.add(state)
-        
-        # Get all valid neighbors
-        neighbors = get_valid_neighbors(graph, current_pos, current_dir)
-        
-        # Add unvisited neighbors to queue
-        for next_pos, next_dir in neighbors:
-            next_state = (next_pos, next_dir)
-            
-            if next_state not in visited:
-                new_path = path + [next_pos]
-                queue.append((next_pos, next_dir, new_path))
+
+        # Accumulate the path cost from the parent record
+        if parent == ROOT:
+            path_cost, remaining = 0, 0
+        else:
+            path_cost, remaining = path_costs[parent], remaining_steps[parent]
+            if haunted_mask[parent >> 2]:
+                remaining = HAUNTED_POINT_INDEX
+            if remaining > 0:
+                path_cost += STRAIGHT
+                remaining -= 1
+            elif parents[parent] == ROOT:
+                # First movement
+                path_cost += STRAIGHT
+            else:
+                path_cost += step_cost(DIRECTIONS[parent & 3], DIRECTIONS[state & 3])
+        parents[state] = parent
+        path_costs[state] = path_cost
+        remaining_steps[state] = remaining
+
+        cell = state >> 2
+        # Goal test - return path, cost, and next step
+        if cell == target_cell:
+            path = []
+            while state != ROOT:
+                path.append(((state >> 2) % width, (state >> 2) // width))
+                state = parents[state]
+            path.reverse()
+            next_pos = path[1] if len(path) > 1 else start_pos
+            if stats is not None:
+                stats.finish(num_states - parents.count(UNSEEN), path)
+            return path, path_cost, next_pos
+
+        if blocked[cell]:
+            continue
+
+        if not cost_ordered:
+            for i in range(offsets[state], offsets[state + 1]):
+                next_state = targets[i]
+                if parents[next_state] == UNSEEN and not blocked[next_state >> 2]:
+                    frontier.append((next_state, state))
+            continue
+
+        # If within haunted effect, all movements cost STRAIGHT
+        current_haunted_steps = 0 if haunted_mask[cell] else haunted_steps[state]
+        haunted = current_haunted_steps < HAUNTED_POINT_INDEX
+
+        for i in range(offsets[state], offsets[state + 1]):
+            next_state = targets[i]
+            if parents[next_state] != UNSEEN or blocked[next_state >> 2]:
+                continue
+
+            new_cost = g_score + (STRAIGHT if haunted else weights[i])
+
+            # Update if found better path
+            if new_cost < cost_so_far[next_state]:
+                cost_so_far[next_state] = new_cost
+                haunted_steps[next_state] = current_haunted_steps + 1
+                next_cell = next_state >> 2
+                if heuristic is None:
+                    tie = ((next_cell % width) * height + next_cell // width) * 4 + DIRECTION_RANK[next_state & 3]
+                    entry = (new_cost, new_cost, tie, next_state, state)
+                else:
+                    h_score = heuristic((next_cell % width, next_cell // width))
+                    entry = (new_cost + h_score, new_cost, counter, next_state, state)
+                    counter += 1
+                push(entry)
+
+    # No path found
+    if stats is not None:
+        stats.finish(num_states - parents.count(UNSEEN), None)
+    return None, None, None
+
+
+def _search_exact(graph, start_pos, target_pos, heuristic=None, stats=None):
+    """Cost ordered search over the exact (cell, direction, haunted_remaining) states
+
+    States are the packed ints of ReverseStateGraph, so the haunted counter is
+    part of the visited key and the cost popped with a state is exactly what
+    calculate_path_cost gives for its path: nothing is re-walked afterwards.
+    Cells in graph.temporary_obstacles are neither entered nor left.
+    """
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+    states = graph.reverse_state_graph()
+    start = states.cell_index.get(start_pos)
+    if start is None or target_pos not in states.cell_index:
+        if stats is not None:
+            stats.finish(0, None)
+        return None, None, None
+    if start_pos == target_pos:
+        if stats is not None:
+            stats.finish(0, [start_pos])
+        return [start_pos], 0, start_pos
+
+    blocked = getattr(graph, 'temporary_obstacles', None) or ()
+    cells, successors = states.cells, states.successors
+    ROOT = -1
+    parents = {}
+    best = {}
+    frontier = []
+    push = partial(heapq.heappush, frontier)
+    entries = _drain(frontier, partial(heapq.heappop, frontier))
+    if stats is not None:
+        push, entries = stats.counting_push(push), stats.counting_pops(entries, EXACT_ENTRY_FIELDS)
+    for state, weight in states.first_moves(start):
+        next_pos = cells[state // HAUNTED_POINT_INDEX >> 2]
+        if next_pos not in blocked:
+            best[state] = weight
+            h_score = heuristic(next_pos) if heuristic else 0
+            push((weight + h_score, weight, state, ROOT))
+
+    for _, g_score, state, parent in entries:
+        if state in parents:
+            continue
+        parents[state] = parent
+
+        pos = cells[state // HAUNTED_POINT_INDEX >> 2]
+        if pos == target_pos:
+            path = []
+            while state != ROOT:
+                path.append(cells[state // HAUNTED_POINT_INDEX >> 2])
+                state = parents[state]
+            path.append(start_pos)
+            path.reverse()
+            if stats is not None:
+                stats.finish(len(parents), path)
+            return path, g_score, path[1]
+
+        for next_state, weight in successors(state):
+            if next_state in parents:
+                continue
+            next_pos = cells[next_state // HAUNTED_POINT_INDEX >> 2]
+            if next_pos in blocked:
+                continue
+            new_cost = g_score + weight
+            if new_cost < best.get(next_state, new_cost + 1):
+                best[next_state] = new_cost
+                h_score = heuristic(next_pos) if heuristic else 0
+                push((new_cost + h_score, new_cost, next_state, state))
 
     # No path found
+    if stats is not None:
+        stats.finish(len(parents), None)
     return None, None, None
 
 
+def UCS_ghost(graph, start_pos, target_pos, stats=None):
+    """UCS algorithm for finding optimal path from ghost to player
+    
+    Uses priority queue to explore nodes in order of increasing cost.
+    Considers haunted points effect on movement costs.
+    """
+    return _search(graph, start_pos, target_pos, COST_FRONTIER, stats=stats)
+
+
+def UCS_bucket_ghost(graph, start_pos, target_pos, stats=None):
+    """UCS with Dial's bucket queue instead of a binary heap
+
+    Edge weights are small integers (STRAIGHT, TURN, BACK), so the frontier
+    is a ring of buckets indexed by cost. Pops come out in the same order as
+    with the heap, so paths and costs are identical to UCS_ghost.
+    """
+    return _search(graph, start_pos, target_pos, BUCKET_FRONTIER, stats=stats)
+
+
+def UCS_exact_ghost(graph, start_pos, target_pos, stats=None):
+    """UCS over exact haunted-aware states
+
+    Unlike UCS_ghost, the haunted counter is part of the state, so the path
+    returned is the cheapest one under calculate_path_cost.
+    """
+    return _search_exact(graph, start_pos, target_pos, stats=stats)
+
+
+def BFS_ghost(graph, start_pos, target_pos, stats=None):
+    """BFS algorithm for finding shortest path from ghost to player
+    
+    Explores all nodes at present depth before moving to next depth.
+    Guarantees shortest path in terms of number of steps.
+    """
+    return _search(graph, start_pos, target_pos, FIFO_FRONTIER, stats=stats)
+
+
 def get_valid_neighbors(graph, pos, direction):
     """Get valid neighbor positions and their directions
     
@@ -185,7 +668,7 @@ def calculate_path_cost(path, haunted_points):
     return total_cost
 
 
-def DFS_ghost(graph, start_pos, target_pos):
+def DFS_ghost(graph, start_pos, target_pos, stats=None):
     """DFS algorithm for finding path from ghost to player
     
     Explores as far as possible along each branch before backtracking.
@@ -193,44 +676,8 @@ def DFS_ghost(graph, start_pos, target_pos):
     """
     # Reset haunted steps counter
     graph.moves_since_haunted = 0
-    
-    # Initialize stack with all possible starting directions
-    stack = []
-    for direction in DIRECTIONS:
-        stack.append((start_pos, direction, [start_pos]))
-    
-    visited = set()
 
-    while stack:
-        # Get last state from stack (LIFO)
-        current_pos, current_dir, path = stack.pop()
-        
-        # Goal test
-        if current_pos == target_pos:
-            total_cost = calculate_path_cost(path, graph.haunted_points)
-            next_pos = path[1] if len(path) > 1 else start_pos
-            return path, total_cost, next_pos
-        
-        # Skip if already visited
-        state = (current_pos, current_dir)
-        if state in visited:
-            continue
-            
-        visited.add(state)
-        
-        # Get all valid neighbors
-        neighbors = get_valid_neighbors(graph, current_pos, current_dir)
-        
-        # Add unvisited neighbors to stack (will be explored in reverse order)
-        for next_pos, next_dir in neighbors:
-            next_state = (next_pos, next_dir)
-            
-            if next_state not in visited:
-                new_path = path + [next_pos]
-                stack.append((next_pos, next_dir, new_path))
-
-    # No path found
-    return None, None, None
+    return _search(graph, start_pos, target_pos, LIFO_FRONTIER, stats=stats)
 
 
 def manhattan_distance(pos1, pos2):
@@ -241,7 +688,7 @@ def manhattan_distance(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 
-def A_star_ghost(graph, start_pos, target_pos):
+def A_star_ghost(graph, start_pos, target_pos, stats=None):
     """A* algorithm for finding optimal path from ghost to player
     
     Combines UCS with heuristic to guide search towards target.
@@ -249,100 +696,37 @@ def A_star_ghost(graph, start_pos, target_pos):
     - g(n) is cost from start to current node
     - h(n) is estimated cost from current node to goal
     """
-    # Make a copy of haunted points to prevent affecting other algorithms
-    original_haunted_points = set(graph.haunted_points)
     heuristic_cache = {}  # Cache for faster heuristic calculations
-    haunted_steps = {}    # Track haunted effect for each state independently
-    
-    # Initialize data structures
-    open_set = []   # Priority queue of states to explore
-    g_scores = {}   # Actual cost from start to each state
-    f_scores = {}   # Total estimated cost (g + h) for each state
-    
-    # Initialize with all possible starting directions
-    for direction in DIRECTIONS:
-        state = (start_pos, direction)
-        g_scores[state] = 0
-        f_scores[state] = get_heuristic(start_pos, target_pos, heuristic_cache)
-        haunted_steps[state] = 0
-        # Add to open set: (f_score, g_score, unique_id, state, path)
-        heapq.heappush(open_set, (f_scores[state], 0, id(state), state, [start_pos]))
-    
-    closed_set = set()  # States already evaluated
-    counter = 0         # For tie-breaking when f_scores are equal
-    
-    while open_set:
-        # Get state with lowest f_score
-        _, _, _, current_state, path = heapq.heappop(open_set)
-        current_pos, current_direction = current_state
-        
-        # Goal test
-        if current_pos == target_pos:
-            total_cost = calculate_path_cost(path, original_haunted_points)
-            next_pos = path[1] if len(path) > 1 else current_pos
-            return path, total_cost, next_pos
-        
-        # Skip if already evaluated
-        if current_state in closed_set:
-            continue
-        
-        # Mark as evaluated
-        closed_set.add(current_state)
-        
-        # Check for haunted point effect
-        current_haunted_steps = haunted_steps[current_state]
-        if current_pos in original_haunted_points:
-            # Reset counter when on a haunted point
-            current_haunted_steps = 0
-        
-        # Apply haunted point effect to movement costs
-        neighbors = {}
-        raw_neighbors = graph.graph.get(current_state, {})
-        
-        for next_pos, base_weight in raw_neighbors.items():
-            # If within haunted effect, all movements cost STRAIGHT
-            weight = STRAIGHT if current_haunted_steps < HAUNTED_POINT_INDEX else base_weight
-            neighbors[next_pos] = weight
-        
-        # Explore neighbors
-        for next_pos, weight in neighbors.items():
-            # Calculate direction to next position
-            next_direction = (next_pos[0] - current_pos[0], next_pos[1] - current_pos[1])
-            next_state = (next_pos, next_direction)
-            
-            # Skip if already evaluated
-            if next_state in closed_set:
-                continue
-            
-            # Calculate tentative g_score
-            tentative_g_score = g_scores[current_state] + weight
-            
-            # Update if found better path
-            if next_state not in g_scores or tentative_g_score < g_scores[next_state]:
-                # Update path information
-                g_scores[next_state] = tentative_g_score
-                
-                # Calculate heuristic (from cache if available)
-                h_score = get_heuristic(next_pos, target_pos, heuristic_cache)
-                
-                # Calculate f_score = g_score + h_score
-                f_score = tentative_g_score + h_score
-                f_scores[next_state] = f_score
-                
-                # Update haunted steps counter
-                haunted_steps[next_state] = current_haunted_steps + 1
-                
-                # Create new path
-                new_path = path + [next_pos]
-                
-                # Increment counter for tie-breaking
-                counter += 1
-                
-                # Add to open set with updated values
-                heapq.heappush(open_set, (f_score, tentative_g_score, counter, next_state, new_path))
-    
-    # No path found
-    return None, None, None
+    return _search(graph, start_pos, target_pos, COST_FRONTIER,
+                   heuristic=lambda pos: get_heuristic(pos, target_pos, heuristic_cache), stats=stats)
+
+
+def A_star_bucket_ghost(graph, start_pos, target_pos, stats=None):
+    """A* with Dial's bucket queue, same paths and costs as A_star_ghost
+
+    Buckets are indexed by f(n); the Manhattan heuristic is consistent, so
+    f(n) never decreases and grows by at most BACK + STRAIGHT per move.
+    """
+    heuristic_cache = {}
+    return _search(graph, start_pos, target_pos, BUCKET_FRONTIER,
+                   heuristic=lambda pos: get_heuristic(pos, target_pos, heuristic_cache), stats=stats)
+
+
+def A_star_exact_ghost(graph, start_pos, target_pos, stats=None):
+    """A* over exact haunted-aware states, same costs as UCS_exact_ghost"""
+    heuristic_cache = {}
+    return _search_exact(graph, start_pos, target_pos,
+                         heuristic=lambda pos: get_heuristic(pos, target_pos, heuristic_cache), stats=stats)
+
+
+def A_star_landmark_ghost(graph, start_pos, target_pos, stats=None):
+    """A* guided by the landmark (ALT) heuristic instead of Manhattan distance
+
+    The landmark distances are built once per map; each search only computes
+    the bound of every cell towards the target, so walls are accounted for.
+    """
+    return _search(graph, start_pos, target_pos, COST_FRONTIER,
+                   heuristic=graph.landmarks().heuristic(target_pos), stats=stats)
 
 
 def get_heuristic(pos, target, cache=None):
@@ -367,4 +751,160 @@ def get_heuristic(pos, target, cache=None):
     if cache is not None:
         cache[(pos, target)] = h_value
     
-    return h_value
\ No newline at end of file
+    return h_value
+
+
+def oracle_ghost(graph, start_pos, target_pos, stats=None):
+    """Path from ghost to player read from the precomputed distance oracle
+
+    Table lookups plus a greedy descent instead of a search, so the states
+    counted as expanded are the ones the descent steps through. The table is
+    built (or loaded from the disk cache) on first use. The table knows
+    nothing of temporary obstacles (the other ghosts), so blocked queries, and
+    maps too large for a table, are searched with A* instead.
+    """
+    oracle = graph.distance_oracle()
+    if oracle is None or getattr(graph, 'temporary_obstacles', None):
+        return A_star_ghost(graph, start_pos, target_pos, stats=stats)
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+    result = oracle.query(graph, start_pos, target_pos)
+    if stats is not None:
+        stats.finish(len(result[0]) - 1 if result[0] else 0, result[0])
+    return result
+
+
+def field_ghost(graph, start_pos, target_pos, stats=None):
+    """Path from ghost to player read from the shared target distance field
+
+    All ghosts chasing the same player position share one reverse Dijkstra,
+    so each query only reads the field and settles the states its answer
+    still needs, which are counted as expanded. The field ignores temporary
+    obstacles (the other ghosts), so a blocked query is searched exactly on
+    the junction graph instead of being read off a field that may lead into
+    a blocked cell.
+    """
+    if getattr(graph, 'temporary_obstacles', None):
+        return junction_ghost(graph, start_pos, target_pos, stats=stats)
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+    field = graph.distance_field(target_pos)
+    result = field.query(start_pos, stats=stats)
+    if stats is not None:
+        stats.finish(field.last_settled, result[0])
+    return result
+
+
+def junction_ghost(graph, start_pos, target_pos, stats=None):
+    """Path from ghost to player searched on the junction graph
+
+    Corridors are contracted into macro edges, so the search only expands
+    junctions, dead ends and haunted points, then expands the cell path.
+    """
+    if stats is not None:
+        stats.begin(start_pos, target_pos)
+    blocked = getattr(graph, 'temporary_obstacles', None) or ()
+    junctions = graph.junction_graph()
+    result = junctions.search(start_pos, target_pos, blocked)
+    if stats is not None:
+        stats.finish(junctions.expanded, result[0])
+    return result
+
+
+# Default algorithm used by each ghost
+GHOST_ALGORITHMS = {
+    BLUE_GHOST: BFS_ghost,
+    PINK_GHOST: A_star_ghost,
+    ORANGE_GHOST: DFS_ghost,
+    RED_GHOST: UCS_ghost,
+}
+
+# Algorithms a ghost can be switched to by name
+ALGORITHMS_BY_NAME = {
+    'bfs': BFS_ghost,
+    'dfs': DFS_ghost,
+    'ucs': UCS_ghost,
+    'astar': A_star_ghost,
+    'ucs-bucket': UCS_bucket_ghost,
+    'astar-bucket': A_star_bucket_ghost,
+    'ucs-exact': UCS_exact_ghost,
+    'astar-exact': A_star_exact_ghost,
+    'astar-alt': A_star_landmark_ghost,
+    'oracle': oracle_ghost,
+    'field': field_ghost,
+    'junction': junction_ghost,
+}
+
+
+# Benchmark: heap against bucket queue frontiers on the stock and scaled maps
+if __name__ == "__main__":
+    from game_map import Map
+    from map_implement import MapGraph
+    from incremental_planner import CountingGraph
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    scales = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+    base_map = Map.load_map(map_file)
+
+    if base_map:
+        pairs_per_map = 200
+        for scale in scales:
+            game_map = base_map.scaled(scale) if scale > 1 else base_map
+            graph = MapGraph(game_map)
+            cells = [(x, y) for y in range(game_map.height) for x in range(game_map.width)
+                     if game_map.layout[y][x] != WALL]
+            rng = random.Random(0)
+            pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(pairs_per_map)]
+
+            print(f"Map {map_file} x{scale}: {game_map.width}x{game_map.height}, {len(pairs)} searches")
+            for heap_search, bucket_search in ((UCS_ghost, UCS_bucket_ghost),
+                                               (A_star_ghost, A_star_bucket_ghost)):
+                results, timings = [], []
+                for search in (heap_search, bucket_search):
+                    best = None
+                    for _ in range(3):  # Best of three runs
+                        start_time = time.perf_counter()
+                        costs = [search(graph, start, target)[1] for start, target in pairs]
+                        elapsed = time.perf_counter() - start_time
+                        best = elapsed if best is None else min(best, elapsed)
+                    results.append(costs)
+                    timings.append(best)
+                same = sum(a == b for a, b in zip(*results))
+                print(f"  {heap_search.__name__:<13} heap {timings[0] * 1000:8.1f} ms   "
+                      f"bucket {timings[1] * 1000:8.1f} ms   "
+                      f"speedup {timings[0] / timings[1]:.2f}x   identical costs {same}/{len(pairs)}")
+
+            # Exact haunted-aware states against the side dict searches plus the
+            # calculate_path_cost pass that used to score their paths
+            states = graph.reverse_state_graph()
+            print(f"  State space: {len(graph.graph)} (cell, direction) states, "
+                  f"{states.num_valid_states} exact states "
+                  f"({states.num_valid_states / len(graph.graph):.1f}x)")
+            counting_graph = CountingGraph(graph)
+            for legacy_search, exact_search in ((UCS_ghost, UCS_exact_ghost),
+                                                (A_star_ghost, A_star_exact_ghost)):
+                row = []
+                for search in (legacy_search, exact_search):
+                    counting_graph.expanded = 0
+                    results = [search(counting_graph, start, target) for start, target in pairs]
+                    expanded = counting_graph.expanded
+                    start_time = time.perf_counter()
+                    for start, target in pairs:
+                        search(graph, start, target)
+                    row.append((results, expanded, time.perf_counter() - start_time))
+                (legacy, legacy_expanded, legacy_time), (exact, exact_expanded, exact_time) = row
+
+                start_time = time.perf_counter()
+                for path, _, _ in legacy:
+                    if path:
+                        calculate_path_cost(path, graph.haunted_points)
+                rescore_time = time.perf_counter() - start_time
+
+                agree = sum(a[1] == b[1] for a, b in zip(legacy, exact))
+                cheaper = sum(a[1] is not None and b[1] < a[1] for a, b in zip(legacy, exact))
+                print(f"  {legacy_search.__name__:<13} side dict {legacy_time * 1000:8.1f} ms "
+                      f"+ rescoring {rescore_time * 1000:5.1f} ms, "
+                      f"{legacy_expanded / len(pairs):7.1f} states/search")
+                print(f"  {exact_search.__name__:<17} exact {exact_time * 1000:8.1f} ms, "
+                      f"{exact_expanded / len(pairs):7.1f} states/search, "
+                      f"same cost {agree}/{len(pairs)}, cheaper {cheaper}")
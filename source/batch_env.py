@@ -0,0 +1,279 @@
+from specification import *
+from game_map import Map
+from algorithm import step_cost
+from simulation import to_ticks
+import numpy as np
+import sys
+import time
+
+"""
+BatchSimulation: N independent games stepped in lockstep with NumPy
+
+Every game shares one map and one virtual clock. Positions are walkable cell
+indexes; player and ghost state, haunted counters, move times and the dot
+masks are arrays of shape (N, ...), and one step updates all games with
+vectorised operations. Move times are integer ticks of the shared clock, as
+in Simulation, so they do not drift with the timestep. Ghosts cannot run a
+per-game search here, so every ghost follows the distance oracle: it takes
+the move minimising weight + table[next state, player cell], skipping cells
+held by other ghosts, as oracle_ghost does with temporary obstacles. Move intervals and the haunted
+rule are those of Simulation (simulation.py).
+
+The observation is one uint8 (N, height, width) board updated in place, so
+observations() hands out the same buffer every step, without copies.
+"""
+
+# Board codes of the observation grid
+CELL_EMPTY = 0
+CELL_WALL = 1
+CELL_POINT = 2
+CELL_HAUNTED = 3
+CELL_PLAYER = 4
+CELL_GHOST = 5                          # Ghost g is drawn as CELL_GHOST + g
+
+NO_ACTION = -1                          # Action of a player that stands still
+
+
+class BatchSimulation:
+    def __init__(self, graph, num_games, timestep=SIMULATION_TIMESTEP):
+        game_map = graph.map
+        oracle = graph.distance_oracle()
+        if oracle is None:
+            raise ValueError(f"BatchSimulation needs a distance oracle; the map has more than "
+                             f"{ORACLE_MAX_CELLS} walkable cells")
+        self.cells = oracle.cells
+        cell_index = oracle.cell_index
+        num_cells = len(self.cells)
+        self.num_games = num_games
+        self.timestep = timestep
+        self.width, self.height = game_map.width, game_map.height
+
+        # Neighbour table with a sentinel cell, and the oracle with a sentinel row
+        self.neighbors = np.full((num_cells + 1, 4), num_cells, dtype=np.int64)
+        for i, (x, y) in enumerate(self.cells):
+            for slot, (dx, dy) in enumerate(DIRECTIONS):
+                self.neighbors[i, slot] = cell_index.get((x + dx, y + dy), num_cells)
+        self.table = np.vstack([oracle.table.astype(np.int32),
+                                np.full((4, num_cells), np.iinfo(np.uint16).max, dtype=np.int32)])
+
+        # Weight of a move by (previous direction, new direction)
+        self.weights = np.array([[step_cost(previous, new) for new in DIRECTIONS]
+                                 for previous in DIRECTIONS], dtype=np.int32)
+        # Move intervals in ticks: by weight, and the STRAIGHT interval of new and haunted ghosts
+        self.interval_ticks = np.array([[to_ticks(weight * BASE_GHOST_UPDATE_INTERVAL, timestep) for weight in row]
+                                        for row in self.weights.tolist()], dtype=np.int64)
+        self.straight_ticks = to_ticks(STRAIGHT * BASE_GHOST_UPDATE_INTERVAL, timestep)
+        self.move_cooldown = to_ticks(PLAYER_MOVEMENT, timestep)
+        self.haunted = np.zeros(num_cells + 1, dtype=bool)
+        for pos in game_map.haunted_points:
+            self.haunted[cell_index[pos]] = True
+        self.initial_dots = np.array([game_map.layout[y][x] == POINT for x, y in self.cells], dtype=bool)
+
+        self.ghost_types = [ghost_type for ghost_type, pos in game_map.ghost_positions.items() if pos is not None]
+        self.start_player = cell_index[game_map.player_pos]
+        self.start_ghosts = np.array([cell_index[game_map.ghost_positions[ghost_type]]
+                                      for ghost_type in self.ghost_types], dtype=np.int64)
+
+        # Flat board offset of every cell and the code under it when no dot is left
+        self.cell_flat = np.array([y * self.width + x for x, y in self.cells], dtype=np.int64)
+        self.floor = np.where(self.haunted[:num_cells], CELL_HAUNTED, CELL_EMPTY).astype(np.uint8)
+        board = np.full(self.height * self.width, CELL_WALL, dtype=np.uint8)
+        board[self.cell_flat] = np.where(self.initial_dots, CELL_POINT, self.floor)
+        self.start_board = board.reshape(self.height, self.width)
+
+        num_ghosts = len(self.ghost_types)
+        self.board = np.empty((num_games, self.height, self.width), dtype=np.uint8)
+        self.player = np.empty(num_games, dtype=np.int64)
+        self.last_move_tick = np.empty(num_games, dtype=np.int64)
+        self.ghosts = np.empty((num_games, num_ghosts), dtype=np.int64)
+        self.ghost_dirs = np.empty((num_games, num_ghosts), dtype=np.int64)
+        self.haunted_remaining = np.empty((num_games, num_ghosts), dtype=np.int64)
+        self.update_ticks = np.empty((num_games, num_ghosts), dtype=np.int64)
+        self.next_move_tick = np.empty((num_games, num_ghosts), dtype=np.int64)
+        self.dots = np.empty((num_games, num_cells), dtype=bool)
+        self.haunted_bonus = np.empty((num_games, num_cells + 1), dtype=bool)
+        self.score = np.empty(num_games, dtype=np.int64)
+        self.game_over = np.empty(num_games, dtype=bool)
+        self.win = np.empty(num_games, dtype=bool)
+        self.game_steps = np.empty(num_games, dtype=np.int64)
+        self.steps = 0                  # Shared clock, in ticks
+        self.reset()
+
+    def reset(self, games=None):
+        """Restart the selected games (all by default); their clocks restart at 0"""
+        games = np.arange(self.num_games) if games is None else np.asarray(games)
+        if games.dtype == bool:
+            games = np.flatnonzero(games)
+        self.board[games] = self.start_board
+        self.player[games] = self.start_player
+        self.last_move_tick[games] = self.steps - self.move_cooldown
+        self.ghosts[games] = self.start_ghosts
+        self.ghost_dirs[games] = DIRECTIONS.index(UP)
+        self.haunted_remaining[games] = 0
+        self.update_ticks[games] = self.straight_ticks
+        self.dots[games] = self.initial_dots
+        self.haunted_bonus[games] = self.haunted
+        self.score[games] = 0
+        self.game_over[games] = False
+        self.win[games] = False
+        self.game_steps[games] = 0
+        # Move times are kept on the shared clock, offset by each game's start
+        self.next_move_tick[games] = self.steps + self.straight_ticks
+        self._draw_actors(games)
+        return self.board
+
+    @property
+    def time(self):
+        return self.steps * self.timestep
+
+    @property
+    def game_time(self):
+        """Seconds each game has run since its reset"""
+        return self.game_steps * self.timestep
+
+    def observations(self):
+        """uint8 (N, height, width) board, the same buffer every step"""
+        return self.board
+
+    def _flat_board(self):
+        return self.board.reshape(self.num_games, -1)
+
+    def _clear_actors(self, games):
+        """Put back what lies under the player and the ghosts"""
+        flat = self._flat_board()
+        for cells in (self.player[games][:, None], self.ghosts[games]):
+            rows = np.broadcast_to(games[:, None], cells.shape)
+            flat[rows, self.cell_flat[cells]] = np.where(self.dots[rows, cells], CELL_POINT, self.floor[cells])
+
+    def _draw_actors(self, games):
+        flat = self._flat_board()
+        ghosts = self.ghosts[games]
+        rows = np.broadcast_to(games[:, None], ghosts.shape)
+        flat[rows, self.cell_flat[ghosts]] = CELL_GHOST + np.arange(ghosts.shape[1], dtype=np.uint8)
+        flat[games, self.cell_flat[self.player[games]]] = CELL_PLAYER
+
+    def _move_players(self, actions, alive):
+        moving = alive & (actions >= 0) & (self.steps - self.last_move_tick >= self.move_cooldown)
+        games = np.flatnonzero(moving)
+        if not games.size:
+            return np.zeros(self.num_games, dtype=np.int64)
+        targets = self.neighbors[self.player[games], actions[games]]
+        valid = targets < len(self.cells)
+        games, targets = games[valid], targets[valid]
+
+        self.player[games] = targets
+        self.last_move_tick[games] = self.steps
+        reward = np.zeros(self.num_games, dtype=np.int64)
+        reward[games] = self.dots[games, targets] + 10 * self.haunted_bonus[games, targets]
+        self.dots[games, targets] = False
+        self.haunted_bonus[games, targets] = False
+
+        finished = games[~self.dots[games].any(axis=1)]
+        self.win[finished] = True
+        self.game_over[finished] = True
+        return reward
+
+    def _move_ghost(self, ghost, games):
+        """One oracle move of ghost in the selected games"""
+        pos = self.ghosts[games, ghost]
+        next_cells = self.neighbors[pos]                                    # (n, 4)
+        slots = np.arange(4)
+        costs = self.table[next_cells * 4 + slots, self.player[games][:, None]].astype(np.int64)
+        weights = self.weights[self.ghost_dirs[games, ghost]]
+        weights = np.where(self.haunted_remaining[games, ghost][:, None] > 0, STRAIGHT, weights)
+        costs += weights
+        others = np.delete(self.ghosts[games], ghost, axis=1)
+        blocked = (next_cells == len(self.cells)) | (next_cells[:, :, None] == others[:, None, :]).any(axis=2)
+        costs[blocked] = np.iinfo(np.int64).max
+        slot = costs.argmin(axis=1)
+        can_move = ~blocked[np.arange(len(games)), slot]
+        games, slot = games[can_move], slot[can_move]
+        next_pos = next_cells[can_move, slot]
+
+        # Interval rules of ghost_move_interval, vectorised
+        previous = self.ghost_dirs[games, ghost]
+        remaining = self.haunted_remaining[games, ghost]
+        entering = self.haunted[next_pos]
+        under_effect = ~entering & (remaining > 0)
+        interval = np.where(entering | under_effect, self.straight_ticks, self.interval_ticks[previous, slot])
+        self.haunted_remaining[games, ghost] = np.where(entering, HAUNTED_POINT_INDEX,
+                                                        np.where(under_effect, remaining - 1, remaining))
+        self.update_ticks[games, ghost] = interval
+        self.ghost_dirs[games, ghost] = slot
+        self.ghosts[games, ghost] = next_pos
+
+    def step(self, actions):
+        """Advance every running game by one timestep
+
+        actions holds one DIRECTIONS index (or NO_ACTION) per game. Returns
+        (rewards, done) arrays; finished games stay frozen until reset.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        self.steps += 1
+        alive = ~self.game_over
+        running = np.flatnonzero(alive)
+        self.game_steps[running] += 1
+        self._clear_actors(running)
+
+        rewards = self._move_players(actions, alive)
+        self.game_over |= (self.ghosts == self.player[:, None]).any(axis=1)
+
+        # Ghost moves due before the end of the step; ghosts of one game move in turn
+        while True:
+            due = (self.next_move_tick <= self.steps) & ~self.game_over[:, None]
+            if not due.any():
+                break
+            for ghost in range(due.shape[1]):
+                games = np.flatnonzero(due[:, ghost] & ~self.game_over)
+                if not games.size:
+                    continue
+                self._move_ghost(ghost, games)
+                self.next_move_tick[games, ghost] += self.update_ticks[games, ghost]
+                self.game_over[games] |= self.ghosts[games, ghost] == self.player[games]
+
+        self.score += rewards
+        self._draw_actors(running)
+        return rewards, self.game_over.copy()
+
+
+# Benchmark: game steps per second, batched against a loop over Simulation objects
+if __name__ == "__main__":
+    from map_implement import MapGraph
+    from simulation import Simulation
+    from algorithm import oracle_ghost, GHOST_ALGORITHMS
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    batch_sizes = [int(arg) for arg in sys.argv[2:]] or [1, 100, 1000, 10000]
+    game_map = Map.load_map(map_file)
+
+    if game_map:
+        graph = MapGraph(game_map)
+        graph.distance_oracle()
+        rng = np.random.default_rng(0)
+        steps = 200
+
+        # Reference: one Simulation per game, all ghosts on the distance oracle
+        simulation = Simulation(graph=graph, ghost_algorithms={ghost: oracle_ghost for ghost in GHOST_ALGORITHMS})
+        actions = rng.integers(0, 4, steps)
+        start_time = time.perf_counter()
+        done_steps = 0
+        while done_steps < steps:
+            simulation.reset()
+            for action in actions:
+                if simulation.game_over or done_steps >= steps:
+                    break
+                simulation.step(DIRECTIONS[action])
+                done_steps += 1
+        loop_rate = done_steps / (time.perf_counter() - start_time)
+        print(f"Map {map_file}: Simulation loop {loop_rate:10.0f} game steps/s")
+
+        for num_games in batch_sizes:
+            batch = BatchSimulation(graph, num_games)
+            actions = rng.integers(0, 4, (steps, num_games))
+            start_time = time.perf_counter()
+            for step_actions in actions:
+                _, done = batch.step(step_actions)
+                if done.any():
+                    batch.reset(done)
+            rate = steps * num_games / (time.perf_counter() - start_time)
+            print(f"  Batch of {num_games:6d}     {rate:10.0f} game steps/s ({rate / loop_rate:6.1f}x)")
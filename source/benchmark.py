@@ -0,0 +1,181 @@
+from specification import *
+from game_map import Map
+from map_implement import MapGraph
+from algorithm import ALGORITHMS_BY_NAME, SearchStats
+import inspect
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+"""
+Algorithm benchmark suite
+
+Every selected algorithm answers the same (ghost, target) queries on every
+map: the ghost start positions against the player start, then random pairs
+of walkable cells. Each quantity is measured in its own pass so the
+measurements do not disturb each other:
+- timing: every query repeated, perf_counter_ns only, tracemalloc off
+- memory: one run of every query under tracemalloc, peak bytes
+- counters: one run of every query with a SearchStats (nodes expanded,
+  peak frontier), for the algorithms that accept one
+Results can be written to JSON; compared against a saved baseline, a
+median time or expansion count above the baseline is flagged.
+"""
+
+REGRESSION_TOLERANCE = 0.10         # Allowed median time increase over the baseline
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def query_pairs(game_map, count, seed):
+    """Ghost starts against the player start, then count random pairs of walkable cells"""
+    pairs = [(pos, game_map.player_pos) for pos in game_map.ghost_positions.values() if pos is not None]
+    cells = [(x, y) for y in range(game_map.height) for x in range(game_map.width)
+             if game_map.layout[y][x] != WALL]
+    rng = random.Random(seed)
+    pairs.extend((rng.choice(cells), rng.choice(cells)) for _ in range(count))
+    return pairs
+
+
+def benchmark_algorithm(graph, algorithm, pairs, repeat):
+    """Timing, memory and counter passes of one algorithm over the queries"""
+    algorithm(graph, *pairs[0])     # Builds tables of oracle, field, junction and landmarks
+
+    # Timing pass
+    times = []
+    for _ in range(repeat):
+        for start_pos, target_pos in pairs:
+            start_time = time.perf_counter_ns()
+            algorithm(graph, start_pos, target_pos)
+            times.append(time.perf_counter_ns() - start_time)
+
+    # Memory pass
+    peaks = []
+    tracemalloc.start()
+    try:
+        for start_pos, target_pos in pairs:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            algorithm(graph, start_pos, target_pos)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    # Counter pass
+    expanded = peak_frontier = None
+    found = 0
+    with_stats = 'stats' in inspect.signature(algorithm).parameters
+    if with_stats:
+        expanded, peak_frontier = [], []
+    for start_pos, target_pos in pairs:
+        if with_stats:
+            stats = SearchStats()
+            path, _, _ = algorithm(graph, start_pos, target_pos, stats=stats)
+            expanded.append(stats.expanded)
+            peak_frontier.append(stats.peak_frontier)
+        else:
+            path, _, _ = algorithm(graph, start_pos, target_pos)
+        found += path is not None
+
+    return {
+        'queries': len(pairs),
+        'found': found,
+        'time_us': {
+            'min': min(times) / 1000,
+            'median': percentile(times, 0.5) / 1000,
+            'p95': percentile(times, 0.95) / 1000,
+        },
+        'memory_kb': {
+            'median': percentile(peaks, 0.5) / 1024,
+            'max': max(peaks) / 1024,
+        },
+        'expanded': sum(expanded) / len(expanded) if expanded else None,
+        'peak_frontier': max(peak_frontier) if peak_frontier else None,
+    }
+
+
+def run_suite(map_files=None, scales=(1,), algorithms=None, pairs=100, repeat=5, seed=0):
+    """Benchmark every algorithm on every (map, scale), returns the JSON results"""
+    names = algorithms or list(ALGORITHMS_BY_NAME)
+    results = []
+    for map_file in map_files or [MAP_DIR]:
+        base_map = Map.load_map(map_file)
+        if not base_map:
+            continue
+        for scale in scales:
+            game_map = base_map.scaled(scale) if scale > 1 else base_map
+            queries = query_pairs(game_map, pairs, seed)
+            for name in names:
+                graph = MapGraph(game_map)
+                result = benchmark_algorithm(graph, ALGORITHMS_BY_NAME[name], queries, repeat)
+                results.append({'map': map_file, 'scale': scale, 'algorithm': name, **result})
+    return {
+        'config': {'pairs': pairs, 'repeat': repeat, 'seed': seed,
+                   'weights': [STRAIGHT, TURN, BACK], 'python': sys.version.split()[0]},
+        'results': results,
+    }
+
+
+def print_results(suite):
+    print(f"{'Map':<24} {'Algorithm':<13} {'min us':>9} {'median us':>10} {'p95 us':>9} "
+          f"{'peak KB':>8} {'expanded':>9} {'frontier':>9} {'found':>7}")
+    for row in suite['results']:
+        expanded = f"{row['expanded']:.1f}" if row['expanded'] is not None else '-'
+        frontier = row['peak_frontier'] if row['peak_frontier'] is not None else '-'
+        label = f"{os.path.basename(row['map'])} x{row['scale']}"
+        print(f"{label:<24} {row['algorithm']:<13} {row['time_us']['min']:>9.1f} "
+              f"{row['time_us']['median']:>10.1f} {row['time_us']['p95']:>9.1f} "
+              f"{row['memory_kb']['median']:>8.1f} {expanded:>9} {frontier:>9} "
+              f"{row['found']:>3}/{row['queries']:<3}")
+
+
+def compare_to_baseline(suite, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Regression messages of the rows slower or expanding more than in the baseline"""
+    if baseline['config'].get('pairs') != suite['config']['pairs'] or \
+            baseline['config'].get('seed') != suite['config']['seed']:
+        print("Warning: baseline ran other queries (pairs or seed differ)")
+    previous = {(row['map'], row['scale'], row['algorithm']): row for row in baseline['results']}
+    regressions = []
+    for row in suite['results']:
+        base = previous.get((row['map'], row['scale'], row['algorithm']))
+        if base is None:
+            continue
+        name = f"{row['algorithm']} on {row['map']} x{row['scale']}"
+        median, base_median = row['time_us']['median'], base['time_us']['median']
+        if median > base_median * (1 + tolerance):
+            regressions.append(f"{name}: median {base_median:.1f} -> {median:.1f} us "
+                               f"(+{(median / base_median - 1) * 100:.0f}%)")
+        if row['expanded'] is not None and base['expanded'] is not None and row['expanded'] > base['expanded']:
+            regressions.append(f"{name}: expanded {base['expanded']:.1f} -> {row['expanded']:.1f} states")
+    return regressions
+
+
+def run_benchmark(map_files=None, scales=(1,), algorithms=None, pairs=100, repeat=5, seed=0,
+                  json_file=None, baseline_file=None, tolerance=REGRESSION_TOLERANCE):
+    """Run the suite, print it, write and compare JSON; returns the number of regressions"""
+    suite = run_suite(map_files, scales, algorithms, pairs, repeat, seed)
+    print_results(suite)
+    if json_file:
+        with open(json_file, 'w') as f:
+            json.dump(suite, f, indent=2)
+        print(f"Results written to {json_file}")
+    if not baseline_file:
+        return 0
+    with open(baseline_file) as f:
+        regressions = compare_to_baseline(suite, json.load(f), tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regression against {baseline_file}")
+    return len(regressions)
+
+
+# Default suite on the stock map; see main.py -bench for the options
+if __name__ == "__main__":
+    sys.exit(1 if run_benchmark(sys.argv[1:]) else 0)
@@ -0,0 +1,200 @@
+from specification import *
+from map_implement import MapGraph
+from game_map import Map
+from collections.abc import Mapping
+from array import array
+import sys
+
+"""
+CompactMapGraph: array backed MapGraph using integer state ids
+
+A state (position, direction) is encoded as cell_index * 4 + dir_index where
+cell_index = y * width + x and dir_index is the index in DIRECTIONS. Outgoing
+edges are stored in CSR layout: the edges of state s are
+targets[offsets[s]:offsets[s + 1]], each target being the id of the state
+reached (neighbour cell, direction of the move).
+"""
+
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+
+
+class CompactMapGraph(MapGraph):
+    def _create_weighted_graph(self):
+        width, height = self.map.width, self.map.height
+        self.width = width
+        self.num_cells = width * height
+        self.num_state_ids = self.num_cells * 4
+
+        artifact = self.map.artifact
+        if artifact is not None:
+            # Compiled map: zero copy views on the mapped CSR sections
+            for name in ('offsets', 'targets', 'weights', 'walkable'):
+                setattr(self, name, artifact.buffer_view(name))
+            self.haunted_mask = bytearray(self.num_cells)
+            for x, y in self.haunted_points:
+                self.haunted_mask[y * width + x] = 1
+            self.blocked = bytearray(self.num_cells)
+            self.num_states = int((artifact.sections['offsets'][1:] != artifact.sections['offsets'][:-1]).sum())
+            return CompactGraphView(self)
+
+        # Per cell masks
+        self.walkable = bytearray(self.map.walkable)
+        self.haunted_mask = bytearray(self.num_cells)
+        for x, y in self.haunted_points:
+            self.haunted_mask[y * width + x] = 1
+        self.blocked = bytearray(self.num_cells)
+
+        # CSR buffers
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        self.weights = array('B')           # Turn aware weight (STRAIGHT, TURN or BACK)
+        self.num_states = 0
+
+        for cell in range(self.num_cells):
+            x, y = cell % width, cell // width
+            moves = []
+            if self.walkable[cell]:
+                for new_dir_index, (dx, dy) in enumerate(DIRECTIONS):
+                    new_x, new_y = x + dx, y + dy
+                    if 0 <= new_x < width and 0 <= new_y < height and self.walkable[new_y * width + new_x]:
+                        moves.append((new_dir_index, (new_y * width + new_x) * 4 + new_dir_index))
+
+            for prev_direction in DIRECTIONS:
+                for new_dir_index, target in moves:
+                    self.targets.append(target)
+                    self.weights.append(self._calculate_turn_weight(prev_direction, DIRECTIONS[new_dir_index]))
+                if moves:
+                    self.num_states += 1
+                self.offsets.append(len(self.targets))
+
+        return CompactGraphView(self)
+
+    def state_id(self, pos, direction):
+        """Encode a (position, direction) state as an integer id"""
+        return ((pos[1] * self.width + pos[0]) << 2) | DIRECTION_INDEX[direction]
+
+    def state_of(self, state_id):
+        """Decode an integer id back to a (position, direction) state"""
+        cell = state_id >> 2
+        return (cell % self.width, cell // self.width), DIRECTIONS[state_id & 3]
+
+    def position_of(self, state_id):
+        """Position (x, y) of an integer state id"""
+        cell = state_id >> 2
+        return (cell % self.width, cell // self.width)
+
+    def add_temporary_obstacle(self, pos):
+        """Block a cell: searches neither enter nor leave it"""
+        if not hasattr(self, 'temporary_obstacles'):
+            self.temporary_obstacles = set()
+        self.temporary_obstacles.add(pos)
+        self.blocked[pos[1] * self.width + pos[0]] = 1
+
+    def remove_temporary_obstacle(self, pos):
+        """Unblock a cell previously passed to add_temporary_obstacle"""
+        if not hasattr(self, 'temporary_obstacles') or pos not in self.temporary_obstacles:
+            return
+        self.temporary_obstacles.remove(pos)
+        self.blocked[pos[1] * self.width + pos[0]] = 0
+
+    def memory_report(self):
+        """Return the size of the CSR buffers and the bytes spent per state"""
+        buffers = {
+            'offsets': self.offsets,
+            'targets': self.targets,
+            'weights': self.weights,
+        }
+        report = {name: len(buf) * buf.itemsize for name, buf in buffers.items()}
+        report['masks'] = len(self.walkable) + len(self.haunted_mask) + len(self.blocked)
+        total = sum(report.values())
+        report['total'] = total
+        report['states'] = self.num_states
+        report['edges'] = len(self.targets)
+        report['bytes_per_state'] = total / self.num_states if self.num_states else 0
+        return report
+
+
+class CompactGraphView(Mapping):
+    """Read only dict view so graph.graph[(pos, direction)] keeps working"""
+
+    def __init__(self, compact_graph):
+        self._graph = compact_graph
+
+    def _row(self, key):
+        try:
+            (x, y), direction = key
+            dir_index = DIRECTION_INDEX[direction]
+        except (TypeError, ValueError, KeyError):
+            return None
+        graph = self._graph
+        if not (0 <= x < graph.map.width and 0 <= y < graph.map.height):
+            return None
+        state_id = ((y * graph.width + x) << 2) | dir_index
+        start, end = graph.offsets[state_id], graph.offsets[state_id + 1]
+        if start == end:
+            return None
+        return state_id, start, end
+
+    def __getitem__(self, key):
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        state_id, start, end = row
+        graph = self._graph
+        if graph.blocked[state_id >> 2]:
+            return {}
+        neighbors = {}
+        for i in range(start, end):
+            target_cell = graph.targets[i] >> 2
+            if not graph.blocked[target_cell]:
+                neighbors[(target_cell % graph.width, target_cell // graph.width)] = graph.weights[i]
+        return neighbors
+
+    def __contains__(self, key):
+        return self._row(key) is not None
+
+    def __iter__(self):
+        graph = self._graph
+        offsets = graph.offsets
+        for state_id in range(graph.num_state_ids):
+            if offsets[state_id] != offsets[state_id + 1]:
+                yield graph.state_of(state_id)
+
+    def __len__(self):
+        return self._graph.num_states
+
+
+def dict_graph_size(graph):
+    """Approximate deep size in bytes of a dict based MapGraph.graph"""
+    seen = set()
+
+    def size(obj):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                total += size(key) + size(value)
+        elif isinstance(obj, tuple):
+            for item in obj:
+                total += size(item)
+        return total
+
+    return size(graph)
+
+
+# Memory report
+if __name__ == "__main__":
+    game_map = Map.load_map(MAP_DIR)
+
+    if game_map:
+        dict_graph = MapGraph(game_map)
+        compact_graph = CompactMapGraph(game_map)
+        report = compact_graph.memory_report()
+        dict_bytes = dict_graph_size(dict_graph.graph)
+
+        print(f"States: {report['states']}, edges: {report['edges']}")
+        print(f"{'Layout':<10} {'Bytes':>10} {'Bytes/state':>12}")
+        print(f"{'dict':<10} {dict_bytes:>10} {dict_bytes / len(dict_graph.graph):>12.1f}")
+        print(f"{'CSR':<10} {report['total']:>10} {report['bytes_per_state']:>12.1f}")
@@ -0,0 +1,313 @@
+from specification import *
+from game_map import Map
+from algorithm import step_cost
+from array import array
+from collections import deque
+import heapq
+import random
+import sys
+import threading
+import time
+
+"""
+Target distance field: one reverse Dijkstra from Pacman shared by every ghost
+
+The field is computed over search states (cell, direction, haunted_remaining)
+packed into one int as (cell_index * 4 + dir_index) * HAUNTED_POINT_INDEX +
+haunted_remaining, so the haunted rule is exact and the costs are the ones
+calculate_path_cost gives. While haunted_remaining > 0 every move costs
+STRAIGHT whatever the direction, so those states all use dir_index 0, and they
+only exist on cells close enough to a haunted point to still be under its
+effect.
+"""
+
+INFINITY = 1 << 60
+
+
+class ReverseStateGraph:
+    """Predecessor lists (CSR) of the packed search states of a MapGraph
+
+    Built once per map and shared by every TargetDistanceField.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        layout = graph.map.layout
+        width, height = graph.map.width, graph.map.height
+        self.cells = [(x, y) for y in range(height) for x in range(width) if layout[y][x] != WALL]
+        self.cell_index = {pos: i for i, pos in enumerate(self.cells)}
+        num_cells = len(self.cells)
+        self.num_states = num_cells * 4 * HAUNTED_POINT_INDEX
+
+        # Neighbour cells of each cell as (dir_index, cell_index)
+        self.neighbors = []
+        for x, y in self.cells:
+            moves = []
+            for dir_index, (dx, dy) in enumerate(DIRECTIONS):
+                next_index = self.cell_index.get((x + dx, y + dy))
+                if next_index is not None:
+                    moves.append((dir_index, next_index))
+            self.neighbors.append(moves)
+
+        self.haunted = bytearray(num_cells)
+        for pos in graph.haunted_points:
+            if pos in self.cell_index:
+                self.haunted[self.cell_index[pos]] = 1
+
+        # Steps from the nearest haunted point, bounds the haunted counter of a cell
+        haunted_distance = [INFINITY] * num_cells
+        queue = deque()
+        for i in range(num_cells):
+            if self.haunted[i]:
+                haunted_distance[i] = 0
+                queue.append(i)
+        while queue:
+            i = queue.popleft()
+            for _, j in self.neighbors[i]:
+                if haunted_distance[j] == INFINITY:
+                    haunted_distance[j] = haunted_distance[i] + 1
+                    queue.append(j)
+
+        # Collect the forward transitions of every valid state, grouped by target
+        predecessors = [[] for _ in range(self.num_states)]
+        self.num_valid_states = 0
+        for i in range(num_cells):
+            for dir_index in range(4):
+                for remaining in range(HAUNTED_POINT_INDEX):
+                    if remaining and (dir_index or haunted_distance[i] > HAUNTED_POINT_INDEX - remaining):
+                        continue  # Direction is irrelevant, or too far from a haunted point
+                    state = (i * 4 + dir_index) * HAUNTED_POINT_INDEX + remaining
+                    self.num_valid_states += 1
+                    for next_state, weight in self.successors(state):
+                        predecessors[next_state].append((state, weight))
+
+        self.pred_offsets = array('l', [0])
+        self.pred_sources = array('l')
+        self.pred_weights = array('B')
+        for preds in predecessors:
+            for state, weight in preds:
+                self.pred_sources.append(state)
+                self.pred_weights.append(weight)
+            self.pred_offsets.append(len(self.pred_sources))
+
+    def successors(self, state):
+        """Forward transitions of a packed state as (next_state, weight)
+
+        Same rules as calculate_path_cost: leaving a haunted point makes the
+        next HAUNTED_POINT_INDEX moves cost STRAIGHT.
+        """
+        remaining = state % HAUNTED_POINT_INDEX
+        cell_dir = state // HAUNTED_POINT_INDEX
+        i, dir_index = cell_dir >> 2, cell_dir & 3
+        if self.haunted[i]:
+            remaining = HAUNTED_POINT_INDEX
+        moves = []
+        for next_dir, j in self.neighbors[i]:
+            if remaining > 1:
+                moves.append(((j * 4) * HAUNTED_POINT_INDEX + remaining - 1, STRAIGHT))
+            else:
+                weight = STRAIGHT if remaining else step_cost(DIRECTIONS[dir_index], DIRECTIONS[next_dir])
+                moves.append(((j * 4 + next_dir) * HAUNTED_POINT_INDEX, weight))
+        return moves
+
+    def first_moves(self, cell):
+        """Transitions out of a start cell, which has no previous direction"""
+        if self.haunted[cell]:
+            return [((j * 4) * HAUNTED_POINT_INDEX + HAUNTED_POINT_INDEX - 1, STRAIGHT)
+                    for _, j in self.neighbors[cell]]
+        return [((j * 4 + next_dir) * HAUNTED_POINT_INDEX, STRAIGHT) for next_dir, j in self.neighbors[cell]]
+
+    def position_of(self, state):
+        return self.cells[state // HAUNTED_POINT_INDEX >> 2]
+
+
+class TargetDistanceField:
+    """Exact cost from search states to one target cell
+
+    The reverse Dijkstra is resumable: it only settles states until the
+    queried ghost's answer is final, and later queries for ghosts further away
+    continue from the same frontier. All ghosts chasing the same target share
+    one search.
+    """
+
+    def __init__(self, reverse_graph, target_pos):
+        self.reverse_graph = reverse_graph
+        self.target = target_pos
+        self.distances = array('q', [INFINITY]) * reverse_graph.num_states
+        self.frontier = []
+        self.expanded = 0               # States settled by every query so far
+        self.last_settled = 0           # States settled by the last query
+        self.lock = threading.Lock()
+
+        target = reverse_graph.cell_index.get(target_pos)
+        if target is None:
+            return
+
+        base = target * 4 * HAUNTED_POINT_INDEX
+        for state in range(base, base + 4 * HAUNTED_POINT_INDEX):
+            self.distances[state] = 0
+            self.frontier.append((0, state))
+
+    def _settle(self, moves, stats=None):
+        """Run the backward Dijkstra until the best of moves is exact, returns the states settled
+
+        Any state still in the frontier costs at least the frontier minimum,
+        so once that minimum plus the cheapest weight reaches the best
+        candidate, no unsettled state can improve it. stats (a SearchStats)
+        counts the pops and pushes of this call.
+        """
+        distances, frontier = self.distances, self.frontier
+        reverse_graph = self.reverse_graph
+        offsets, sources, weights = (reverse_graph.pred_offsets, reverse_graph.pred_sources,
+                                     reverse_graph.pred_weights)
+
+        watched = {state: weight for state, weight in moves}
+        best = min((weight + distances[state] for state, weight in moves), default=INFINITY)
+        settled = pops = pushes = 0
+        while frontier and frontier[0][0] + STRAIGHT < best:
+            cost, state = heapq.heappop(frontier)
+            pops += 1
+            if cost > distances[state]:
+                continue
+            settled += 1
+            for k in range(offsets[state], offsets[state + 1]):
+                new_cost = cost + weights[k]
+                source = sources[k]
+                if new_cost < distances[source]:
+                    distances[source] = new_cost
+                    heapq.heappush(frontier, (new_cost, source))
+                    pushes += 1
+                    if source in watched and new_cost + watched[source] < best:
+                        best = new_cost + watched[source]
+        self.expanded += settled
+        if stats is not None:
+            stats.pushed(pushes)
+            stats.pops += pops
+        return settled
+
+    def _best_move(self, moves, blocked):
+        best = None
+        for next_state, weight in moves:
+            total = weight + self.distances[next_state]
+            if total >= INFINITY or self.reverse_graph.position_of(next_state) in blocked:
+                continue
+            if best is None or total < best[0]:
+                best = (total, next_state, weight)
+        return best
+
+    def next_step(self, start_pos, blocked=()):
+        """Optimal next position from start_pos and the cost to the target"""
+        start = self.reverse_graph.cell_index.get(start_pos)
+        if start is None:
+            return None, None
+        if start_pos == self.target:
+            return start_pos, 0
+        moves = self.reverse_graph.first_moves(start)
+        with self.lock:
+            self._settle(moves)
+        best = self._best_move(moves, blocked)
+        if best is None:
+            return None, None
+        return self.reverse_graph.position_of(best[1]), best[0]
+
+    def query(self, start_pos, blocked=(), stats=None):
+        """(path, cost, next_pos) from start_pos, read off the field
+
+        stats (a SearchStats) receives the pops and pushes of the settling
+        this query triggers; the states it settles are in last_settled.
+
+        The field is settled without blocked cells, which are only skipped
+        while reading the path off: a detour around them can dead end and give
+        None. field_ghost searches exactly when cells are blocked.
+        """
+        self.last_settled = 0
+        reverse_graph = self.reverse_graph
+        start = reverse_graph.cell_index.get(start_pos)
+        if start is None:
+            return None, None, None
+        if start_pos == self.target:
+            return [start_pos], 0, start_pos
+
+        path = [start_pos]
+        cost = 0
+        seen = set()
+        moves = reverse_graph.first_moves(start)
+        with self.lock:
+            self.last_settled = self._settle(moves, stats)
+        while path[-1] != self.target:
+            best = self._best_move(moves, blocked)
+            if best is None or best[1] in seen:
+                return None, None, None
+            _, state, weight = best
+            seen.add(state)
+            cost += weight
+            path.append(reverse_graph.position_of(state))
+            moves = reverse_graph.successors(state)
+
+        return path, cost, path[1]
+
+
+# Benchmark: four ghost searches per player move against one shared field
+if __name__ == "__main__":
+    from map_implement import MapGraph
+    from algorithm import UCS_ghost, UCS_exact_ghost, field_ghost
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    player_moves = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    num_ghosts = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    game_map = Map.load_map(map_file)
+
+    if game_map:
+        graph = MapGraph(game_map)
+        reverse_graph = ReverseStateGraph(graph)
+        rng = random.Random(0)
+        cells = reverse_graph.cells
+        player = game_map.player_pos
+        ghosts = [pos for pos in game_map.ghost_positions.values() if pos]
+        if num_ghosts:
+            ghosts = [None] * num_ghosts
+
+        search_time = field_time = 0.0
+        matches = lower = higher = total = 0
+        for _ in range(player_moves):
+            x, y = player
+            player = rng.choice([pos for pos in ((x + dx, y + dy) for dx, dy in DIRECTIONS)
+                                 if pos in reverse_graph.cell_index] or [player])
+            ghosts = [rng.choice(cells) for _ in ghosts]
+
+            start_time = time.perf_counter()
+            searched = [UCS_ghost(graph, ghost, player) for ghost in ghosts]
+            search_time += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            field = TargetDistanceField(reverse_graph, player)
+            read = [field.next_step(ghost) for ghost in ghosts]
+            field_time += time.perf_counter() - start_time
+
+            for (path, cost, _), (next_pos, field_cost) in zip(searched, read):
+                if path is not None:
+                    total += 1
+                    matches += cost == field_cost
+                    lower += field_cost < cost
+                    higher += field_cost > cost
+
+        print(f"Map {map_file}: {len(ghosts)} ghosts, {player_moves} player moves")
+        print(f"Searches (UCS per ghost): {search_time * 1000:.1f} ms")
+        print(f"Shared distance field:    {field_time * 1000:.1f} ms")
+        print(f"Field cost vs UCS cost on {total} queries: {matches} equal, {lower} lower, {higher} higher")
+
+        # field_ghost with three cells blocked (the other ghosts) against the exact search
+        blocked_total = blocked_matches = 0
+        for _ in range(player_moves * 4):
+            start, target = rng.choice(cells), rng.choice(cells)
+            for pos in rng.sample(cells, 3):
+                if pos not in (start, target):
+                    graph.add_temporary_obstacle(pos)
+            _, exact_cost, _ = UCS_exact_ghost(graph, start, target)
+            _, field_cost, _ = field_ghost(graph, start, target)
+            graph.remove_all_temporary_obstacles()
+            if exact_cost is not None:
+                blocked_total += 1
+                blocked_matches += field_cost == exact_cost
+        print(f"field_ghost with 3 blocked cells vs exact UCS on {blocked_total} reachable queries: "
+              f"{blocked_matches} equal")
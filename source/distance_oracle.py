@@ -0,0 +1,189 @@
+from specification import *
+from game_map import Map
+from algorithm import calculate_path_cost, step_cost
+import numpy as np
+import os
+import sys
+import time
+
+"""
+DistanceOracle: precomputed turn-aware costs from every state to every cell
+
+Row cell_index * 4 + dir_index of the table holds the cost of the cheapest
+path starting at walkable cell cell_index, having arrived with direction
+DIRECTIONS[dir_index], to every walkable cell (one column per cell). Costs use
+the STRAIGHT / TURN / BACK weights; the haunted discount depends on the path
+taken and is not folded into the table.
+
+The table grows with the square of the map, so no oracle is built for maps
+above ORACLE_MAX_CELLS walkable cells; oracle_ghost then falls back to A*.
+"""
+
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+class DistanceOracle:
+    def __init__(self, cells, table):
+        self.cells = cells                                  # Walkable cell positions
+        self.cell_index = {pos: i for i, pos in enumerate(cells)}
+        self.table = table                                  # uint16 (states, cells)
+
+    @staticmethod
+    def walkable_cells(game_map):
+        layout = game_map.layout
+        return [(x, y) for y in range(game_map.height) for x in range(game_map.width)
+                if layout[y][x] != WALL]
+
+    @classmethod
+    def build(cls, graph, max_cells=ORACLE_MAX_CELLS):
+        """Compute the full table with a vectorised Bellman-Ford relaxation
+
+        All target columns are relaxed at once: each pass takes, for every
+        state and every move slot, weight + cost of the reached state and keeps
+        the minimum, until a pass changes nothing. The relaxation works on
+        uint16 buffers allocated once; returns None above max_cells cells.
+        """
+        cells = cls.walkable_cells(graph.map)
+        if len(cells) > max_cells:
+            return None
+        cell_index = {pos: i for i, pos in enumerate(cells)}
+        num_cells = len(cells)
+        num_states = num_cells * 4
+        sentinel = num_states       # Extra row that is never reachable
+        # Below UNREACHABLE by the largest weight, so infinity + weight does not wrap around
+        infinity = UNREACHABLE - max(STRAIGHT, TURN, BACK)
+
+        # Successor state and weight for each of the four move slots; a missing move
+        # leads to the sentinel row at no cost
+        targets = np.full((4, num_states), sentinel, dtype=np.int32)
+        weights = np.zeros((4, num_states), dtype=np.uint16)
+        for i, pos in enumerate(cells):
+            for dir_index, direction in enumerate(DIRECTIONS):
+                state = i * 4 + dir_index
+                for next_pos, weight in graph.graph.get((pos, direction), {}).items():
+                    slot = DIRECTIONS.index((next_pos[0] - pos[0], next_pos[1] - pos[1]))
+                    targets[slot, state] = cell_index[next_pos] * 4 + slot
+                    weights[slot, state] = weight
+
+        distances = np.full((num_states + 1, num_cells), infinity, dtype=np.uint16)
+        for i in range(num_cells):
+            distances[i * 4:i * 4 + 4, i] = 0
+
+        # Updates are written back after every slot so they propagate within a pass
+        relaxed = distances[:num_states]
+        previous = np.empty_like(relaxed)
+        candidate = np.empty_like(relaxed)
+        while True:
+            np.copyto(previous, relaxed)
+            for slot in range(4):
+                np.take(distances, targets[slot], axis=0, out=candidate)
+                candidate += weights[slot][:, None]
+                np.minimum(relaxed, candidate, out=relaxed)
+            if np.array_equal(relaxed, previous):
+                break
+        del previous, candidate
+
+        relaxed[relaxed >= infinity] = UNREACHABLE
+        return cls(cells, relaxed)
+
+    @classmethod
+    def load_or_build(cls, graph, use_cache=True):
+        """Load the table cached for this map, building and caching it if needed; None if the map is too large"""
+        artifact = graph.map.artifact
+        if artifact is not None and artifact.has('oracle_table'):
+            # Compiled map: the table is a view on the mapped file
+            width = graph.map.width
+            cells = [(cell % width, cell // width) for cell in np.flatnonzero(artifact.sections['walkable']).tolist()]
+            return cls(cells, artifact.sections['oracle_table'])
+        if len(cls.walkable_cells(graph.map)) > ORACLE_MAX_CELLS:
+            return None
+
+        cache_path = os.path.join(
+            CACHE_DIR, f"oracle-{graph.map.content_hash()}-{STRAIGHT}-{TURN}-{BACK}.npz")
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as data:
+                    cells = [tuple(pos) for pos in data['cells'].tolist()]
+                    return cls(cells, data['table'])
+            except (OSError, ValueError, KeyError):
+                pass  # Unreadable cache entry, rebuild below
+
+        oracle = cls.build(graph)
+        if oracle is None:
+            return None
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, cells=np.array(oracle.cells, dtype=np.int32), table=oracle.table)
+            os.replace(tmp_path, cache_path)
+        return oracle
+
+    def cost(self, pos, direction, target):
+        """Cost from state (pos, direction) to target, None if unreachable"""
+        i, j = self.cell_index.get(pos), self.cell_index.get(target)
+        if i is None or j is None:
+            return None
+        value = int(self.table[i * 4 + DIRECTIONS.index(direction), j])
+        return None if value == UNREACHABLE else value
+
+    def query(self, graph, start_pos, target_pos):
+        """Path from start to target by greedy descent on the table
+
+        Like the searches, the start may be left in any direction. Cells in
+        graph.temporary_obstacles are avoided by descending through the best
+        remaining successor, which can dead end (None) or miss the cheapest
+        detour; oracle_ghost searches instead when cells are blocked.
+        """
+        column = self.cell_index.get(target_pos)
+        if column is None or start_pos not in self.cell_index:
+            return None, None, None
+        if start_pos == target_pos:
+            return [start_pos], 0, start_pos
+
+        table = self.table
+        blocked = getattr(graph, 'temporary_obstacles', None) or ()
+        path = [start_pos]
+        seen = set()
+        state = None    # No previous direction at the start
+
+        pos = start_pos
+        while pos != target_pos:
+            best = None
+            for slot, direction in enumerate(DIRECTIONS):
+                next_pos = (pos[0] + direction[0], pos[1] + direction[1])
+                if next_pos not in self.cell_index or next_pos in blocked:
+                    continue
+                remaining = int(table[self.cell_index[next_pos] * 4 + slot, column])
+                if remaining == UNREACHABLE:
+                    continue
+                weight = STRAIGHT if state is None else step_cost(DIRECTIONS[state & 3], direction)
+                if best is None or weight + remaining < best[0]:
+                    best = (weight + remaining, next_pos, self.cell_index[next_pos] * 4 + slot)
+
+            if best is None or best[2] in seen:
+                return None, None, None
+            _, pos, state = best
+            seen.add(state)
+            path.append(pos)
+
+        return path, calculate_path_cost(path, graph.haunted_points), path[1]
+
+
+# Precompute the table ahead of time for a map file
+if __name__ == "__main__":
+    from map_implement import MapGraph
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    game_map = Map.load_map(map_file)
+
+    if game_map:
+        start_time = time.perf_counter()
+        oracle = DistanceOracle.load_or_build(MapGraph(game_map))
+        elapsed = time.perf_counter() - start_time
+        if oracle is None:
+            print(f"{map_file} has more than {ORACLE_MAX_CELLS} walkable cells, no distance oracle built")
+            sys.exit(1)
+        print(f"Distance oracle for {map_file}: {oracle.table.shape[0]} states x {oracle.table.shape[1]} cells")
+        print(f"Table size: {oracle.table.nbytes / 1024:.1f} KB, ready in {elapsed:.3f}s")
@@ -1,23 +1,74 @@
 from specification import *
+import hashlib
 
 """
 Map class for loading and storing game map information
+
+MapIndexer builds every position index of a map (player and ghost
+positions, dots, haunted points, walkable mask) in one pass over the rows,
+so load_map fills them while it streams the file.
 """
 
+
+class MapIndexer:
+    """Position indexes of a map, filled one row at a time"""
+
+    def __init__(self, width, compact=False):
+        self.width = width
+        self.height = 0
+        self.player_pos = None
+        self.ghost_positions = {BLUE_GHOST: None, PINK_GHOST: None, RED_GHOST: None, ORANGE_GHOST: None}
+        self.haunted_points = []
+        self.dot_positions = set()
+        self.dot_mask = bytearray()
+        self.walkable = bytearray()
+        self.grid = bytearray() if compact else None
+
+    def add_row(self, row):
+        y = self.height
+        width = self.width
+        # Cells past the end of a short row are walls
+        walkable = bytearray(width)
+        dot_mask = bytearray(width)
+        for x, cell in enumerate(row[:width]):
+            if cell == WALL:
+                continue
+            walkable[x] = 1
+            if cell == POINT:
+                dot_mask[x] = 1
+                self.dot_positions.add((x, y))
+            elif cell == HAUNTED_POINT:
+                self.haunted_points.append((x, y))
+            elif cell == PLAYER:
+                if self.player_pos is None:
+                    self.player_pos = (x, y)
+            elif cell in self.ghost_positions and self.ghost_positions[cell] is None:
+                self.ghost_positions[cell] = (x, y)
+        self.walkable += walkable
+        self.dot_mask += dot_mask
+        if self.grid is not None:
+            self.grid += ''.join(row[:width]).ljust(width, WALL).encode()
+        self.height += 1
+
 class Map:
-    def __init__(self, layout):
+    def __init__(self, layout, indexes=None):
         self.layout = layout
         self.height = len(layout)
         self.width = len(layout[0])
-        self.player_pos = self.find_position(PLAYER)
-        self.ghost_positions = {
-            BLUE_GHOST: self.find_position(BLUE_GHOST),
-            PINK_GHOST: self.find_position(PINK_GHOST),
-            RED_GHOST: self.find_position(RED_GHOST),
-            ORANGE_GHOST: self.find_position(ORANGE_GHOST)
-        }
-        self.haunted_points = self.find_all_positions(HAUNTED_POINT)
-        self.dots = self.count_dots()
+        if indexes is None:
+            indexes = MapIndexer(self.width)
+            for row in layout:
+                indexes.add_row(row)
+        self.player_pos = indexes.player_pos
+        self.ghost_positions = indexes.ghost_positions
+        self.haunted_points = indexes.haunted_points
+        self.haunted_set = frozenset(indexes.haunted_points)
+        self.dot_positions = indexes.dot_positions
+        self.dot_mask = indexes.dot_mask            # 1 per cell holding a dot, row-major
+        self.walkable = indexes.walkable            # 1 per cell that is not a wall, row-major
+        self.grid = indexes.grid                    # Cell characters, row-major (compact maps only)
+        self.dots = len(self.dot_positions)
+        self.artifact = None                        # MapArtifact the map was loaded from, if any
 
     def find_position(self, char):
         for y in range(self.height):
@@ -42,12 +93,69 @@ class Map:
                     count += 1
         return count
 
+    def content_hash(self):
+        """Hash of the map layout, used to key caches of precomputed data"""
+        return hashlib.sha256('\n'.join(''.join(row) for row in self.layout).encode()).hexdigest()[:16]
+
+    def scaled(self, factor):
+        """Bigger map made of factor x factor copies of this one, for benchmarks
+
+        The player and the ghosts stay in the top left copy, the other copies
+        get dots instead. Border walls between two copies get a door where
+        both sides are walkable so the copies are connected.
+        """
+        actors = (PLAYER, BLUE_GHOST, PINK_GHOST, RED_GHOST, ORANGE_GHOST)
+        height, width = self.height, self.width
+        layout = []
+        for tile_y in range(factor):
+            for y in range(height):
+                row = []
+                for tile_x in range(factor):
+                    first = tile_x == 0 and tile_y == 0
+                    row.extend(c if first or c not in actors else POINT for c in self.layout[y])
+                layout.append(row)
+
+        # Doors between copies: one per run of border positions walkable on both sides
+        vertical_doors = [y for y in range(height)
+                          if self.layout[y][width - 2] != WALL and self.layout[y][1] != WALL
+                          and not (y > 0 and self.layout[y - 1][width - 2] != WALL and self.layout[y - 1][1] != WALL)]
+        horizontal_doors = [x for x in range(width)
+                            if self.layout[height - 2][x] != WALL and self.layout[1][x] != WALL
+                            and not (x > 0 and self.layout[height - 2][x - 1] != WALL and self.layout[1][x - 1] != WALL)]
+        for tile in range(1, factor):
+            for tile_other in range(factor):
+                for y in vertical_doors:
+                    layout[tile_other * height + y][tile * width - 1] = POINT
+                    layout[tile_other * height + y][tile * width] = POINT
+                for x in horizontal_doors:
+                    layout[tile * height - 1][tile_other * width + x] = POINT
+                    layout[tile * height][tile_other * width + x] = POINT
+        return Map(layout)
+
     @staticmethod
-    def load_map(filename):
+    def load_map(filename, compact=False, use_artifact=True):
+        """Map read line by line, its indexes built during the same pass
+
+        With compact=True the map also keeps a row-major bytearray of its cells.
+        A compiled artifact of the current file content (map_artifact.py) is
+        memory-mapped instead of parsing the text when one exists.
+        """
+        if use_artifact:
+            from map_artifact import MapArtifact
+            artifact = MapArtifact.open(filename)
+            if artifact is not None:
+                return artifact.to_map()
         try:
+            layout = []
+            indexes = None
             with open(filename, 'r') as f:
-                layout = [list(line.strip()) for line in f]
-            return Map(layout)
+                for line in f:
+                    row = list(line.strip())
+                    if indexes is None:
+                        indexes = MapIndexer(len(row), compact)
+                    layout.append(row)
+                    indexes.add_row(row)
+            return Map(layout, indexes)
         except FileNotFoundError:
             print(f"Error: Map file {filename} not found")
             return None
@@ -69,4 +177,36 @@ if __name__ == "__main__":
         for ghost, pos in game_map.ghost_positions.items():
             print(f"- {ghost.capitalize()} ghost: {pos}")
         print(f"\nHaunted points: {game_map.haunted_points}")
-        print(f"Number of dots: {game_map.dots}")
\ No newline at end of file
+        print(f"Number of dots: {game_map.dots}")
+
+        # Benchmark: load time of scaled maps, one indexing pass against one scan per index
+        import os
+        import sys
+        import tempfile
+        import time
+
+        def load_with_scans(filename):
+            """The previous loader: read the file, then scan the layout once per index"""
+            with open(filename, 'r') as f:
+                layout = [list(line.strip()) for line in f]
+            height, width = len(layout), len(layout[0])
+            for char in (PLAYER, BLUE_GHOST, PINK_GHOST, RED_GHOST, ORANGE_GHOST, HAUNTED_POINT, POINT, POINT):
+                [(x, y) for y in range(height) for x in range(width) if layout[y][x] == char]
+            return layout
+
+        print("\nLoad time of scaled maps:")
+        for factor in [int(arg) for arg in sys.argv[1:]] or [1, 4, 16, 32]:
+            big_map = game_map.scaled(factor)
+            with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+                f.write('\n'.join(''.join(row) for row in big_map.layout))
+                big_file = f.name
+            try:
+                timings = []
+                for load in (load_with_scans, Map.load_map):
+                    start_time = time.perf_counter()
+                    load(big_file)
+                    timings.append(time.perf_counter() - start_time)
+                print(f"  x{factor:<3} {big_map.width}x{big_map.height} cells: scans {timings[0] * 1000:8.1f} ms, "
+                      f"one pass {timings[1] * 1000:8.1f} ms")
+            finally:
+                os.unlink(big_file)
\ No newline at end of file
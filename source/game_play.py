@@ -2,11 +2,17 @@ import os
 import keyboard
 import time
 import colorama
-from colorama import Fore, Back, Style
+from colorama import Back, Style
 from specification import *
 from game_map import Map
 from map_implement import MapGraph
-from algorithm import UCS_ghost, BFS_ghost, DFS_ghost, A_star_ghost
+from algorithm import GHOST_ALGORITHMS, ExpansionTrace, oracle_ghost, field_ghost
+from ghost_route import ReplanStats, SearchCounters, cached_next_step, store_route, advance_route
+from ghost_scheduler import GhostScheduler
+from planner_pool import PlannerPool
+from terminal_renderer import TerminalRenderer, PLAYER_GLYPH, HAUNTED_GLYPH, WALL_GLYPH
+from world_snapshot import World, WorldView, initial_snapshot
+from occupancy_grid import GridLayer, CELL_DOT, cells_of
 import threading
 import random
 import sys
@@ -14,8 +20,10 @@ import sys
 # Initialize colorama
 colorama.init(autoreset=True)
 
-class GamePlay:
-    def __init__(self, map_dir=MAP_DIR):
+class GamePlay(WorldView):
+    def __init__(self, map_dir=MAP_DIR, use_distance_oracle=False, use_distance_field=False,
+                 ghost_algorithms=None, use_process_pool=False,
+                 search_stats=False, search_trace=None, telemetry=None):
         """Initialize game with a map"""
         self.game_map = Map.load_map(map_dir)
         if not self.game_map:
@@ -23,12 +31,41 @@ class GamePlay:
             exit(1)
             
         self.graph = MapGraph(self.game_map)
-        self.player_pos = self.game_map.player_pos
+        # uint8 cell grid and bitboards of walls, dots and haunted points
+        self.grid = GridLayer(self.game_map)
+
+        # Pathfinding algorithm of each ghost
+        self.ghost_algorithms = dict(GHOST_ALGORITHMS)
+        if use_distance_oracle:
+            # Cost-optimal ghosts read their moves from the precomputed table
+            self.graph.distance_oracle()
+            self.ghost_algorithms[RED_GHOST] = oracle_ghost
+            self.ghost_algorithms[PINK_GHOST] = oracle_ghost
+        if use_distance_field:
+            # Every ghost reads its move from one shared reverse search from the player
+            for ghost_type in self.ghost_algorithms:
+                self.ghost_algorithms[ghost_type] = field_ghost
+        if ghost_algorithms:
+            # Algorithms chosen per ghost override the defaults above
+            self.ghost_algorithms.update(ghost_algorithms)
         self.planned_next_positions = {}
-        self.planned_positions_lock = threading.Lock()
+        # Optional frame, latency and lock wait histograms
+        self.telemetry = telemetry
+        self.planned_positions_lock = telemetry.lock_for('planned_positions_lock') if telemetry else threading.Lock()
+        self.replan_stats = ReplanStats()
+        # Optional worker processes for the searches, graph in shared memory
+        self.planner_pool = PlannerPool(self.game_map) if use_process_pool else None
+        # Optional per ghost search counters, with sampled expansions written to a JSONL trace
+        self.search_trace = ExpansionTrace(search_trace) if search_trace else None
+        self.search_counters = SearchCounters(self.search_trace) if search_stats or search_trace else None
 
-        # Create a copy of the map layout that we'll modify
+        # Copy of the map layout the display erases eaten dots from (render thread only);
+        # start cells are blank, the actors are drawn over them
         self.map_display = [list(row) for row in self.game_map.layout]
+        for pos in [self.game_map.player_pos, *self.game_map.ghost_positions.values()]:
+            if pos is not None:
+                self.map_display[pos[1]][pos[0]] = EMPTY
+        self.drawn_dots = self.grid.dots
         
         # Initialize ghost positions and assign letters based on algorithm name
         self.ghosts = {}
@@ -56,7 +93,6 @@ class GamePlay:
                 'letter': letter,
                 'color': color,
                 'algorithm': ghost_type,
-                'lock': threading.Lock(),
                 'last_move_time': time.time(),
                 'has_moved': False,
                 'movement_type': STRAIGHT_MOVEMENT,
@@ -67,15 +103,14 @@ class GamePlay:
 
             self.initial_ghost_positions.add(pos)    
         
-        # Game status
-        self.game_over = False
-        self.win = False
-        self.score = 0
-        self.moves = 0
-        self.previous_map = {}
+        # Lock of the writers (player moves, ghost moves); readers use the published snapshot
+        self.game_lock = self.telemetry.lock_for('game_lock') if self.telemetry else threading.Lock()
+        
+        # Game status shared between threads, published as immutable snapshots
+        self.world = World(self.grid, initial_snapshot(self.grid, self.game_map.player_pos, self.ghosts), self.game_lock)
         
-        # Track collected haunted points
-        self.collected_haunted = set()
+        # Frame buffer of the terminal, only changed cells are written
+        self.renderer = TerminalRenderer(self.game_map.width, self.game_map.height, self.game_map.haunted_points)
         
         # Timer for move cooldown
         self.last_move_time = time.time()
@@ -87,11 +122,8 @@ class GamePlay:
         self.fps = 0
         self.fps_update_time = time.time()
         
-        # Lock for thread safety
-        self.game_lock = threading.Lock()
-        
-        # Ghost threads
-        self.ghost_threads = {}
+        # One scheduler moves every ghost
+        self.ghost_scheduler = None
         
         # Display settings
         self.show_fps = True
@@ -101,7 +133,8 @@ class GamePlay:
         os.system('cls' if os.name == 'nt' else 'clear')
 
     def display_map(self):
-        """Display the game map with colored entities"""
+        """Display the game map with colored entities, one write per frame"""
+        draw_start = time.perf_counter()
         # Update FPS counter
         self.frame_count += 1
         current_time = time.time()
@@ -109,51 +142,42 @@ class GamePlay:
             self.fps = self.frame_count / (current_time - self.fps_update_time)
             self.frame_count = 0
             self.fps_update_time = current_time
-        
-        # Print the colored map
-        sys.stdout.write(f"\033[1;1H\nPacman Game:")
-        if self.show_fps:
-           sys.stdout.write(f"\033[3;1HFPS: {self.fps:.1f}\n")
-        print("=" * 23)
-        
-        current_map = {}  # Store new state
-
-        for y, row in enumerate(self.map_display):
-            for x, cell in enumerate(row):
-                sys.stdout.write("\033[?25l")
-                sys.stdout.flush()
-                pos = (x, y)
-
-                # Determine display character
-                if pos == self.player_pos:
-                    char = Back.GREEN + 'P' + Style.RESET_ALL
-                elif any(pos == ghost['pos'] for ghost in self.ghosts.values()):
-                    ghost_info = next(g for g in self.ghosts.values() if g['pos'] == pos)
-                    char = ghost_info['color'] + ghost_info['letter'] + Style.RESET_ALL
-                elif pos in self.game_map.haunted_points:
-                    char = Back.MAGENTA + 'H' + Style.RESET_ALL
-                elif cell == '#':
-                    char = Back.WHITE + Fore.BLACK + '#' + Style.RESET_ALL
-                else:
-                    char = cell
 
-                current_map[pos] = char
+        # The whole frame is drawn from one snapshot, without locking
+        world = self.world.snapshot
+        
+        # Erase the dots eaten since the last frame
+        if self.drawn_dots is not world.dots_left:
+            for x, y in map(self.grid.position, cells_of(self.drawn_dots & ~world.dots_left)):
+                self.map_display[y][x] = ' '
+            self.drawn_dots = world.dots_left
 
-                # Only print when there's a change
-                if self.previous_map.get(pos) != char:
-                    sys.stdout.write(f"\033[{y+5};{x+1}H{char}")
-                    sys.stdout.flush()
+        # Occupancy index: the player is drawn over ghosts, earlier ghosts over later ones
+        actors = {}
+        for ghost_type, ghost in reversed(list(world.ghosts.items())):
+            actors[ghost.pos] = self.ghosts[ghost_type]['color'] + self.ghosts[ghost_type]['letter'] + Style.RESET_ALL
+        actors[world.player_pos] = PLAYER_GLYPH
 
-        # Update previous map state
-        self.previous_map = current_map
+        frame_stats = self.renderer.stats()
+        lines = [(2, 1, "Pacman Game:")]
+        if self.show_fps:
+            lines.append((3, 1, f"FPS: {self.fps:.1f} | Frame: {frame_stats['last_bytes']} B, "
+                                f"{frame_stats['last_ms']:.2f} ms"))
+        lines.append((4, 1, "=" * 23))
 
         # Display game info
-        right_x = 40;
-        sys.stdout.write(f"\033[2;{right_x}H" + "=" * 23)  
-        sys.stdout.write(f"\033[3;{right_x}HMoves: {self.moves} | Score: {self.score}")
-        sys.stdout.write(f"\033[4;{right_x}HControls: ↑↓←→ to move, Q to quit")
-        sys.stdout.write(f"\033[5;{right_x}H" + "=" * 23)
-        sys.stdout.flush()
+        right_x = 40
+        replan = self.replan_stats.snapshot()
+        jitter = self.ghost_scheduler.jitter_stats() if self.ghost_scheduler else {'mean_ms': 0.0, 'max_ms': 0.0}
+        lines += [
+            (2, right_x, "=" * 23),
+            (3, right_x, f"Moves: {world.moves} | Score: {world.score}"),
+            (4, right_x, "Controls: ↑↓←→ to move, Q to quit"),
+            (5, right_x, "=" * 23),
+            (6, right_x, f"Searches avoided: {replan['avoided_per_second']:.1f}/s "
+                         f"({replan['avoided_ratio']:.0%}) | Ghost jitter: "
+                         f"{jitter['mean_ms']:.1f}/{jitter['max_ms']:.1f} ms"),
+        ]
 
         # Display ghost movement speeds
         movement_names = {
@@ -162,41 +186,57 @@ class GamePlay:
             BACK_MOVEMENT: "Quay lại"
         }
         line = 8  # Starting line for ghost info
-        
-        # Display legend
-        sys.stdout.write(f"\033[{line+1};{right_x}HLegend:")
-        sys.stdout.write(f"\033[{line+2};{right_x}H" + Back.GREEN + 'P' + Style.RESET_ALL + " - Player")
 
+        # Display legend
+        lines.append((line + 1, right_x, "Legend:"))
+        lines.append((line + 2, right_x, PLAYER_GLYPH + " - Player"))
         for ghost_type, ghost in self.ghosts.items():
-            sys.stdout.write(f"\033[{line+3};{right_x}H{ghost['color']}{ghost['letter']}{Style.RESET_ALL} - {ghost['algorithm']} Ghost")
+            lines.append((line + 3, right_x, f"{ghost['color']}{ghost['letter']}{Style.RESET_ALL} - {ghost['algorithm']} Ghost"))
             line += 1
-
-        sys.stdout.write(f"\033[{line+3};{right_x}H" + Back.MAGENTA + 'H' + Style.RESET_ALL + " - Haunted Point")
-        sys.stdout.write(f"\033[{line+4};{right_x}H" + Back.WHITE + Fore.BLACK + '#' + Style.RESET_ALL + " - Wall")
+        lines.append((line + 3, right_x, HAUNTED_GLYPH + " - Haunted Point"))
+        lines.append((line + 4, right_x, WALL_GLYPH + " - Wall"))
 
         line += 7
-
-        sys.stdout.write(f"\033[{line};{right_x}HTốc độ di chuyển ma:")
+        lines.append((line, right_x, "Tốc độ di chuyển ma:"))
         line += 1
-        for ghost_type, ghost in self.ghosts.items():
-            movement_type = ghost.get('movement_type', STRAIGHT_MOVEMENT)
-            update_interval = ghost.get('update_interval', STRAIGHT * BASE_GHOST_UPDATE_INTERVAL)
-            move_str = movement_names.get(movement_type, "Unknown")
+        for ghost_type, state in world.ghosts.items():
+            ghost = self.ghosts[ghost_type]
+            update_interval = state.update_interval
+            move_str = movement_names.get(state.movement_type, "Unknown")
 
             haunted_status = ""
-            if ghost.get('is_haunted', False):
-                haunted_status = f" (Haunted: {ghost.get('haunted_steps_remaining', 0)} bước còn lại)      "
+            if state.is_haunted:
+                haunted_status = f" (Haunted: {state.haunted_steps_remaining} bước còn lại)"
 
-                sys.stdout.write(f"\033[{line};{right_x}H{ghost['color']}{ghost['letter']}{Style.RESET_ALL}: {move_str} - {update_interval:.2f}s{haunted_status}")
+            lines.append((line, right_x, f"{ghost['color']}{ghost['letter']}{Style.RESET_ALL}: {move_str} - {update_interval:.2f}s{haunted_status}"))
             line += 1
 
+        # Rolling search counters of every ghost
+        if self.search_counters:
+            searches = self.search_counters.snapshot()
+            line += 1
+            lines.append((line, right_x, "Searches (recent mean):"))
+            line += 1
+            for ghost_type, ghost in self.ghosts.items():
+                search = searches.get(ghost_type)
+                if search:
+                    lines.append((line, right_x, f"{ghost['color']}{ghost['letter']}{Style.RESET_ALL}: "
+                                                 f"{search['expanded']:.0f} expanded, {search['pushes']:.0f} pushes, "
+                                                 f"frontier {search['peak_frontier']}, {search['mean_us']:.0f} us"))
+                    line += 1
+
+        # Only the changed cells and lines, in one write and one flush
+        frame = self.renderer.render(self.map_display, actors, lines)
+        flush_start = time.perf_counter()
+        sys.stdout.write(frame)
+        sys.stdout.flush()
+        if self.telemetry:
+            self.telemetry.record('frame_draw', flush_start - draw_start)
+            self.telemetry.record('frame_flip', time.perf_counter() - flush_start)
+
     def is_valid_move(self, pos):
         """Check if a position is a valid move (not a wall and within bounds)"""
-        x, y = pos
-        if x < 0 or x >= self.game_map.width or y < 0 or y >= self.game_map.height:
-            return False
-        
-        return self.game_map.layout[y][x] != '#'
+        return self.grid.is_walkable(pos)
     
     def can_move_now(self):
         """Check if enough time has passed since the last move"""
@@ -211,31 +251,27 @@ class GamePlay:
             return False
             
         dx, dy = direction
-        new_pos = (self.player_pos[0] + dx, self.player_pos[1] + dy)
-        
-        if self.is_valid_move(new_pos):
-            with self.game_lock:
-                self.last_move_time = time.time()
-                
-                old_x, old_y = self.player_pos
-                
-                # Keep haunted points visible when player leaves them
-                if self.player_pos in self.game_map.haunted_points:
-                    self.map_display[old_y][old_x] = 'H'
-                else:
-                    # Restore original space
-                    self.map_display[old_y][old_x] = ' '
-                
-                # Update player position
-                self.player_pos = new_pos
-                self.moves += 1
-            
-            return True
-        
-        return False
+
+        def step(world):
+            new_pos = (world.player_pos[0] + dx, world.player_pos[1] + dy)
+            if not self.grid.is_walkable(new_pos):
+                return None
+            # Dots the player walks over are eaten; haunted points stay visible
+            cell = self.grid.cell(new_pos)
+            dots_left, dots_eaten = world.dots_left, world.dots_eaten
+            if self.grid.cells[cell] == CELL_DOT and dots_left >> cell & 1:
+                dots_left ^= 1 << cell
+                dots_eaten += 1
+            return {'player_pos': new_pos, 'player_direction': direction, 'moves': world.moves + 1,
+                    'dots_left': dots_left, 'dots_eaten': dots_eaten}
+
+        if self.world.update(step) is None:
+            return False
+        self.last_move_time = time.time()
+        return True
     
-    def ghost_movement_thread(self, ghost_type):
-        """Thread function for independent ghost movement"""
+    def move_ghost(self, ghost_type, current_time):
+        """One ghost move, run by the scheduler when due; returns the wait until the next one"""
         ghost = self.ghosts[ghost_type]
         
         # Ensure ghost has necessary attributes
@@ -252,210 +288,194 @@ class GamePlay:
         if 'is_haunted' not in ghost:
             ghost['is_haunted'] = False
         
-        while not self.game_over:
-            current_time = time.time()
+        # Calculate path for ghost based on current player position, read from the latest snapshot
+        world = self.world.snapshot
+        current_player_pos = world.player_pos
+        current_ghost_pos = ghost['pos']
+        current_direction = ghost['previous_direction']
+        
+        # Get positions of all other ghosts to avoid collisions
+        other_ghost_positions = set()
+        for other_type, other_ghost in world.ghosts.items():
+            if other_type != ghost_type:
+                other_ghost_positions.add(other_ghost.pos)
+        
+        # Inside corridors keep following the path of the last search
+        next_pos = cached_next_step(self.graph, ghost, current_player_pos, other_ghost_positions)
+        self.replan_stats.record(searched=next_pos is None)
+
+        # Try to find a valid next position that doesn't collide with other ghosts
+        max_attempts = 3
+        attempt = 0
+        
+        while attempt < max_attempts and next_pos is None:
+            # Choose algorithm based on ghost type
+            algorithm = self.ghost_algorithms[ghost_type]
+            # Player position the path was planned for (a prefetched result may use an older one)
+            route_target = current_player_pos
+            if self.planner_pool:
+                ghost_path, _, candidate_next_pos, route_target = self.planner_pool.plan(
+                    ghost_type, algorithm, self.graph, current_ghost_pos, current_player_pos)
+            elif self.search_counters:
+                ghost_path, _, candidate_next_pos = self.search_counters.search(
+                    ghost_type, algorithm, self.graph, current_ghost_pos, current_player_pos)
+            else:
+                ghost_path, _, candidate_next_pos = algorithm(self.graph, current_ghost_pos, current_player_pos)
+            
+            # Check if next position is valid
+            if candidate_next_pos and candidate_next_pos not in other_ghost_positions:
+                next_pos = candidate_next_pos
+                store_route(ghost, ghost_path, route_target)
+            else:
+                # Find alternative if position is occupied
+                if candidate_next_pos:
+                    self.graph.add_temporary_obstacle(candidate_next_pos)
+                attempt += 1
+        
+        # Stay in place if no valid position found
+        if next_pos is None:
+            if hasattr(self.graph, 'remove_all_temporary_obstacles'):
+                self.graph.remove_all_temporary_obstacles()
+            ghost['last_move_time'] = current_time
+            return ghost['update_interval']
+        
+        # Clean up temporary obstacles
+        if hasattr(self.graph, 'remove_all_temporary_obstacles'):
+            self.graph.remove_all_temporary_obstacles()
+            
+        # Check for position conflicts with other ghosts
+        with self.planned_positions_lock:
+            conflict = False
+            conflicting_ghost = None
+            
+            for other_type, planned_pos in self.planned_next_positions.items():
+                if planned_pos == next_pos:
+                    conflict = True
+                    conflicting_ghost = other_type
+                    break
+            
+            if conflict:
+                # Randomly decide which ghost wins the conflict
+                if random.choice([True, False]):
+                    self.planned_next_positions[ghost_type] = next_pos
+                    if conflicting_ghost in self.planned_next_positions:
+                        del self.planned_next_positions[conflicting_ghost]
+                else:
+                    next_pos = None
+            else:
+                self.planned_next_positions[ghost_type] = next_pos
+        
+        # Move ghost to next position if allowed
+        if next_pos:
+            # Final check if position is still free; only the scheduler thread moves ghosts,
+            # so the occupancy of the latest snapshot holds the exact cells of the others
+            occupant = self.world.snapshot.occupancy.get(self.grid.cell(next_pos), ghost_type)
+            is_position_free = occupant == ghost_type
             
-            # Check if it's time to update
-            if current_time - ghost['last_move_time'] >= ghost['update_interval']:
-                # Calculate path for ghost based on current player position
-                with self.game_lock:
-                    current_player_pos = self.player_pos
-                    current_ghost_pos = ghost['pos']
-                    current_direction = ghost['previous_direction']
-                    
-                    # Get positions of all other ghosts to avoid collisions
-                    other_ghost_positions = set()
-                    for other_type, other_ghost in self.ghosts.items():
-                        if other_type != ghost_type:
-                            other_ghost_positions.add(other_ghost['pos'])
+            if is_position_free:
+                old_pos = ghost['pos']
                 
-                # Try to find a valid next position that doesn't collide with other ghosts
-                max_attempts = 3
-                attempt = 0
-                next_pos = None
+                # Calculate direction
+                dx = next_pos[0] - ghost['pos'][0]
+                dy = next_pos[1] - ghost['pos'][1]
+                new_direction = (dx, dy)
                 
-                while attempt < max_attempts and next_pos is None:
-                    # Choose algorithm based on ghost type
-                    if ghost_type == PINK_GHOST:
-                        ghost_path, _, candidate_next_pos = A_star_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == BLUE_GHOST:
-                        ghost_path, _, candidate_next_pos = BFS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == ORANGE_GHOST:
-                        ghost_path, _, candidate_next_pos = DFS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == RED_GHOST:
-                        ghost_path, _, candidate_next_pos = UCS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    
-                    # Check if next position is valid
-                    if candidate_next_pos and candidate_next_pos not in other_ghost_positions:
-                        next_pos = candidate_next_pos
+                # Check if new position is a haunted point
+                if next_pos in self.game_map.haunted_set:
+                    ghost['is_haunted'] = True
+                    ghost['haunted_steps_remaining'] = HAUNTED_POINT_INDEX
+                    ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+                else:
+                    # If currently haunted, decrease remaining steps
+                    if ghost['haunted_steps_remaining'] > 0:
+                        ghost['haunted_steps_remaining'] -= 1
+                        ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
                     else:
-                        # Find alternative if position is occupied
-                        if candidate_next_pos:
-                            self.graph.add_temporary_obstacle(candidate_next_pos)
-                        attempt += 1
-                        time.sleep(0.01)
-                
-                # Stay in place if no valid position found
-                if next_pos is None:
-                    if hasattr(self.graph, 'remove_all_temporary_obstacles'):
-                        self.graph.remove_all_temporary_obstacles()
-                    ghost['last_move_time'] = current_time
-                    time.sleep(0.01)
-                    continue
-                
-                # Clean up temporary obstacles
-                if hasattr(self.graph, 'remove_all_temporary_obstacles'):
-                    self.graph.remove_all_temporary_obstacles()
-                    
-                # Check for position conflicts with other ghosts
-                with self.planned_positions_lock:
-                    conflict = False
-                    conflicting_ghost = None
-                    
-                    for other_type, planned_pos in self.planned_next_positions.items():
-                        if planned_pos == next_pos:
-                            conflict = True
-                            conflicting_ghost = other_type
-                            break
-                    
-                    if conflict:
-                        # Randomly decide which ghost wins the conflict
-                        if random.choice([True, False]):
-                            self.planned_next_positions[ghost_type] = next_pos
-                            if conflicting_ghost in self.planned_next_positions:
-                                del self.planned_next_positions[conflicting_ghost]
+                        # If not haunted, calculate speed based on movement type
+                        ghost['is_haunted'] = False
+                        
+                        # Determine movement type (straight, turn, back)
+                        if ghost['previous_direction'] == new_direction:
+                            movement_type = STRAIGHT_MOVEMENT
+                            ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+                        elif (ghost['previous_direction'][0] == -new_direction[0] and 
+                              ghost['previous_direction'][1] == -new_direction[1]):
+                            movement_type = BACK_MOVEMENT
+                            ghost['update_interval'] = BACK * BASE_GHOST_UPDATE_INTERVAL
                         else:
-                            next_pos = None
-                    else:
-                        self.planned_next_positions[ghost_type] = next_pos
-                
-                # Move ghost to next position if allowed
-                if next_pos:
-                    with ghost['lock']:
-                        # Final check if position is still free
-                        is_position_free = True
-                        with self.game_lock:
-                            for other_type, other_ghost in self.ghosts.items():
-                                if other_type != ghost_type and other_ghost['pos'] == next_pos:
-                                    is_position_free = False
-                                    break
+                            movement_type = TURN_MOVEMENT
+                            ghost['update_interval'] = TURN * BASE_GHOST_UPDATE_INTERVAL
                         
-                        if is_position_free:
-                            old_pos = ghost['pos']
-                            
-                            # Calculate direction
-                            dx = next_pos[0] - ghost['pos'][0]
-                            dy = next_pos[1] - ghost['pos'][1]
-                            new_direction = (dx, dy)
-                            
-                            # Check if new position is a haunted point
-                            if next_pos in self.game_map.haunted_points:
-                                ghost['is_haunted'] = True
-                                ghost['haunted_steps_remaining'] = HAUNTED_POINT_INDEX
-                                ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                            else:
-                                # If currently haunted, decrease remaining steps
-                                if ghost['haunted_steps_remaining'] > 0:
-                                    ghost['haunted_steps_remaining'] -= 1
-                                    ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                                else:
-                                    # If not haunted, calculate speed based on movement type
-                                    ghost['is_haunted'] = False
-                                    
-                                    # Determine movement type (straight, turn, back)
-                                    if ghost['previous_direction'] == new_direction:
-                                        movement_type = STRAIGHT_MOVEMENT
-                                        ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                                    elif (ghost['previous_direction'][0] == -new_direction[0] and 
-                                          ghost['previous_direction'][1] == -new_direction[1]):
-                                        movement_type = BACK_MOVEMENT
-                                        ghost['update_interval'] = BACK * BASE_GHOST_UPDATE_INTERVAL
-                                    else:
-                                        movement_type = TURN_MOVEMENT
-                                        ghost['update_interval'] = TURN * BASE_GHOST_UPDATE_INTERVAL
-                                    
-                                    ghost['movement_type'] = movement_type
-                            
-                            # Update ghost's previous direction
-                            ghost['previous_direction'] = new_direction
-                            
-                            # Move ghost
-                            ghost['pos'] = next_pos
-                            
-                            # Clean up initial position if this is the first move
-                            if not ghost.get('has_moved', False):
-                                with self.game_lock:
-                                    old_x, old_y = old_pos
-                                    is_used_by_other = False
-                                    for other_type, other_ghost in self.ghosts.items():
-                                        if other_type != ghost_type and other_ghost['pos'] == old_pos:
-                                            is_used_by_other = True
-                                            break
-                                    
-                                    if not is_used_by_other:
-                                        if old_pos in self.game_map.haunted_points:
-                                            self.map_display[old_y][old_x] = 'H'
-                                        else:
-                                            self.map_display[old_y][old_x] = ' '
-                                    
-                                    ghost['has_moved'] = True
-                            
-                            # Remove from planned positions
-                            with self.planned_positions_lock:
-                                if ghost_type in self.planned_next_positions:
-                                    del self.planned_next_positions[ghost_type]
+                        ghost['movement_type'] = movement_type
                 
-                # Check for collision with player
-                with self.game_lock:
-                    if ghost['pos'] == self.player_pos:
-                        self.game_over = True
+                # Update ghost's previous direction
+                ghost['previous_direction'] = new_direction
                 
-                ghost['last_move_time'] = current_time
-            
-            # Small sleep to prevent CPU hogging
-            time.sleep(0.01)
+                # Move ghost
+                ghost['pos'] = next_pos
+                advance_route(ghost, next_pos)
+                # The ghost searches again at the next junction: send the query ahead
+                if self.planner_pool and next_pos in self.graph.junction_graph().nodes:
+                    self.planner_pool.prefetch(ghost_type, self.ghost_algorithms[ghost_type], next_pos, current_player_pos)
+                
+                # Mark the first move (the start cell is blank in map_display already)
+                ghost['has_moved'] = True
+                
+                # Remove from planned positions
+                with self.planned_positions_lock:
+                    if ghost_type in self.planned_next_positions:
+                        del self.planned_next_positions[ghost_type]
+    
+        # Publish the new ghost state; it catches the player if they share a cell
+        self.world.publish_ghost(ghost_type, ghost)
+        
+        ghost['last_move_time'] = current_time
+        return ghost['update_interval']
     
-    def start_ghost_threads(self):
-        """Start a thread for each ghost to move independently"""
-        for ghost_type in self.ghosts:
-            thread = threading.Thread(target=self.ghost_movement_thread, args=(ghost_type,))
-            thread.daemon = True
-            self.ghost_threads[ghost_type] = thread
-            thread.start()
+    def start_ghost_scheduler(self):
+        """Start one scheduler moving every ghost"""
+        move_ghost = self.telemetry.timed('ghost_decision', self.move_ghost) if self.telemetry else self.move_ghost
+        self.ghost_scheduler = GhostScheduler(move_ghost, lambda: self.game_over)
+        for ghost_type, ghost in self.ghosts.items():
+            ghost.setdefault('last_move_time', time.time())
+            ghost.setdefault('update_interval', STRAIGHT * BASE_GHOST_UPDATE_INTERVAL)
+            self.ghost_scheduler.schedule(ghost_type, ghost['last_move_time'] + ghost['update_interval'])
+        self.ghost_scheduler.start()
     
     def check_collisions(self):
         """Check if player collided with any ghost"""
-        with self.game_lock:
-            for ghost in self.ghosts.values():
-                if self.player_pos == ghost['pos']:
-                    self.game_over = True
-                    return True
-            return False
+        world = self.world.snapshot
+        if self.grid.cell(world.player_pos) in world.occupancy:
+            self.game_over = True
+            if self.ghost_scheduler:
+                self.ghost_scheduler.notify()
+            return True
+        return False
     
     def play(self):
         """Main game loop"""
         self.display_map()
         
-        # Start ghost threads for parallel movement
-        self.start_ghost_threads()
+        # Start the ghost scheduler
+        self.start_ghost_scheduler()
         
         while not self.game_over:
             frame_start_time = time.time()
+            frame_clock = time.perf_counter()
             
-            key_pressed = False
+            key_pressed = moved = False
             
             # Handle keyboard input
             if keyboard.is_pressed('up') or keyboard.is_pressed('w'):
-                key_pressed = self.move_player(UP)
+                key_pressed = moved = self.move_player(UP)
             elif keyboard.is_pressed('down') or keyboard.is_pressed('s'):
-                key_pressed = self.move_player(DOWN)
+                key_pressed = moved = self.move_player(DOWN)
             elif keyboard.is_pressed('left') or keyboard.is_pressed('a'):
-                key_pressed = self.move_player(LEFT)
+                key_pressed = moved = self.move_player(LEFT)
             elif keyboard.is_pressed('right') or keyboard.is_pressed('d'):
-                key_pressed = self.move_player(RIGHT)
+                key_pressed = moved = self.move_player(RIGHT)
             elif keyboard.is_pressed('q'):
-                with self.game_lock:
-                    self.game_over = True
+                self.game_over = True
                 key_pressed = True
             elif keyboard.is_pressed('f'):
                 # Toggle FPS display
@@ -464,12 +484,20 @@ class GamePlay:
                     self.last_f_press = time.time()
             
             # Check for collisions
+            collision_start = time.perf_counter()
             self.check_collisions()
+            if self.telemetry:
+                if moved:
+                    self.telemetry.input_received(frame_clock)
+                self.telemetry.record('frame_input', collision_start - frame_clock)
+                self.telemetry.record('frame_collision', time.perf_counter() - collision_start)
             
             # Update display when needed
             if key_pressed or time.time() - self.last_frame_time >= FRAME_TIME:
                 self.display_map()
                 self.last_frame_time = time.time()
+                if self.telemetry:
+                    self.telemetry.frame_presented(frame_clock)
             
             # Check game end condition
             if self.game_over:
@@ -490,7 +518,8 @@ class GamePlay:
                 time.sleep(sleep_time)
 
 # Run the game in text mode
-def game_text():
+def game_text(use_distance_oracle=False, use_distance_field=False, ghost_algorithms=None, use_process_pool=False, search_stats=False, search_trace=None,
+              telemetry=None):
     os.system('cls' if os.name == 'nt' else 'clear')
     # Try to install keyboard if not available
     try:
@@ -500,13 +529,24 @@ def game_text():
         os.system("pip install keyboard")
         import keyboard
     
+    game = None
     try:
-        game = GamePlay()
+        game = GamePlay(use_distance_oracle=use_distance_oracle, use_distance_field=use_distance_field,
+                        ghost_algorithms=ghost_algorithms,
+                        use_process_pool=use_process_pool, search_stats=search_stats,
+                        search_trace=search_trace, telemetry=telemetry)
         game.play()
     except KeyboardInterrupt:
         print("\nGame terminated by user.")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if game and game.planner_pool:
+            game.planner_pool.close()
+        if game and game.search_trace:
+            game.search_trace.close()
+        if telemetry:
+            telemetry.export()
 
 if __name__ == "__main__":
     game_text()
\ No newline at end of file
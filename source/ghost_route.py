@@ -0,0 +1,144 @@
+from specification import *
+from algorithm import SearchStats
+from collections import deque
+import inspect
+import threading
+import time
+
+"""
+Cached ghost routes
+
+A ghost keeps the path of its last search in ghost['path'] (starting at its
+own position) and the player position it was planned for in
+ghost['path_target']. Inside corridors the next move is forced, so the ghost
+just advances along the stored path and only searches again when:
+- it stands on a decision point (a node of the junction graph),
+- the player left the predicted region around the planned target,
+- the next cell of the path is taken by another ghost, or the path ran out.
+"""
+
+
+class ReplanStats:
+    """Searches run and searches avoided by the ghosts of one game"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.searches = 0
+        self.avoided = 0
+
+    def record(self, searched):
+        with self.lock:
+            if searched:
+                self.searches += 1
+            else:
+                self.avoided += 1
+
+    def snapshot(self):
+        """Totals and rates per second since the game started"""
+        with self.lock:
+            searches, avoided = self.searches, self.avoided
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        decisions = searches + avoided
+        return {
+            'searches': searches,
+            'avoided': avoided,
+            'searches_per_second': searches / elapsed,
+            'avoided_per_second': avoided / elapsed,
+            'avoided_ratio': avoided / decisions if decisions else 0.0,
+        }
+
+
+class SearchCounters:
+    """Rolling counters of the last SEARCH_STATS_WINDOW searches of every ghost
+
+    Only created when search statistics are requested: the ghosts then search
+    through search(), which passes a SearchStats to the algorithms accepting
+    one and keeps its counters. Searches answered by the process pool run in
+    the workers and are not counted.
+    """
+
+    def __init__(self, trace=None, window=SEARCH_STATS_WINDOW):
+        self.lock = threading.Lock()
+        self.trace = trace              # Optional ExpansionTrace shared by all the searches
+        self.window = window
+        self.recent = {}                # ghost_type -> deque of SearchStats snapshots
+        self.totals = {}                # ghost_type -> searches counted since the game started
+        self.accepts_stats = {}         # algorithm -> True if it takes stats=
+
+    def search(self, ghost_type, algorithm, graph, start_pos, target_pos):
+        """(path, cost, next_pos) of algorithm, its counters recorded for ghost_type"""
+        accepts = self.accepts_stats.get(algorithm)
+        if accepts is None:
+            accepts = self.accepts_stats[algorithm] = 'stats' in inspect.signature(algorithm).parameters
+        if not accepts:
+            return algorithm(graph, start_pos, target_pos)
+        stats = SearchStats(self.trace)
+        result = algorithm(graph, start_pos, target_pos, stats=stats)
+        self.record(ghost_type, stats)
+        return result
+
+    def record(self, ghost_type, stats):
+        with self.lock:
+            recent = self.recent.get(ghost_type)
+            if recent is None:
+                recent = self.recent[ghost_type] = deque(maxlen=self.window)
+            recent.append(stats.snapshot())
+            self.totals[ghost_type] = self.totals.get(ghost_type, 0) + 1
+
+    def snapshot(self):
+        """Per ghost: searches so far, means over the window, worst peak frontier and time"""
+        with self.lock:
+            recent = {ghost_type: list(window) for ghost_type, window in self.recent.items()}
+            totals = dict(self.totals)
+        result = {}
+        for ghost_type, window in recent.items():
+            count = len(window)
+            result[ghost_type] = {
+                'searches': totals[ghost_type],
+                'expanded': sum(row['expanded'] for row in window) / count,
+                'pushes': sum(row['pushes'] for row in window) / count,
+                'duplicate_pops': sum(row['duplicate_pops'] for row in window) / count,
+                'peak_frontier': max(row['peak_frontier'] for row in window),
+                'path_length': sum(row['path_length'] for row in window) / count,
+                'mean_us': sum(row['elapsed_ns'] for row in window) / count / 1000,
+                'max_us': max(row['elapsed_ns'] for row in window) / 1000,
+            }
+        return result
+
+
+def in_predicted_region(ghost, player_pos):
+    """True while the player is close to the planned target or on the path"""
+    target = ghost.get('path_target')
+    if target is None:
+        return False
+    if abs(player_pos[0] - target[0]) + abs(player_pos[1] - target[1]) <= REPLAN_RADIUS:
+        return True
+    return player_pos in ghost['path']
+
+
+def cached_next_step(graph, ghost, player_pos, occupied=()):
+    """Next position read from the ghost's stored path, None when it must replan"""
+    path = ghost.get('path')
+    if not path or len(path) < 2 or path[0] != ghost['pos']:
+        return None
+    if ghost['pos'] in graph.junction_graph().nodes:
+        return None     # Decision point
+    if path[1] in occupied or not in_predicted_region(ghost, player_pos):
+        return None
+    return path[1]
+
+
+def store_route(ghost, path, player_pos):
+    """Remember the path of a fresh search"""
+    ghost['path'] = path
+    ghost['path_target'] = player_pos
+
+
+def advance_route(ghost, next_pos):
+    """Drop the cell just left from the stored path"""
+    path = ghost.get('path')
+    if path and len(path) > 1 and path[1] == next_pos:
+        ghost['path'] = path[1:]
+    else:
+        ghost['path'] = None
@@ -0,0 +1,148 @@
+from specification import *
+import heapq
+import threading
+import sys
+import time
+
+"""
+GhostScheduler: one worker thread moving every ghost on time
+
+Replaces one polling thread per ghost. Ghosts sit in a priority queue keyed
+by the time their next move is due; the worker sleeps on a condition until
+the earliest deadline and runs that ghost's move, which reads the latest
+game state itself. Player moves do not wake the worker: they change no
+deadline, and every move plans from the snapshot it reads. notify() wakes it
+when the game ends so the thread exits without waiting for the next deadline.
+The next deadline is the previous one plus the interval returned by the
+move, so ghost timing does not drift; a move that finishes past its next
+deadline reschedules from now instead of firing a burst of catch-up moves,
+and counts as an overrun. The lateness of every move (wake-up time minus
+deadline) is recorded as jitter.
+"""
+
+
+class GhostScheduler:
+    def __init__(self, move_ghost, is_over):
+        """move_ghost(ghost_type, due_time) runs one move and returns the next interval"""
+        self.move_ghost = move_ghost
+        self.is_over = is_over
+        self.queue = []                 # (due time, order, ghost type)
+        self.counter = 0
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+        # Jitter of the moves run so far, in seconds
+        self.moves = 0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+        self.overruns = 0               # Moves whose next deadline had passed when they finished
+
+    def schedule(self, ghost_type, due_time):
+        with self.condition:
+            heapq.heappush(self.queue, (due_time, self.counter, ghost_type))
+            self.counter += 1
+            self.condition.notify()
+
+    def notify(self):
+        """Wake the worker before the next deadline, so it sees the game is over"""
+        with self.condition:
+            self.condition.notify()
+
+    def start(self):
+        """Start the worker; a stopped scheduler can be started again"""
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        # Ghosts of a new game are scheduled again before the next start
+        with self.condition:
+            self.queue.clear()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped or self.is_over():
+                        return
+                    if self.queue:
+                        delay = self.queue[0][0] - time.time()
+                        if delay <= 0:
+                            due_time, _, ghost_type = heapq.heappop(self.queue)
+                            break
+                        self.condition.wait(delay)
+                    else:
+                        self.condition.wait()
+
+            # The move runs outside the condition so notify() never waits for a search
+            jitter = time.time() - due_time
+            self.moves += 1
+            self.total_jitter += jitter
+            self.max_jitter = max(self.max_jitter, jitter)
+            interval = self.move_ghost(ghost_type, due_time)
+            next_time = due_time + interval
+            now = time.time()
+            if next_time < now:
+                self.overruns += 1
+                next_time = now
+            self.schedule(ghost_type, next_time)
+
+    def jitter_stats(self):
+        """Moves run, overruns, mean and max lateness in milliseconds"""
+        moves = self.moves
+        return {
+            'moves': moves,
+            'overruns': self.overruns,
+            'mean_ms': self.total_jitter / moves * 1000 if moves else 0.0,
+            'max_ms': self.max_jitter * 1000,
+        }
+
+
+# Benchmark: CPU time and timing jitter, polling threads against the scheduler
+if __name__ == "__main__":
+    num_ghosts = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    interval = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+
+    def polling(ghost_type, deadline, lateness):
+        """The loop of the old ghost threads, with an empty move"""
+        last_move_time = time.time()
+        while time.time() < deadline:
+            current_time = time.time()
+            if current_time - last_move_time >= interval:
+                lateness.append(current_time - last_move_time - interval)
+                last_move_time = current_time
+            time.sleep(0.01)
+
+    start_cpu, start_time = time.process_time(), time.time()
+    lateness = []
+    threads = [threading.Thread(target=polling, args=(ghost, start_time + seconds, lateness))
+               for ghost in range(num_ghosts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    polling_cpu = time.process_time() - start_cpu
+    print(f"{num_ghosts} ghosts for {seconds:.0f}s, one move every {interval}s")
+    print(f"  Polling threads: CPU {polling_cpu * 1000:7.1f} ms, "
+          f"jitter mean {sum(lateness) / len(lateness) * 1000:.2f} ms, max {max(lateness) * 1000:.2f} ms")
+
+    start_cpu, start_time = time.process_time(), time.time()
+    deadline = start_time + seconds
+    scheduler = GhostScheduler(lambda ghost_type, due_time: interval, lambda: time.time() >= deadline)
+    for ghost in range(num_ghosts):
+        scheduler.schedule(ghost, start_time + interval)
+    scheduler.start()
+    time.sleep(max(0.0, deadline - time.time()))
+    scheduler.stop()
+    scheduler_cpu = time.process_time() - start_cpu
+    stats = scheduler.jitter_stats()
+    print(f"  Scheduler      : CPU {scheduler_cpu * 1000:7.1f} ms, "
+          f"jitter mean {stats['mean_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
@@ -0,0 +1,369 @@
+from specification import *
+from game_map import Map
+from array import array
+import heapq
+import json
+import random
+import sys
+
+"""
+Incremental A* ghost planner (D* Lite)
+
+The search runs backward from the target over the exact search states of
+ReverseStateGraph and keeps g / rhs values between calls. Only the part of
+the search tree affected by a change is repaired:
+- the ghost moving shifts the heuristic origin (km update),
+- the target moving is an edge change: the states of the old and the new
+  target cell lose / gain a zero cost edge to a virtual goal node,
+- cells passed to graph.add_temporary_obstacle make their edges infinite.
+Each cell also has a virtual start node whose successors are the first moves,
+since the ghost may leave its cell in any direction like in the searches.
+
+The target is the player, who moves on most ticks. Each move changes every
+cost to the goal, so a fresh backward search (the default) or a repair of the
+whole tree expands several times more states than A* from scratch over the
+smaller cell graph. The planner is therefore only an experiment measured by
+the benchmark below; no game ghost uses it.
+"""
+
+INFINITY = 1 << 60
+
+
+class DStarLiteGhost:
+    """Ghost algorithm with the (graph, start_pos, target_pos) signature"""
+
+    def __init__(self, repair_target_moves=False):
+        self.repair_target_moves = repair_target_moves
+        self.graph = None
+        self.expanded = 0           # States expanded since creation
+        self.last_expanded = 0      # States expanded by the last call
+
+    def _initialize(self, graph, target_pos):
+        self.graph = graph
+        self.reverse_graph = reverse_graph = graph.reverse_state_graph()
+        self.num_states = reverse_graph.num_states
+        self.goal = self.num_states + len(reverse_graph.cells)
+        size = self.goal + 1
+
+        self.g = array('q', [INFINITY]) * size
+        self.rhs = array('q', [INFINITY]) * size
+        self.queue = []
+        self.queued = {}            # Current key of every state in the queue
+        self.km = 0
+        self.blocked = set()
+        self.last_start = None
+        self.target = target_pos
+        self.target_cell = reverse_graph.cell_index[target_pos]
+
+        self.rhs[self.goal] = 0
+        self._push(self.goal)
+
+    # State helpers
+
+    def _cell(self, state):
+        if state < self.num_states:
+            return state // HAUNTED_POINT_INDEX >> 2
+        if state < self.goal:
+            return state - self.num_states
+        return self.target_cell
+
+    def _cell_states(self, cell):
+        """Valid packed states of a cell"""
+        base = cell * 4 * HAUNTED_POINT_INDEX
+        states = [base + dir_index * HAUNTED_POINT_INDEX for dir_index in range(4)]
+        states.extend(range(base + 1, base + HAUNTED_POINT_INDEX))
+        return states
+
+    def _heuristic(self, state):
+        x, y = self.reverse_graph.cells[self._cell(state)]
+        sx, sy = self.reverse_graph.cells[self.start_cell]
+        return (abs(x - sx) + abs(y - sy)) * STRAIGHT
+
+    def _key(self, state):
+        value = min(self.g[state], self.rhs[state])
+        return (value + self._heuristic(state) + self.km, value)
+
+    def _push(self, state):
+        key = self._key(state)
+        self.queued[state] = key
+        heapq.heappush(self.queue, (key, state))
+
+    def _is_blocked(self, state):
+        return state != self.goal and self.reverse_graph.cells[self._cell(state)] in self.blocked
+
+    def _successors(self, state):
+        reverse_graph = self.reverse_graph
+        if state == self.goal:
+            return []
+        if state >= self.num_states:
+            return reverse_graph.first_moves(state - self.num_states)
+        moves = reverse_graph.successors(state)
+        if self._cell(state) == self.target_cell:
+            moves.append((self.goal, 0))
+        return moves
+
+    def _predecessors(self, state):
+        if state == self.goal:
+            return self._cell_states(self.target_cell)
+        if state >= self.num_states:
+            return []  # Virtual start nodes have no predecessors
+
+        reverse_graph = self.reverse_graph
+        preds = [reverse_graph.pred_sources[k]
+                 for k in range(reverse_graph.pred_offsets[state], reverse_graph.pred_offsets[state + 1])]
+
+        # Virtual start nodes whose first move reaches this state
+        cell_dir, remaining = divmod(state, HAUNTED_POINT_INDEX)
+        cell, dir_index = cell_dir >> 2, cell_dir & 3
+        if remaining == 0:
+            dx, dy = DIRECTIONS[dir_index]
+            x, y = reverse_graph.cells[cell]
+            previous = reverse_graph.cell_index.get((x - dx, y - dy))
+            if previous is not None and not reverse_graph.haunted[previous]:
+                preds.append(self.num_states + previous)
+        elif remaining == HAUNTED_POINT_INDEX - 1:
+            for _, neighbor in reverse_graph.neighbors[cell]:
+                if reverse_graph.haunted[neighbor]:
+                    preds.append(self.num_states + neighbor)
+        return preds
+
+    def _cost(self, state, next_state, weight):
+        if self._is_blocked(state) or self._is_blocked(next_state):
+            return INFINITY
+        return weight
+
+    # D* Lite
+
+    def _update_vertex(self, state):
+        if state != self.goal:
+            best = INFINITY
+            g = self.g
+            for next_state, weight in self._successors(state):
+                cost = self._cost(state, next_state, weight)
+                if cost < INFINITY and cost + g[next_state] < best:
+                    best = cost + g[next_state]
+            self.rhs[state] = best
+        self.queued.pop(state, None)
+        if self.g[state] != self.rhs[state]:
+            self._push(state)
+
+    def _top_key(self):
+        """Smallest key in the queue, None when it is empty"""
+        queue, queued = self.queue, self.queued
+        while queue and queued.get(queue[0][1]) != queue[0][0]:
+            heapq.heappop(queue)  # Stale entry
+        return queue[0][0] if queue else None
+
+    def _compute_shortest_path(self, start):
+        g, rhs = self.g, self.rhs
+        while True:
+            top_key = self._top_key()
+            if top_key is None or (top_key >= self._key(start) and rhs[start] <= g[start]):
+                break
+            old_key, state = heapq.heappop(self.queue)
+            new_key = self._key(state)
+            if old_key < new_key:
+                self._push(state)
+                continue
+            del self.queued[state]
+            self.last_expanded += 1
+            if g[state] > rhs[state]:
+                g[state] = rhs[state]
+                for pred in self._predecessors(state):
+                    self._update_vertex(pred)
+            else:
+                g[state] = INFINITY
+                for pred in self._predecessors(state):
+                    self._update_vertex(pred)
+                self._update_vertex(state)
+
+    def _cell_changed(self, cell):
+        """Edges into and out of a cell changed cost"""
+        for state in self._cell_states(cell):
+            self._update_vertex(state)
+            for pred in self._predecessors(state):
+                self._update_vertex(pred)
+        self._update_vertex(self.num_states + cell)
+
+    def __call__(self, graph, start_pos, target_pos):
+        reverse_graph = graph.reverse_state_graph()
+        if start_pos not in reverse_graph.cell_index or target_pos not in reverse_graph.cell_index:
+            return None, None, None
+        if start_pos == target_pos:
+            return [start_pos], 0, start_pos
+
+        self.start_cell = reverse_graph.cell_index[start_pos]
+
+        # A moved target shifts every cost to the goal, so unless told to
+        # repair the tree, a fresh backward search is cheaper
+        if self.graph is not graph or (target_pos != self.target and not self.repair_target_moves):
+            self._initialize(graph, target_pos)
+        self.last_expanded = 0
+
+        # The ghost moved: shift the heuristic origin
+        start = self.num_states + self.start_cell
+        if self.last_start is not None and self.last_start != start:
+            x, y = reverse_graph.cells[self.last_start - self.num_states]
+            sx, sy = start_pos
+            self.km += (abs(x - sx) + abs(y - sy)) * STRAIGHT
+        self.last_start = start
+        self._update_vertex(start)
+
+        # Temporary obstacles added or removed since the last call
+        blocked = set(getattr(graph, 'temporary_obstacles', None) or ())
+        changed = blocked ^ self.blocked
+        self.blocked = blocked
+        for pos in changed:
+            if pos in reverse_graph.cell_index:
+                self._cell_changed(reverse_graph.cell_index[pos])
+
+        # The target moved: the states of the old and new target cells lose /
+        # gain their zero cost edge to the virtual goal
+        if target_pos != self.target:
+            old_cell = self.target_cell
+            self.target = target_pos
+            self.target_cell = reverse_graph.cell_index[target_pos]
+            for state in self._cell_states(old_cell) + self._cell_states(self.target_cell):
+                self._update_vertex(state)
+
+        self._compute_shortest_path(start)
+        self.expanded += self.last_expanded
+
+        # The start may stay overconsistent, its rhs is the path cost
+        if self.rhs[start] >= INFINITY:
+            return None, None, None
+
+        # Follow the cheapest successors from the start
+        path = [start_pos]
+        cost = 0
+        state = start
+        while state != self.goal:
+            best = None
+            for next_state, weight in self._successors(state):
+                step = self._cost(state, next_state, weight)
+                if step < INFINITY and (best is None or step + self.g[next_state] < best[0]):
+                    best = (step + self.g[next_state], next_state, step)
+            if best is None or best[0] >= INFINITY or len(path) > self.num_states:
+                return None, None, None
+            _, state, step = best
+            cost += step
+            if state != self.goal:
+                path.append(reverse_graph.position_of(state))
+
+        return path, cost, path[1]
+
+
+class CountingGraph:
+    """Wraps a MapGraph and counts the states the searches expand"""
+
+    def __init__(self, graph):
+        self.haunted_points = graph.haunted_points
+        self.graph = self
+        self._map_graph = graph
+        self._edges = graph.graph
+        self.expanded = 0
+
+    def get(self, state, default=None):
+        self.expanded += 1
+        return self._edges.get(state, default)
+
+    def landmarks(self):
+        return self._map_graph.landmarks()
+
+    def reverse_state_graph(self):
+        return _CountingStates(self._map_graph.reverse_state_graph(), self)
+
+
+class _CountingStates:
+    """Packed state graph whose successors calls are counted as expansions"""
+
+    def __init__(self, states, counter):
+        self.cells = states.cells
+        self.cell_index = states.cell_index
+        self.first_moves = states.first_moves
+        self._successors = states.successors
+        self._counter = counter
+
+    def successors(self, state):
+        self._counter.expanded += 1
+        return self._successors(state)
+
+
+def simulate_session(graph, ticks, seed=0):
+    """Synthetic play session: the player wanders, the ghost follows A*
+
+    Returns a list of {"player": [x, y], "ghost": [x, y]} ticks, the format
+    accepted by the benchmark from a recorded session file.
+    """
+    from algorithm import A_star_ghost
+
+    rng = random.Random(seed)
+    reverse_graph = graph.reverse_state_graph()
+    player = graph.map.player_pos
+    ghost = next(pos for pos in graph.map.ghost_positions.values() if pos)
+    heading = rng.choice(DIRECTIONS)
+    session = []
+    for tick in range(ticks):
+        # The player keeps its heading, turns at walls or at random, and
+        # sometimes stands still
+        if rng.random() < 0.3:
+            session.append({'player': list(player), 'ghost': list(ghost)})
+            continue
+        options = [d for d in DIRECTIONS if (player[0] + d[0], player[1] + d[1]) in reverse_graph.cell_index]
+        if heading not in options or rng.random() < 0.2:
+            heading = rng.choice(options)
+        player = (player[0] + heading[0], player[1] + heading[1])
+
+        # The ghost moves every other tick
+        if tick % 2 == 0:
+            _, _, next_pos = A_star_ghost(graph, ghost, player)
+            if next_pos:
+                ghost = next_pos
+        if ghost == player:
+            ghost = rng.choice(reverse_graph.cells)
+        session.append({'player': list(player), 'ghost': list(ghost)})
+    return session
+
+
+# Benchmark: states expanded per tick, A* from scratch against D* Lite
+if __name__ == "__main__":
+    from map_implement import MapGraph
+    from algorithm import A_star_ghost
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    session_file = sys.argv[2] if len(sys.argv) > 2 else None
+    game_map = Map.load_map(map_file)
+
+    if game_map:
+        graph = MapGraph(game_map)
+        if session_file:
+            with open(session_file) as f:
+                session = [json.loads(line) for line in f if line.strip()]
+        else:
+            session = simulate_session(graph, 2000)
+
+        counting_graph = CountingGraph(graph)
+        planner = DStarLiteGhost()
+        repairing_planner = DStarLiteGhost(repair_target_moves=True)
+        astar_per_tick, incremental_per_tick, repair_per_tick = [], [], []
+        for tick in session:
+            player, ghost = tuple(tick['player']), tuple(tick['ghost'])
+            if player == ghost:
+                continue
+            counting_graph.expanded = 0
+            A_star_ghost(counting_graph, ghost, player)
+            astar_per_tick.append(counting_graph.expanded)
+            planner(graph, ghost, player)
+            incremental_per_tick.append(planner.last_expanded)
+            repairing_planner(graph, ghost, player)
+            repair_per_tick.append(repairing_planner.last_expanded)
+
+        def summary(values):
+            values = sorted(values)
+            return (f"mean {sum(values) / len(values):8.1f}  median {values[len(values) // 2]:6d}  "
+                    f"p95 {values[int(len(values) * 0.95)]:6d}  total {sum(values):9d}")
+
+        print(f"Map {map_file}: {len(astar_per_tick)} ticks")
+        print(f"A* (from scratch) states expanded per tick: {summary(astar_per_tick)}")
+        print(f"D* Lite (incremental)                     : {summary(incremental_per_tick)}")
+        print(f"D* Lite repairing target moves too        : {summary(repair_per_tick)}")
@@ -0,0 +1,251 @@
+from specification import *
+from game_map import Map
+from algorithm import step_cost
+import heapq
+import random
+import sys
+import time
+
+"""
+JunctionGraph: MapGraph with corridors contracted into macro edges
+
+Nodes are junctions, dead ends and haunted points, i.e. every cell that does
+not have exactly two exits or that changes the cost rules. Each corridor
+between two nodes becomes one macro edge per direction, holding its cells,
+the direction of every move and the prefix sums of the turn-aware weights of
+its inner moves. Haunted points are nodes, so inside a macro edge the haunted
+counter only counts down and the cost of any stretch is read off the prefix
+sums. Searches run over (node, direction, haunted_remaining) and the cell path
+is only expanded at the end, with costs exactly as calculate_path_cost gives.
+"""
+
+INFINITY = 1 << 60
+
+
+class MacroEdge:
+    """Corridor walked from a node: cells[-1] is the node reached"""
+
+    __slots__ = ('source', 'target', 'cells', 'dirs', 'prefix')
+
+    def __init__(self, source, cells, dirs):
+        self.source = source
+        self.target = cells[-1]
+        self.cells = cells
+        self.dirs = dirs                # Direction index of the move into each cell
+        # prefix[j] = sum of the weights of moves 1..j-1, move 0 depends on the arrival
+        self.prefix = [0, 0]
+        for j in range(1, len(dirs)):
+            self.prefix.append(self.prefix[-1] + step_cost(DIRECTIONS[dirs[j - 1]], DIRECTIONS[dirs[j]]))
+
+    def cost(self, lo, hi, first_cost, remaining):
+        """Cost of moves lo..hi-1 and the haunted counter left afterwards
+
+        first_cost is the weight of move lo when it is not under the haunted
+        effect; the later moves use the corridor's own turns.
+        """
+        if remaining > 0:
+            total = STRAIGHT
+            remaining -= 1
+        else:
+            total = first_cost
+        straight = min(remaining, hi - lo - 1)
+        total += straight * STRAIGHT + self.prefix[hi] - self.prefix[lo + 1 + straight]
+        return total, remaining - straight
+
+
+class JunctionGraph:
+    def __init__(self, graph):
+        self.graph = graph
+        layout = graph.map.layout
+        width, height = graph.map.width, graph.map.height
+        walkable = {(x, y) for y in range(height) for x in range(width) if layout[y][x] != WALL}
+        self.haunted = set(graph.haunted_points)
+
+        def exits(pos):
+            return [(dir_index, (pos[0] + dx, pos[1] + dy)) for dir_index, (dx, dy) in enumerate(DIRECTIONS)
+                    if (pos[0] + dx, pos[1] + dy) in walkable]
+
+        self.nodes = {pos for pos in walkable if len(exits(pos)) != 2 or pos in self.haunted}
+        self.edges = []                 # All macro edges
+        self.out_edges = {}             # node -> [edge ids]
+        self.corridor = {}              # corridor cell -> [(edge id, index in edge.cells)]
+
+        pending = sorted(self.nodes)
+        unvisited = sorted(walkable - self.nodes)
+        while pending or unvisited:
+            if not pending:
+                # A loop without any junction: make one of its cells a node
+                cell = unvisited.pop()
+                if cell in self.corridor:
+                    continue
+                self.nodes.add(cell)
+                pending.append(cell)
+
+            node = pending.pop()
+            self.out_edges[node] = []
+            for dir_index, cell in exits(node):
+                cells, dirs = [cell], [dir_index]
+                previous = node
+                while cell not in self.nodes:
+                    dir_index, next_cell = next((d, c) for d, c in exits(cell) if c != previous)
+                    previous, cell = cell, next_cell
+                    cells.append(cell)
+                    dirs.append(dir_index)
+                edge_id = len(self.edges)
+                self.edges.append(MacroEdge(node, cells, dirs))
+                self.out_edges[node].append(edge_id)
+                for index, corridor_cell in enumerate(cells[:-1]):
+                    self.corridor.setdefault(corridor_cell, []).append((edge_id, index))
+
+        self.num_cells = len(walkable)
+        self.expanded = 0               # States expanded by the last search
+
+    def _exits_from(self, pos):
+        """Ways out of a start cell as (edge id, index of the first cell)"""
+        if pos in self.nodes:
+            return [(edge_id, 0) for edge_id in self.out_edges[pos]]
+        # Mid corridor: continue along either direction of the corridor
+        return [(edge_id, index + 1) for edge_id, index in self.corridor[pos]]
+
+    def search(self, start_pos, target_pos, blocked=()):
+        """Cheapest (path, cost, next_pos) from start_pos to target_pos
+
+        Cells in blocked are neither entered nor left.
+        """
+        self.expanded = 0
+        if start_pos not in self.nodes and start_pos not in self.corridor:
+            return None, None, None
+        if target_pos not in self.nodes and target_pos not in self.corridor:
+            return None, None, None
+        if start_pos == target_pos:
+            return [start_pos], 0, start_pos
+
+        edges = self.edges
+        # Index of the target in the edges running through it
+        target_in = {edge_id: index for edge_id, index in self.corridor.get(target_pos, ())}
+        if blocked:
+            def clear(edge_id, lo, hi):
+                cells = edges[edge_id].cells
+                return not any(cells[j] in blocked for j in range(lo, hi))
+        else:
+            def clear(edge_id, lo, hi):
+                return True
+
+        frontier = []
+        expanded = 0
+        best = {}
+        parents = {}                    # state -> (parent state, edge id, lo)
+        counter = 0
+
+        def relax(cost, state, parent, edge_id, lo):
+            nonlocal counter
+            if cost < best.get(state, INFINITY):
+                best[state] = cost
+                parents[state] = (parent, edge_id, lo)
+                heapq.heappush(frontier, (cost, counter, state))
+                counter += 1
+
+        def leave(node_state, cost, remaining, arrival_dir, edge_id, lo):
+            """Walk an edge from cell index lo, towards its node or the target"""
+            edge = edges[edge_id]
+            first = edge.dirs[lo]
+            first_cost = STRAIGHT if arrival_dir is None else step_cost(DIRECTIONS[arrival_dir], DIRECTIONS[first])
+            if edge_id in target_in and target_in[edge_id] >= lo:
+                hi = target_in[edge_id] + 1
+                if clear(edge_id, lo, hi):
+                    move_cost, _ = edge.cost(lo, hi, first_cost, remaining)
+                    relax(cost + move_cost, ('target',), node_state, edge_id, lo)
+            hi = len(edge.cells)
+            if clear(edge_id, lo, hi):
+                move_cost, left = edge.cost(lo, hi, first_cost, remaining)
+                arrival = 0 if left else edge.dirs[-1]
+                relax(cost + move_cost, (edge.target, arrival, left), node_state, edge_id, lo)
+
+        # The start has no previous direction; a haunted start resets the counter
+        start_remaining = HAUNTED_POINT_INDEX if start_pos in self.haunted else 0
+        for edge_id, lo in self._exits_from(start_pos):
+            leave(None, 0, start_remaining, None, edge_id, lo)
+
+        while frontier:
+            cost, _, state = heapq.heappop(frontier)
+            if cost > best[state]:
+                continue
+            expanded += 1
+            if state == ('target',) or state[0] == target_pos:
+                self.expanded = expanded
+                return self._expand_path(start_pos, state, parents, target_in, cost)
+            node, arrival_dir, remaining = state
+            if node in blocked:
+                continue
+            if node in self.haunted:
+                remaining = HAUNTED_POINT_INDEX
+            for edge_id in self.out_edges[node]:
+                leave(state, cost, remaining, None if remaining else arrival_dir, edge_id, 0)
+
+        self.expanded = expanded
+        return None, None, None
+
+    def _expand_path(self, start_pos, state, parents, target_in, cost):
+        """Rebuild the cell path from the macro edge parent pointers"""
+        pieces = []
+        while state is not None:
+            parent, edge_id, lo = parents[state]
+            cells = self.edges[edge_id].cells
+            hi = target_in[edge_id] + 1 if state == ('target',) else len(cells)
+            pieces.append(cells[lo:hi])
+            state = parent
+        path = [start_pos]
+        for piece in reversed(pieces):
+            path.extend(piece)
+        return path, cost, path[1]
+
+
+# Benchmark: states expanded by UCS on the cell graph against the junction graph
+if __name__ == "__main__":
+    from map_implement import MapGraph
+    from algorithm import UCS_ghost
+    from incremental_planner import CountingGraph
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    scales = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+    base_map = Map.load_map(map_file)
+
+    if base_map:
+        for scale in scales:
+            game_map = base_map.scaled(scale) if scale > 1 else base_map
+            graph = MapGraph(game_map)
+            start_time = time.perf_counter()
+            junction_graph = JunctionGraph(graph)
+            build_time = time.perf_counter() - start_time
+
+            cells = list(junction_graph.nodes | set(junction_graph.corridor))
+            rng = random.Random(0)
+            pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(200)]
+            counting_graph = CountingGraph(graph)
+
+            ucs_expanded = junction_expanded = exact = total = 0
+            ucs_time = junction_time = 0.0
+            for start, target in pairs:
+                counting_graph.expanded = 0
+                start_time = time.perf_counter()
+                UCS_ghost(counting_graph, start, target)
+                ucs_time += time.perf_counter() - start_time
+                ucs_expanded += counting_graph.expanded
+
+                start_time = time.perf_counter()
+                _, cost, _ = junction_graph.search(start, target)
+                junction_time += time.perf_counter() - start_time
+                junction_expanded += junction_graph.expanded
+
+                if cost is not None:
+                    total += 1
+                    exact += cost == graph.distance_field(target).next_step(start)[1]
+
+            print(f"Map {map_file} x{scale}: {junction_graph.num_cells} cells, "
+                  f"{len(junction_graph.nodes)} nodes, {len(junction_graph.edges)} macro edges "
+                  f"(built in {build_time * 1000:.1f} ms)")
+            print(f"  UCS on cells     : {ucs_expanded / len(pairs):8.1f} states expanded per search, "
+                  f"{ucs_time * 1000:8.1f} ms")
+            print(f"  Junction graph   : {junction_expanded / len(pairs):8.1f} states expanded per search, "
+                  f"{junction_time * 1000:8.1f} ms")
+            print(f"  Costs equal to the exact distance field on {exact}/{total} searches")
@@ -0,0 +1,145 @@
+from specification import *
+from game_map import Map
+import numpy as np
+import random
+import sys
+import time
+
+"""
+Landmark (ALT) heuristic for A*
+
+K landmark cells are picked far apart (farthest point selection) and the
+distance from each landmark to every walkable cell is computed once per map
+with a level synchronous BFS in NumPy. At query time the heuristic of a cell
+is the triangle inequality bound max over landmarks of
+|d(L, target) - d(L, cell)|, times STRAIGHT.
+
+The distances count steps, not turn-aware weights: under the haunted rule any
+move may cost STRAIGHT, and a start may leave in any direction, so turn-aware
+costs do not obey the triangle inequality. Every move costs at least
+STRAIGHT, which keeps the bound admissible and consistent for both the side
+dict searches and the exact haunted-aware ones.
+"""
+
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+class LandmarkHeuristic:
+    def __init__(self, cells, landmarks, distances):
+        self.cells = cells                                  # Walkable cell positions
+        self.cell_index = {pos: i for i, pos in enumerate(cells)}
+        self.landmarks = landmarks                          # Landmark cell indexes
+        self.distances = distances                          # uint16 (landmarks, cells) step counts
+
+    @staticmethod
+    def _bfs(neighbors, source):
+        """Step distance from source to every cell, one NumPy pass per BFS level"""
+        num_cells = len(neighbors) - 1
+        distances = np.full(num_cells + 1, UNREACHABLE, dtype=np.uint16)
+        distances[source] = 0
+        frontier = np.array([source])
+        level = 0
+        while frontier.size:
+            level += 1
+            reached = neighbors[frontier].ravel()
+            reached = np.unique(reached[distances[reached] == UNREACHABLE])
+            distances[reached] = level
+            frontier = reached
+        return distances[:num_cells]
+
+    @classmethod
+    def build(cls, graph, count=LANDMARK_COUNT):
+        layout = graph.map.layout
+        cells = [(x, y) for y in range(graph.map.height) for x in range(graph.map.width)
+                 if layout[y][x] != WALL]
+        cell_index = {pos: i for i, pos in enumerate(cells)}
+        num_cells = len(cells)
+
+        # Neighbour table, the extra last row is a sentinel that is never reached
+        neighbors = np.full((num_cells + 1, 4), num_cells, dtype=np.int64)
+        for i, (x, y) in enumerate(cells):
+            for slot, (dx, dy) in enumerate(DIRECTIONS):
+                neighbors[i, slot] = cell_index.get((x + dx, y + dy), num_cells)
+
+        # Farthest point selection: each landmark is the cell furthest from
+        # the ones already picked, starting from the cell furthest from cell 0
+        landmarks, rows = [], []
+        if num_cells:
+            nearest = cls._bfs(neighbors, 0).astype(np.int64)
+            nearest[nearest == UNREACHABLE] = -1
+            for _ in range(min(count, num_cells)):
+                landmark = int(np.argmax(nearest))
+                if nearest[landmark] == 0 and landmarks:
+                    break       # Every cell is already a landmark
+                row = cls._bfs(neighbors, landmark)
+                landmarks.append(landmark)
+                rows.append(row)
+                reachable = row != UNREACHABLE
+                nearest = np.where(reachable & (nearest >= 0), np.minimum(nearest, row), nearest)
+                nearest[landmark] = 0
+
+        distances = np.array(rows, dtype=np.uint16).reshape(len(rows), num_cells)
+        return cls(cells, landmarks, distances)
+
+    def bounds(self, target_pos):
+        """Heuristic of every cell towards target_pos, as a list indexed like cells"""
+        target = self.cell_index.get(target_pos)
+        if target is None or not len(self.landmarks):
+            return [0] * len(self.cells)
+        distances = self.distances.astype(np.int32)
+        to_target = distances[:, target:target + 1]
+        # A landmark that cannot reach either cell tells nothing about the pair
+        usable = (distances != UNREACHABLE) & (to_target != UNREACHABLE)
+        gaps = np.where(usable, np.abs(distances - to_target), 0)
+        return (gaps.max(axis=0) * STRAIGHT).tolist()
+
+    def heuristic(self, target_pos):
+        """h(pos) function for the searches, bounds computed once per target"""
+        bounds = self.bounds(target_pos)
+        cell_index = self.cell_index
+        return lambda pos: bounds[cell_index[pos]]
+
+
+# Report: states expanded per query, Manhattan against landmark heuristic
+if __name__ == "__main__":
+    from map_implement import MapGraph
+    from algorithm import A_star_ghost, A_star_landmark_ghost, UCS_exact_ghost, _search_exact
+    from incremental_planner import CountingGraph
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    scales = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+    base_map = Map.load_map(map_file)
+
+    if base_map:
+        for scale in scales:
+            game_map = base_map.scaled(scale) if scale > 1 else base_map
+            graph = MapGraph(game_map)
+            start_time = time.perf_counter()
+            landmarks = graph.landmarks()
+            build_time = time.perf_counter() - start_time
+
+            rng = random.Random(0)
+            cells = landmarks.cells
+            pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(200)]
+            counting_graph = CountingGraph(graph)
+
+            print(f"Map {map_file} x{scale}: {len(cells)} cells, {len(landmarks.landmarks)} landmarks "
+                  f"(built in {build_time * 1000:.1f} ms)")
+            for name, search in (("Manhattan", A_star_ghost), ("landmarks", A_star_landmark_ghost)):
+                expanded = []
+                start_time = time.perf_counter()
+                for start, target in pairs:
+                    counting_graph.expanded = 0
+                    search(counting_graph, start, target)
+                    expanded.append(counting_graph.expanded)
+                elapsed = time.perf_counter() - start_time
+                expanded.sort()
+                print(f"  A* {name:<10}: {sum(expanded) / len(expanded):8.1f} states expanded per query "
+                      f"(median {expanded[len(expanded) // 2]}), {elapsed * 1000:8.1f} ms")
+
+            # Admissibility: exact A* with the landmark bound must match exact UCS
+            optimal = 0
+            for start, target in pairs:
+                cost = _search_exact(graph, start, target, heuristic=landmarks.heuristic(target))[1]
+                optimal += cost == UCS_exact_ghost(graph, start, target)[1]
+            print(f"  Exact A* with landmarks optimal on {optimal}/{len(pairs)} queries")
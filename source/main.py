@@ -4,10 +4,28 @@ from game_play import game_text
 from test import test_interface
 from map_implement import view_graph_interactive
 from pacman import PacmanGame2D
+from algorithm import ALGORITHMS_BY_NAME, GHOST_ALGORITHMS
+from benchmark import run_benchmark, REGRESSION_TOLERANCE
+from telemetry import Telemetry
 
-def run_pacman_2d():
+def parse_ghost_algorithms(specs):
+    """Turn -ghost R=ucs-bucket options into {ghost_type: algorithm}"""
+    ghost_algorithms = {}
+    for spec in specs or ():
+        ghost_type, _, name = spec.partition('=')
+        if ghost_type not in GHOST_ALGORITHMS or name not in ALGORITHMS_BY_NAME:
+            raise argparse.ArgumentTypeError(
+                f"invalid -ghost {spec!r}: expected one of {sorted(GHOST_ALGORITHMS)}=one of {sorted(ALGORITHMS_BY_NAME)}")
+        ghost_algorithms[ghost_type] = ALGORITHMS_BY_NAME[name]
+    return ghost_algorithms
+
+def run_pacman_2d(use_distance_oracle=False, use_distance_field=False, ghost_algorithms=None, use_process_pool=False, search_stats=False, search_trace=None,
+                  telemetry=None):
     """Run the 2D Pacman game"""
-    game = PacmanGame2D()
+    game = PacmanGame2D(use_distance_oracle=use_distance_oracle, use_distance_field=use_distance_field,
+                        ghost_algorithms=ghost_algorithms,
+                        use_process_pool=use_process_pool, search_stats=search_stats,
+                        search_trace=search_trace, telemetry=telemetry)
     game.run()
 
 def main():
@@ -20,19 +38,59 @@ def main():
     group.add_argument('-2d', dest='twod', action='store_true', help='Run 2D game')
     group.add_argument('-graph', action='store_true', help='Run interactive graph visualization')
     group.add_argument('-algo', action='store_true', help='Test algorithms')
+    group.add_argument('-bench', action='store_true', help='Benchmark the algorithms (non-interactive)')
+
+    # Options for the game modes
+    parser.add_argument('-oracle', action='store_true', help='Red and pink ghosts use the precomputed distance oracle')
+    parser.add_argument('-field', action='store_true', help='All ghosts share one distance field from the player')
+    parser.add_argument('-pool', action='store_true', help='Ghost searches run in worker processes')
+    parser.add_argument('-ghost', action='append', metavar='GHOST=ALGORITHM',
+                        help=f"Algorithm of one ghost, e.g. R=ucs-bucket (choices: {', '.join(ALGORITHMS_BY_NAME)})")
+    parser.add_argument('-stats', action='store_true', help='Show rolling search counters of every ghost')
+    parser.add_argument('-trace', metavar='FILE', help='Write sampled search expansions as JSONL (implies -stats)')
+    parser.add_argument('-telemetry', metavar='FILE',
+                        help='Record frame, input, ghost and lock wait latencies; write them as CSV (.csv) '
+                             'or Prometheus text (any other name) every few seconds and at exit')
+
+    # Options for the benchmark
+    parser.add_argument('-maps', nargs='+', help='Map files to benchmark (default: the stock map)')
+    parser.add_argument('-scales', nargs='+', type=int, default=[1], help='Scale factors of every map')
+    parser.add_argument('-algorithms', nargs='+', choices=list(ALGORITHMS_BY_NAME), help='Algorithms (default: all)')
+    parser.add_argument('-pairs', type=int, default=100, help='Random (ghost, target) pairs per map')
+    parser.add_argument('-repeat', type=int, default=5, help='Timed runs of every query')
+    parser.add_argument('-seed', type=int, default=0, help='Seed of the random pairs')
+    parser.add_argument('-json', metavar='FILE', help='Write the results as JSON')
+    parser.add_argument('-baseline', metavar='FILE', help='Flag regressions against saved JSON results')
+    parser.add_argument('-tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='Median time increase allowed over the baseline')
     
     # Parse arguments
     args = parser.parse_args()
+    try:
+        ghost_algorithms = parse_ghost_algorithms(args.ghost)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if args.pool and (args.stats or args.trace):
+        # Searches run in the worker processes, out of reach of the counters
+        parser.error("-stats and -trace cannot be used with -pool")
+    
+    telemetry = Telemetry(args.telemetry) if args.telemetry else None
     
     # Run the appropriate function based on arguments
     if args.text:
-        game_text()
+        game_text(args.oracle, args.field, ghost_algorithms, args.pool, args.stats, args.trace,
+                  telemetry)
     elif args.graph:
         view_graph_interactive()
     elif args.algo:
         test_interface()
+    elif args.bench:
+        regressions = run_benchmark(args.maps, args.scales, args.algorithms, args.pairs, args.repeat,
+                                    args.seed, args.json, args.baseline, args.tolerance)
+        sys.exit(1 if regressions else 0)
     elif args.twod:
-        run_pacman_2d()
+        run_pacman_2d(args.oracle, args.field, ghost_algorithms, args.pool, args.stats, args.trace,
+                      telemetry)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+from specification import *
+from collections import defaultdict
+import hashlib
+import json
+import mmap
+import numpy as np
+import os
+import struct
+import sys
+import time
+
+"""
+MapArtifact: compiled binary form of a map file
+
+compile_map parses a text map once and writes everything the game derives
+from it into one file: the cell grid, the walkable and dot masks, the entity
+positions, the CSR state graph of CompactMapGraph and, on request, the
+distance oracle table. The table has 4 * cells * cells entries, so it is left
+out by default to keep compile time and file size linear in the map size;
+without it the oracle is built (or read from its own cache) on first use. The file is named after the SHA-256 of the source
+map, so editing the map makes the artifact stale and it is simply not found.
+
+Layout: MAGIC, a uint32 format version, a uint32 header length, a JSON
+header (entities, weights, and dtype / shape / offset of every section),
+then the sections, each 8 byte aligned. MapArtifact.open maps the file and
+exposes the sections as NumPy views on the mapping, so nothing is copied or
+parsed at startup.
+"""
+
+MAGIC = b'PACMAP\0\0'
+ARTIFACT_VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+
+
+def source_hash(map_file):
+    """SHA-256 of the text map file, the key of its artifact"""
+    with open(map_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def artifact_path(map_file):
+    return os.path.join(CACHE_DIR, f"map-{source_hash(map_file)}.bin")
+
+
+class MapArtifact:
+    def __init__(self, buffer, header, data_start):
+        self.buffer = buffer                        # mmap of the whole file
+        self.header = header
+        self.width = header['width']
+        self.height = header['height']
+        self.sections = {}
+        for name, (dtype, shape, offset) in header['sections'].items():
+            count = int(np.prod(shape))
+            self.sections[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                                offset=data_start + offset).reshape(shape)
+
+    @classmethod
+    def open(cls, map_file):
+        """Artifact compiled from the current content of map_file, None if missing or stale"""
+        try:
+            path = artifact_path(map_file)
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, header_length = PREAMBLE.unpack_from(buffer)
+            if magic != MAGIC or version != ARTIFACT_VERSION:
+                return None
+            header = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + header_length])
+            if header['weights'] != [STRAIGHT, TURN, BACK]:
+                return None
+            data_start = (PREAMBLE.size + header_length + 7) & ~7
+            return cls(buffer, header, data_start)
+        except (struct.error, ValueError, KeyError):
+            return None
+
+    def has(self, name):
+        return name in self.sections
+
+    def to_map(self):
+        """Map whose indexes are read from the artifact instead of parsed"""
+        from game_map import Map
+        width = self.width
+        grid = self.sections['grid']
+        text = grid.tobytes().decode('ascii')
+        layout = [text[y * width:(y + 1) * width] for y in range(self.height)]
+        dots = np.flatnonzero(self.sections['dot_mask'])
+        indexes = ArtifactIndexes(
+            player_pos=self._position(self.header['player']),
+            ghost_positions={ghost: self._position(pos) for ghost, pos in self.header['ghosts'].items()},
+            haunted_points=[tuple(pos) for pos in self.header['haunted']],
+            dot_positions=set(zip((dots % width).tolist(), (dots // width).tolist())),
+            dot_mask=self.sections['dot_mask'],
+            walkable=self.sections['walkable'],
+            grid=grid.reshape(-1))
+        game_map = Map(layout, indexes)
+        game_map.artifact = self
+        return game_map
+
+    @staticmethod
+    def _position(pos):
+        return tuple(pos) if pos is not None else None
+
+    def buffer_view(self, name):
+        """Zero copy memoryview of a section, indexed like the array buffers of CompactMapGraph"""
+        section = self.sections[name]
+        return memoryview(section).cast('B').cast(section.dtype.char)
+
+    def weighted_graph(self):
+        """The dict graph of MapGraph, rebuilt from the CSR sections"""
+        offsets = self.sections['offsets']
+        width = self.width
+        # One position tuple per walkable cell, shared by all the edges entering it
+        cells = np.flatnonzero(self.sections['walkable'])
+        positions = [None] * (self.width * self.height)
+        for cell in cells.tolist():
+            positions[cell] = (cell % width, cell // width)
+        targets = [positions[cell] for cell in (self.sections['targets'] >> 2).tolist()]
+        weights = self.sections['weights'].tolist()
+        starts = offsets.tolist()
+
+        graph = defaultdict(dict)
+        for state in np.flatnonzero(offsets[1:] != offsets[:-1]).tolist():
+            start, end = starts[state], starts[state + 1]
+            graph[(positions[state >> 2], DIRECTIONS[state & 3])] = dict(zip(targets[start:end], weights[start:end]))
+        return graph
+
+
+class ArtifactIndexes:
+    """Map indexes taken from an artifact, with the attributes of MapIndexer"""
+
+    def __init__(self, **indexes):
+        self.__dict__.update(indexes)
+
+
+def compile_map(map_file, with_oracle=False):
+    """Parse map_file and write its artifact, with the distance oracle table if with_oracle; returns the path"""
+    from game_map import Map
+    from compact_graph import CompactMapGraph
+    from map_implement import MapGraph
+
+    game_map = Map.load_map(map_file, compact=True, use_artifact=False)
+    if not game_map:
+        return None
+    width, height = game_map.width, game_map.height
+    graph = CompactMapGraph(game_map)
+    sections = {
+        'grid': np.frombuffer(bytes(game_map.grid), dtype=np.uint8).reshape(height, width),
+        'walkable': np.frombuffer(bytes(game_map.walkable), dtype=np.uint8),
+        'dot_mask': np.frombuffer(bytes(game_map.dot_mask), dtype=np.uint8),
+        'offsets': np.array(graph.offsets, dtype=np.int64),
+        'targets': np.array(graph.targets, dtype=np.int64),
+        'weights': np.array(graph.weights, dtype=np.uint8),
+    }
+    if with_oracle:
+        oracle = MapGraph(game_map).distance_oracle()
+        if oracle is None:
+            print(f"{map_file}: more than {ORACLE_MAX_CELLS} walkable cells, distance table skipped")
+        else:
+            sections['oracle_table'] = oracle.table
+
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        offset = (offset + 7) & ~7
+        layout[name] = (array.dtype.str, list(array.shape), offset)
+        offset += array.nbytes
+    header = json.dumps({
+        'width': width,
+        'height': height,
+        'weights': [STRAIGHT, TURN, BACK],
+        'player': game_map.player_pos,
+        'ghosts': game_map.ghost_positions,
+        'haunted': game_map.haunted_points,
+        'sections': layout,
+    }).encode()
+    data_start = (PREAMBLE.size + len(header) + 7) & ~7
+
+    path = artifact_path(map_file)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, ARTIFACT_VERSION, len(header)))
+        f.write(header)
+        for name, array in sections.items():
+            f.seek(data_start + layout[name][2])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+# Compile a map ("-oracle" adds the distance table), then time startup from text and from the artifact
+if __name__ == "__main__":
+    import gc
+    import map_artifact     # The loaders import this module by name, not as __main__
+    from game_map import Map
+    from map_implement import MapGraph
+    from compact_graph import CompactMapGraph
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    map_file = args[0] if args else MAP_DIR
+    start_time = time.perf_counter()
+    with_oracle = '-oracle' in sys.argv
+    path = compile_map(map_file, with_oracle=with_oracle)
+    if path:
+        print(f"Compiled {map_file} to {path} ({os.path.getsize(path)} bytes) "
+              f"in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+        def timed(build):
+            gc.collect()        # Garbage of the previous run would be collected during this one
+            start_time = time.perf_counter()
+            result = build()
+            return result, time.perf_counter() - start_time
+
+        for use_artifact in (False, True):
+            timings = {}
+            game_map, timings['Map'] = timed(lambda: Map.load_map(map_file, use_artifact=use_artifact))
+            _, timings['CompactMapGraph'] = timed(lambda: CompactMapGraph(game_map))
+            graph, timings['MapGraph'] = timed(lambda: MapGraph(game_map))
+            if with_oracle:
+                _, timings['oracle'] = timed(graph.distance_oracle)
+            print(f"  {'artifact' if use_artifact else 'text':<8}: " +
+                  ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()))
@@ -1,5 +1,6 @@
 from specification import *
 from collections import defaultdict
+import threading
 
 """
 MapGraph class for creating a weighted graph from the game map
@@ -14,6 +15,12 @@ class MapGraph:
         self.max_moves = HAUNTED_POINT_INDEX  # Default max moves before penalty
         self.graph = self._create_weighted_graph()
         self.positions = self._get_positions_dict()
+        self._distance_oracle = None
+        self._reverse_graph = None
+        self._junction_graph = None
+        self._landmarks = None
+        self._distance_field = None
+        self._distance_field_lock = threading.RLock()
 
     def _calculate_turn_weight(self, current_direction, new_direction):
         if current_direction == new_direction: # Straight
@@ -31,6 +38,10 @@ class MapGraph:
         return TURN
     
     def _create_weighted_graph(self):
+        if self.map.artifact is not None:
+            # Compiled map: the edges are read from its CSR sections
+            return self.map.artifact.weighted_graph()
+
         # Create adjacency list with weights
         graph = defaultdict(dict)
         
@@ -74,6 +85,50 @@ class MapGraph:
         }
         return positions
 
+    def distance_oracle(self, use_cache=True):
+        """Turn-aware distance table for this map, built or loaded on first use; None if the map is too large"""
+        if self._distance_oracle is None:
+            from distance_oracle import DistanceOracle
+            # False remembers a map too large for the table, so it is not tried again
+            self._distance_oracle = DistanceOracle.load_or_build(self, use_cache) or False
+        return self._distance_oracle or None
+
+    def distance_field(self, target_pos):
+        """Reverse distance field toward target_pos, shared by every ghost
+
+        A new field is started only when the target moves.
+        """
+        with self._distance_field_lock:
+            field = self._distance_field
+            if field is None or field.target != target_pos:
+                from distance_field import TargetDistanceField
+                field = self._distance_field = TargetDistanceField(self.reverse_state_graph(), target_pos)
+            return field
+
+    def reverse_state_graph(self):
+        """Predecessor lists of the exact (cell, direction, haunted) search states"""
+        with self._distance_field_lock:
+            if self._reverse_graph is None:
+                from distance_field import ReverseStateGraph
+                self._reverse_graph = ReverseStateGraph(self)
+            return self._reverse_graph
+
+    def junction_graph(self):
+        """Graph with corridors contracted into macro edges between junctions"""
+        with self._distance_field_lock:
+            if self._junction_graph is None:
+                from junction_graph import JunctionGraph
+                self._junction_graph = JunctionGraph(self)
+            return self._junction_graph
+
+    def landmarks(self):
+        """Landmark distance arrays of the ALT heuristic, built once per map"""
+        with self._distance_field_lock:
+            if self._landmarks is None:
+                from landmarks import LandmarkHeuristic
+                self._landmarks = LandmarkHeuristic.build(self)
+            return self._landmarks
+
     def get_neighbors(self, pos):
         """Get all valid neighbors for a given position"""
         return self.graph[pos]
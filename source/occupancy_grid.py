@@ -0,0 +1,115 @@
+from specification import *
+import numpy as np
+import sys
+import time
+
+"""
+GridLayer: compact cell layer of a map for the hot checks of the games
+
+- cells: one uint8 code per cell, row-major (CELL_EMPTY, CELL_WALL, CELL_DOT,
+  CELL_HAUNTED), so walkability and cell type are one index
+- walls, dots, haunted: bitboards, Python ints with bit y * width + x set
+
+Python ints are immutable, which is what the world snapshots need: the
+remaining dots of a game are a bitboard in the WorldSnapshot, and eating a
+dot publishes a new int with that bit cleared instead of copying a set of
+positions. The win check is dots_left == 0. Ghost occupancy is a small
+{cell: ghost type} mapping in the snapshot, so collision and free cell
+checks are one lookup.
+"""
+
+CELL_EMPTY = 0
+CELL_WALL = 1
+CELL_DOT = 2
+CELL_HAUNTED = 3
+
+
+def bitboard(mask):
+    """Bitboard of a row-major boolean array"""
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+
+def cells_of(board):
+    """Cell indexes of the bits set in a bitboard"""
+    while board:
+        low = board & -board
+        yield low.bit_length() - 1
+        board ^= low
+
+
+class GridLayer:
+    def __init__(self, game_map):
+        self.width = game_map.width
+        self.height = game_map.height
+        walkable = np.frombuffer(game_map.walkable, dtype=np.uint8).astype(bool)
+        cells = np.where(walkable, CELL_EMPTY, CELL_WALL).astype(np.uint8)
+        cells[np.frombuffer(game_map.dot_mask, dtype=np.uint8).astype(bool)] = CELL_DOT
+        for x, y in game_map.haunted_points:
+            cells[y * self.width + x] = CELL_HAUNTED
+        self.cells = bytearray(cells.tobytes())
+        self.walls = bitboard(cells == CELL_WALL)
+        self.dots = bitboard(cells == CELL_DOT)
+        self.haunted = bitboard(cells == CELL_HAUNTED)
+        self.dot_count = self.dots.bit_count()
+
+    def cell(self, pos):
+        return pos[1] * self.width + pos[0]
+
+    def position(self, cell):
+        return cell % self.width, cell // self.width
+
+    def is_walkable(self, pos):
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height and self.cells[y * self.width + x] != CELL_WALL
+
+
+# Benchmark: per-operation cost of the nested-list / set checks against the grid layer (scale factors)
+if __name__ == "__main__":
+    import random
+    from game_map import Map
+
+    scales = [int(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    base_map = Map.load_map(MAP_DIR)
+
+    def per_op(operation, items):
+        start_time = time.perf_counter()
+        for item in items:
+            operation(item)
+        return (time.perf_counter() - start_time) / len(items) * 1e9
+
+    if base_map:
+        for scale in scales:
+            game_map = base_map.scaled(scale) if scale > 1 else base_map
+            grid = GridLayer(game_map)
+            rng = random.Random(0)
+            positions = [(rng.randrange(game_map.width), rng.randrange(game_map.height)) for _ in range(100000)]
+            layout = game_map.layout
+
+            def nested_valid(pos):
+                x, y = pos
+                if x < 0 or x >= game_map.width or y < 0 or y >= game_map.height:
+                    return False
+                return layout[y][x] != '#'
+
+            # Eating 200 dots half way through a game: copy-on-write frozenset of the collected
+            # dots (as the snapshots held them) against clearing bits of the remaining dots
+            dots = sorted(game_map.dot_positions)
+            rng.shuffle(dots)
+            half = len(dots) // 2
+            eaten = dots[half:half + 200]
+            collected = frozenset(dots[:half])
+
+            def eat_set(pos):
+                global collected
+                collected = collected | {pos}
+            dots_left = grid.dots
+            for pos in dots[:half]:
+                dots_left &= ~(1 << grid.cell(pos))
+
+            def eat_bitboard(pos):
+                global dots_left
+                dots_left &= ~(1 << grid.cell(pos))
+
+            print(f"x{scale} ({game_map.width}x{game_map.height}, {grid.dot_count} dots): "
+                  f"valid move {per_op(nested_valid, positions):.0f} -> {per_op(grid.is_walkable, positions):.0f} ns, "
+                  f"eat dot {per_op(eat_set, eaten):.0f} -> {per_op(eat_bitboard, eaten):.0f} ns")
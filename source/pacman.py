@@ -5,13 +5,21 @@ import threading
 from specification import *
 from game_map import Map
 from map_implement import MapGraph
-from algorithm import UCS_ghost, BFS_ghost, DFS_ghost, A_star_ghost
+from algorithm import GHOST_ALGORITHMS, ExpansionTrace, oracle_ghost, field_ghost
+from ghost_route import ReplanStats, SearchCounters, cached_next_step, store_route, advance_route
+from ghost_scheduler import GhostScheduler
+from planner_pool import PlannerPool
+from surface_cache import TextCache, rotations, alpha_ramp
+from world_snapshot import World, WorldView, initial_snapshot
+from occupancy_grid import GridLayer, CELL_DOT, CELL_HAUNTED, cells_of
 import random
 import pygame
 import os
 
-class PacmanGame2D:
-    def __init__(self, map_dir=MAP_DIR):
+class PacmanGame2D(WorldView):
+    def __init__(self, map_dir=MAP_DIR, use_distance_oracle=False, use_distance_field=False,
+                 ghost_algorithms=None, use_process_pool=False,
+                 search_stats=False, search_trace=None, telemetry=None):
         # Khởi tạo pygame
         pygame.init()
         pygame.display.set_caption("Pacman Game 2D")
@@ -26,6 +34,8 @@ class PacmanGame2D:
         self.cell_size = 30  # Kích thước mỗi ô (pixel)
         self.window_width = self.game_map.width * self.cell_size
         self.window_height = self.game_map.height * self.cell_size + 100  # Thêm không gian cho thông tin
+        if search_stats or search_trace:
+            self.window_height += 20  # Thêm một dòng thống kê tìm đường của từng con ma
         
         # Tạo cửa sổ game
         self.screen = pygame.display.set_mode((self.window_width, self.window_height))
@@ -34,12 +44,97 @@ class PacmanGame2D:
         # Tạo đồ thị cho thuật toán tìm đường
         self.graph = MapGraph(self.game_map)
         
-        # Vị trí người chơi
-        self.player_pos = self.game_map.player_pos
+        # Lưới ô uint8 và bitboard của tường, điểm, haunted point
+        self.grid = GridLayer(self.game_map)
+        
+        # Thuật toán tìm đường của từng con ma
+        self.ghost_algorithms = dict(GHOST_ALGORITHMS)
+        if use_distance_oracle:
+            # Ma tối ưu chi phí đọc nước đi từ bảng tính trước
+            self.graph.distance_oracle()
+            self.ghost_algorithms[RED_GHOST] = oracle_ghost
+            self.ghost_algorithms[PINK_GHOST] = oracle_ghost
+        if use_distance_field:
+            # Mọi con ma đọc nước đi từ một lần tìm kiếm ngược chung từ người chơi
+            for ghost_type in self.ghost_algorithms:
+                self.ghost_algorithms[ghost_type] = field_ghost
+        if ghost_algorithms:
+            # Thuật toán chọn riêng cho từng con ma ghi đè các lựa chọn ở trên
+            self.ghost_algorithms.update(ghost_algorithms)
+        
+        # Đo thời gian từng phần của frame, độ trễ và thời gian chờ lock (tùy chọn)
+        self.telemetry = telemetry
+        
+        # Theo dõi các vị trí kế hoạch để tránh va chạm
+        self.planned_positions_lock = telemetry.lock_for('planned_positions_lock') if telemetry else threading.Lock()
+        
+        # Tìm đường trong các tiến trình con, đồ thị nằm trong bộ nhớ chia sẻ
+        self.planner_pool = PlannerPool(self.game_map) if use_process_pool else None
+        
+        # Thống kê từng lần tìm đường (tùy chọn), ghi mẫu các bước mở rộng ra file JSONL
+        self.search_trace = ExpansionTrace(search_trace) if search_trace else None
+        self.search_stats = search_stats or self.search_trace is not None
+        
+        # Thời gian chờ giữa hai lần di chuyển của người chơi
+        self.move_cooldown = PLAYER_MOVEMENT
+        
+        # Lock của các luồng ghi trạng thái (người chơi, ma); luồng đọc dùng bản chụp
+        self.game_lock = telemetry.lock_for('game_lock') if telemetry else threading.Lock()
+        
+        # Bộ lập lịch di chuyển cho tất cả các con ma, dùng lại qua các lượt chơi
+        self.ghost_scheduler = None
+        
+        # Các điểm (dấu chấm) của bản đồ, đã được đánh chỉ mục khi tải bản đồ
+        self.points = self.game_map.dot_positions
+        
+        # Nền tĩnh vẽ sẵn một lần (bản gốc còn đủ các điểm để dùng lại khi chơi lại)
+        self.background = None
+        self.clean_background = None
+        
+        # Trạng thái thay đổi trong lượt chơi
+        self.ghosts = {}
+        self.reset()
+        
+        # Tài nguyên hình ảnh
+        self.load_images()
+        
+        # Font cho text, tạo một lần; chữ đã vẽ được lưu lại cho các frame sau
+        self.font = pygame.font.SysFont('Arial', 20)
+        self.small_font = pygame.font.SysFont('Arial', 16)
+        self.large_font = pygame.font.SysFont('Arial', 48, bold=True)
+        self.score_font = pygame.font.SysFont('Arial', 36)
+        self.restart_font = pygame.font.SysFont('Arial', 24)
+        self.text_cache = TextCache()
+
+        # Tốc độ hoạt hình (giây)
+        self.animation_speed = 0.2
+        
+        # Tải hoạt hình cho Pacman (nếu có)
+        self.pacman_animation = []
+        
+        # Ảnh xoay sẵn theo từng hướng và các mức trong suốt cho ma bị ám
+        self.player_rotations = rotations(self.player_img)
+        self.animation_rotations = [rotations(frame) for frame in self.pacman_animation]
+        self.haunted_ghost_imgs = {ghost_type: alpha_ramp(img) for ghost_type, img in self.ghost_imgs.items()}
+        self.game_over_overlay = None
+    
+    def reset(self):
+        """Bắt đầu lượt chơi mới: chỉ khởi tạo lại trạng thái game
+        
+        Bản đồ, đồ thị cùng các bảng tính trước, hình ảnh, font và các tiến
+        trình tìm đường được giữ lại; bộ lập lịch của ma được dừng để dùng lại.
+        """
+        if self.ghost_scheduler:
+            self.ghost_scheduler.stop()
+        if self.planner_pool:
+            self.planner_pool.cancel_pending()
         
         # Theo dõi các vị trí kế hoạch để tránh va chạm
         self.planned_next_positions = {}
-        self.planned_positions_lock = threading.Lock()
+        
+        # Thống kê số lần tìm đường đã chạy và đã tránh được
+        self.replan_stats = ReplanStats()
+        self.search_counters = SearchCounters(self.search_trace) if self.search_stats else None
         
         # Khởi tạo vị trí ma
         self.ghosts = {}
@@ -62,7 +157,6 @@ class PacmanGame2D:
                 'path': None,
                 'color': color,
                 'algorithm': ghost_type,
-                'lock': threading.Lock(),
                 'last_move_time': time.time(),
                 'has_moved': False,
                 'movement_type': STRAIGHT_MOVEMENT,
@@ -74,18 +168,12 @@ class PacmanGame2D:
             # Lưu vị trí ban đầu
             self.initial_ghost_positions.add(pos)
         
-        # Trạng thái game
-        self.game_over = False
-        self.win = False
-        self.score = 0
-        self.moves = 0
-        
-        # Theo dõi các haunted point đã thu thập
-        self.collected_haunted = set()
+        # Trạng thái chung (người chơi, điểm, các điểm đã thu thập, vị trí ma, kết thúc) là
+        # một bản chụp bất biến, được thay thế nguyên khối sau mỗi nước đi
+        self.world = World(self.grid, initial_snapshot(self.grid, self.game_map.player_pos, self.ghosts), self.game_lock)
         
         # Thời gian cho di chuyển người chơi
         self.last_move_time = time.time()
-        self.move_cooldown = PLAYER_MOVEMENT
         
         # Kiểm soát FPS
         self.last_frame_time = time.time()
@@ -93,39 +181,16 @@ class PacmanGame2D:
         self.fps = 0
         self.fps_update_time = time.time()
         
-        # Lock cho thread safety
-        self.game_lock = threading.Lock()
-        
-        # Thread cho ma
-        self.ghost_threads = {}
-
-        # Tài nguyên hình ảnh
-        self.load_images()
-        
-        # Font cho text
-        self.font = pygame.font.SysFont('Arial', 20)
-        self.small_font = pygame.font.SysFont('Arial', 16)
-
-        # Thêm biến cho hoạt hình
+        # Hoạt hình
         self.animation_frame = 0
-        self.animation_speed = 0.2  # Tốc độ hoạt hình (giây)
         self.last_animation_time = time.time()
         
-        # Tải hoạt hình cho Pacman (nếu có)
-        self.pacman_animation = []
-
-        # Thêm theo dõi các điểm (dấu chấm)
-        self.points = set()
-        
-        # Tìm và lưu vị trí các điểm từ map
-        for y, row in enumerate(self.game_map.layout):
-            for x, cell in enumerate(row):
-                pos = (x, y)
-                if cell == '.':
-                    self.points.add(pos)
-        
-        # Điểm đã thu thập
-        self.collected_points = set()
+        # Khôi phục nền còn đủ các điểm, vẽ lại toàn bộ ở frame đầu
+        if self.clean_background is not None:
+            self.background = self.clean_background.copy()
+        self.drawn_dots = self.grid.dots
+        self.sprite_rects = []
+        self.full_redraw = True
     
     def load_images(self):
         """Tải hình ảnh thực tế cho game"""
@@ -302,11 +367,7 @@ class PacmanGame2D:
     
     def is_valid_move(self, pos):
         """Kiểm tra di chuyển có hợp lệ không"""
-        x, y = pos
-        if x < 0 or x >= self.game_map.width or y < 0 or y >= self.game_map.height:
-            return False
-        
-        return self.game_map.layout[y][x] != '#'
+        return self.grid.is_walkable(pos)
     
     def move_player(self, direction):
         """Di chuyển người chơi theo hướng được chỉ định"""
@@ -314,218 +375,217 @@ class PacmanGame2D:
             return False
             
         dx, dy = direction
-        new_pos = (self.player_pos[0] + dx, self.player_pos[1] + dy)
         
-        if self.is_valid_move(new_pos):
-            with self.game_lock:
-                # Cập nhật thời gian di chuyển
-                self.last_move_time = time.time()
-                
-                # Cập nhật vị trí người chơi
-                self.player_pos = new_pos
-                self.moves += 1
-                
-                # Lưu hướng di chuyển để xoay Pacman
-                self.player_direction = direction
-                
-                # Kiểm tra xem đã thu thập điểm thường chưa
-                if new_pos in self.points and new_pos not in self.collected_points:
-                    self.collected_points.add(new_pos)
-                    self.score += 1
-                
-                # Kiểm tra xem đã thu thập haunted point chưa (haunted points không biến mất)
-                if new_pos in self.game_map.haunted_points:
-                    if new_pos not in self.collected_haunted:
-                        self.collected_haunted.add(new_pos)
-                        self.score += 10
-                
-                # Kiểm tra chiến thắng - thu thập hết các điểm thường
-                if len(self.collected_points) == len(self.points):
-                    self.win = True
-                    self.game_over = True
+        def step(world):
+            new_pos = (world.player_pos[0] + dx, world.player_pos[1] + dy)
+            if not self.grid.is_walkable(new_pos):
+                return None
+            cell = self.grid.cell(new_pos)
+            kind = self.grid.cells[cell]
+            score = world.score
+            dots_left, dots_eaten = world.dots_left, world.dots_eaten
+            collected_haunted = world.collected_haunted
             
-            return True
-        
-        return False
+            # Kiểm tra xem đã thu thập điểm thường chưa
+            if kind == CELL_DOT and dots_left >> cell & 1:
+                dots_left ^= 1 << cell
+                dots_eaten += 1
+                score += 1
+            
+            # Kiểm tra xem đã thu thập haunted point chưa (haunted points không biến mất)
+            elif kind == CELL_HAUNTED and new_pos not in collected_haunted:
+                collected_haunted = collected_haunted | {new_pos}
+                score += 10
+            
+            # Kiểm tra chiến thắng - thu thập hết các điểm thường
+            win = dots_left == 0
+            # Lưu hướng di chuyển để xoay Pacman
+            return {'player_pos': new_pos, 'player_direction': direction, 'moves': world.moves + 1,
+                    'score': score, 'dots_left': dots_left, 'dots_eaten': dots_eaten,
+                    'collected_haunted': collected_haunted, 'win': world.win or win,
+                    'game_over': world.game_over or win}
+        
+        if self.world.update(step) is None:
+            return False
+        # Cập nhật thời gian di chuyển
+        self.last_move_time = time.time()
+        return True
     
-    def ghost_movement_thread(self, ghost_type):
-        """Thread để điều khiển di chuyển của ma"""
+    def move_ghost(self, ghost_type, current_time):
+        """Một lượt di chuyển của ma, bộ lập lịch gọi khi đến hạn; trả về khoảng chờ tới lượt sau"""
         ghost = self.ghosts[ghost_type]
         
-        while not self.game_over:
-            current_time = time.time()
+        # Calculate path for ghost based on current player position
+        # Đọc từ bản chụp mới nhất, không cần lock
+        world = self.world.snapshot
+        current_player_pos = world.player_pos
+        current_ghost_pos = ghost['pos']
+        
+        # Lấy vị trí của các ma khác để tránh va chạm
+        other_ghost_positions = set()
+        for other_type, other_ghost in world.ghosts.items():
+            if other_type != ghost_type:  # Không bao gồm ma hiện tại
+                other_ghost_positions.add(other_ghost.pos)
+        
+        # Trong hành lang, tiếp tục đi theo đường của lần tìm kiếm trước
+        next_pos = cached_next_step(self.graph, ghost, current_player_pos, other_ghost_positions)
+        self.replan_stats.record(searched=next_pos is None)
+
+        # Tìm vị trí tiếp theo hợp lệ
+        max_attempts = 3
+        attempt = 0
+        
+        while attempt < max_attempts and next_pos is None:
+            # Chọn thuật toán dựa vào loại ma
+            algorithm = self.ghost_algorithms[ghost_type]
+            # Vị trí người chơi mà đường đi được tính cho (kết quả tính trước có thể dùng vị trí cũ)
+            route_target = current_player_pos
+            if self.planner_pool:
+                ghost_path, _, candidate_next_pos, route_target = self.planner_pool.plan(
+                    ghost_type, algorithm, self.graph, current_ghost_pos, current_player_pos)
+            elif self.search_counters:
+                ghost_path, _, candidate_next_pos = self.search_counters.search(
+                    ghost_type, algorithm, self.graph, current_ghost_pos, current_player_pos)
+            else:
+                ghost_path, _, candidate_next_pos = algorithm(self.graph, current_ghost_pos, current_player_pos)
             
-            # Chỉ di chuyển ma khi đến thời gian
-            if current_time - ghost['last_move_time'] >= ghost['update_interval']:
-                # Calculate path for ghost based on current player position
-                with self.game_lock:
-                    current_player_pos = self.player_pos
-                    current_ghost_pos = ghost['pos']
-                    
-                    # Lấy vị trí của các ma khác để tránh va chạm
-                    other_ghost_positions = set()
-                    for other_type, other_ghost in self.ghosts.items():
-                        if other_type != ghost_type:  # Không bao gồm ma hiện tại
-                            other_ghost_positions.add(other_ghost['pos'])
+            # Kiểm tra vị trí có hợp lệ không
+            if candidate_next_pos and candidate_next_pos not in other_ghost_positions:
+                next_pos = candidate_next_pos
+                store_route(ghost, ghost_path, route_target)
+            else:
+                # Nếu vị trí đã bị chiếm, tìm đường đi khác
+                if candidate_next_pos:
+                    self.graph.add_temporary_obstacle(candidate_next_pos)
+                attempt += 1
+        
+        # Nếu không tìm được vị trí hợp lệ, bỏ qua lượt này
+        if next_pos is None:
+            if hasattr(self.graph, 'remove_all_temporary_obstacles'):
+                self.graph.remove_all_temporary_obstacles()
+            ghost['last_move_time'] = current_time
+            return ghost['update_interval']
+        
+        # Xóa chướng ngại vật tạm thời
+        if hasattr(self.graph, 'remove_all_temporary_obstacles'):
+            self.graph.remove_all_temporary_obstacles()
+        
+        # Kiểm tra xung đột vị trí kế hoạch
+        with self.planned_positions_lock:
+            conflict = False
+            conflicting_ghost = None
+            
+            for other_type, planned_pos in self.planned_next_positions.items():
+                if planned_pos == next_pos:
+                    conflict = True
+                    conflicting_ghost = other_type
+                    break
+            
+            if conflict:
+                # Giải quyết xung đột ngẫu nhiên
+                if random.choice([True, False]):
+                    self.planned_next_positions[ghost_type] = next_pos
+                    if conflicting_ghost in self.planned_next_positions:
+                        del self.planned_next_positions[conflicting_ghost]
+                else:
+                    next_pos = None
+            else:
+                # Không có xung đột
+                self.planned_next_positions[ghost_type] = next_pos
+        
+        # Di chuyển ma đến vị trí tiếp theo nếu được phép
+        if next_pos:
+            # Kiểm tra cuối cùng xem vị trí còn trống không; chỉ luồng lập lịch di chuyển ma,
+            # nên bảng chiếm chỗ của bản chụp mới nhất cho biết chính xác ô của các ma khác
+            occupant = self.world.snapshot.occupancy.get(self.grid.cell(next_pos), ghost_type)
+            is_position_free = occupant == ghost_type
+            
+            if is_position_free:
+                # Lưu vị trí cũ
+                old_pos = ghost['pos']
                 
-                # Tìm vị trí tiếp theo hợp lệ
-                max_attempts = 3
-                attempt = 0
-                next_pos = None
+                # Tính hướng di chuyển
+                dx = next_pos[0] - ghost['pos'][0]
+                dy = next_pos[1] - ghost['pos'][1]
+                new_direction = (dx, dy)
                 
-                while attempt < max_attempts and next_pos is None:
-                    # Chọn thuật toán dựa vào loại ma
-                    if ghost_type == PINK_GHOST:
-                        ghost_path, _, candidate_next_pos = A_star_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == BLUE_GHOST:
-                        ghost_path, _, candidate_next_pos = BFS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == ORANGE_GHOST:
-                        ghost_path, _, candidate_next_pos = DFS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    elif ghost_type == RED_GHOST:
-                        ghost_path, _, candidate_next_pos = UCS_ghost(self.graph, current_ghost_pos, current_player_pos)
-                    
-                    # Kiểm tra vị trí có hợp lệ không
-                    if candidate_next_pos and candidate_next_pos not in other_ghost_positions:
-                        next_pos = candidate_next_pos
+                # Kiểm tra xem vị trí mới có phải là haunted point không (vẫn giữ H)
+                if next_pos in self.game_map.haunted_set:
+                    ghost['is_haunted'] = True
+                    ghost['haunted_steps_remaining'] = HAUNTED_POINT_INDEX
+                    ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+                else:
+                    # Nếu đang bị ám, giảm số bước còn lại
+                    if ghost['haunted_steps_remaining'] > 0:
+                        ghost['haunted_steps_remaining'] -= 1
+                        ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
                     else:
-                        # Nếu vị trí đã bị chiếm, tìm đường đi khác
-                        if candidate_next_pos:
-                            self.graph.add_temporary_obstacle(candidate_next_pos)
-                        attempt += 1
-                        time.sleep(0.01)
-                
-                # Nếu không tìm được vị trí hợp lệ, bỏ qua lượt này
-                if next_pos is None:
-                    if hasattr(self.graph, 'remove_all_temporary_obstacles'):
-                        self.graph.remove_all_temporary_obstacles()
-                    ghost['last_move_time'] = current_time
-                    time.sleep(0.01)
-                    continue
-                
-                # Xóa chướng ngại vật tạm thời
-                if hasattr(self.graph, 'remove_all_temporary_obstacles'):
-                    self.graph.remove_all_temporary_obstacles()
-                
-                # Kiểm tra xung đột vị trí kế hoạch
-                with self.planned_positions_lock:
-                    conflict = False
-                    conflicting_ghost = None
-                    
-                    for other_type, planned_pos in self.planned_next_positions.items():
-                        if planned_pos == next_pos:
-                            conflict = True
-                            conflicting_ghost = other_type
-                            break
-                    
-                    if conflict:
-                        # Giải quyết xung đột ngẫu nhiên
-                        if random.choice([True, False]):
-                            self.planned_next_positions[ghost_type] = next_pos
-                            if conflicting_ghost in self.planned_next_positions:
-                                del self.planned_next_positions[conflicting_ghost]
+                        # Nếu hết bị ám, tính tốc độ dựa trên loại di chuyển
+                        ghost['is_haunted'] = False
+                        
+                        # Xác định loại di chuyển
+                        if ghost['previous_direction'] == new_direction:
+                            movement_type = STRAIGHT_MOVEMENT
+                            ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+                        elif (ghost['previous_direction'][0] == -new_direction[0] and 
+                            ghost['previous_direction'][1] == -new_direction[1]):
+                            movement_type = BACK_MOVEMENT
+                            ghost['update_interval'] = BACK * BASE_GHOST_UPDATE_INTERVAL
                         else:
-                            next_pos = None
-                    else:
-                        # Không có xung đột
-                        self.planned_next_positions[ghost_type] = next_pos
-                
-                # Di chuyển ma đến vị trí tiếp theo nếu được phép
-                if next_pos:
-                    with ghost['lock']:
-                        # Kiểm tra cuối cùng xem vị trí còn trống không
-                        is_position_free = True
-                        with self.game_lock:
-                            for other_type, other_ghost in self.ghosts.items():
-                                if other_type != ghost_type and other_ghost['pos'] == next_pos:
-                                    is_position_free = False
-                                    break
+                            movement_type = TURN_MOVEMENT
+                            ghost['update_interval'] = TURN * BASE_GHOST_UPDATE_INTERVAL
                         
-                        if is_position_free:
-                            # Lưu vị trí cũ
-                            old_pos = ghost['pos']
-                            
-                            # Tính hướng di chuyển
-                            dx = next_pos[0] - ghost['pos'][0]
-                            dy = next_pos[1] - ghost['pos'][1]
-                            new_direction = (dx, dy)
-                            
-                            # Kiểm tra xem vị trí mới có phải là haunted point không (vẫn giữ H)
-                            if next_pos in self.game_map.haunted_points:
-                                ghost['is_haunted'] = True
-                                ghost['haunted_steps_remaining'] = HAUNTED_POINT_INDEX
-                                ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                            else:
-                                # Nếu đang bị ám, giảm số bước còn lại
-                                if ghost['haunted_steps_remaining'] > 0:
-                                    ghost['haunted_steps_remaining'] -= 1
-                                    ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                                else:
-                                    # Nếu hết bị ám, tính tốc độ dựa trên loại di chuyển
-                                    ghost['is_haunted'] = False
-                                    
-                                    # Xác định loại di chuyển
-                                    if ghost['previous_direction'] == new_direction:
-                                        movement_type = STRAIGHT_MOVEMENT
-                                        ghost['update_interval'] = STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
-                                    elif (ghost['previous_direction'][0] == -new_direction[0] and 
-                                        ghost['previous_direction'][1] == -new_direction[1]):
-                                        movement_type = BACK_MOVEMENT
-                                        ghost['update_interval'] = BACK * BASE_GHOST_UPDATE_INTERVAL
-                                    else:
-                                        movement_type = TURN_MOVEMENT
-                                        ghost['update_interval'] = TURN * BASE_GHOST_UPDATE_INTERVAL
-                                    
-                                    ghost['movement_type'] = movement_type
-                            
-                            # Cập nhật hướng của ma
-                            ghost['previous_direction'] = new_direction
-                            
-                            # Di chuyển ma
-                            ghost['pos'] = next_pos
-                            
-                            # Nếu đây là lần di chuyển đầu tiên, đánh dấu
-                            if not ghost['has_moved']:
-                                ghost['has_moved'] = True
-                            
-                            # Xóa vị trí khỏi kế hoạch
-                            with self.planned_positions_lock:
-                                if ghost_type in self.planned_next_positions:
-                                    del self.planned_next_positions[ghost_type]
+                        ghost['movement_type'] = movement_type
                 
-                # Kiểm tra va chạm với người chơi
-                with self.game_lock:
-                    if ghost['pos'] == self.player_pos:
-                        self.game_over = True
+                # Cập nhật hướng của ma
+                ghost['previous_direction'] = new_direction
                 
-                # Cập nhật thời gian di chuyển cuối
-                ghost['last_move_time'] = current_time
-            
-            # Ngủ ngắn để tiết kiệm CPU
-            time.sleep(0.01)
+                # Di chuyển ma
+                ghost['pos'] = next_pos
+                advance_route(ghost, next_pos)
+                # Ở nút rẽ kế tiếp ma sẽ tìm đường lại: gửi trước yêu cầu cho tiến trình con
+                if self.planner_pool and next_pos in self.graph.junction_graph().nodes:
+                    self.planner_pool.prefetch(ghost_type, self.ghost_algorithms[ghost_type], next_pos, current_player_pos)
+                
+                # Nếu đây là lần di chuyển đầu tiên, đánh dấu
+                if not ghost['has_moved']:
+                    ghost['has_moved'] = True
+                
+                # Xóa vị trí khỏi kế hoạch
+                with self.planned_positions_lock:
+                    if ghost_type in self.planned_next_positions:
+                        del self.planned_next_positions[ghost_type]
     
-    def start_ghost_threads(self):
-        """Khởi động thread cho từng con ma"""
-        for ghost_type in self.ghosts:
-            thread = threading.Thread(target=self.ghost_movement_thread, args=(ghost_type,))
-            thread.daemon = True
-            self.ghost_threads[ghost_type] = thread
-            thread.start()
+        # Công bố trạng thái mới của ma; bắt được người chơi nếu cùng ô
+        self.world.publish_ghost(ghost_type, ghost)
+        
+        # Cập nhật thời gian di chuyển cuối
+        ghost['last_move_time'] = current_time
+        return ghost['update_interval']
+    
+    def start_ghost_scheduler(self):
+        """Khởi động bộ lập lịch duy nhất cho tất cả các con ma (tạo một lần, dùng lại khi chơi lại)"""
+        if self.ghost_scheduler is None:
+            move_ghost = self.telemetry.timed('ghost_decision', self.move_ghost) if self.telemetry else self.move_ghost
+            self.ghost_scheduler = GhostScheduler(move_ghost, lambda: self.game_over)
+        for ghost_type, ghost in self.ghosts.items():
+            self.ghost_scheduler.schedule(ghost_type, ghost['last_move_time'] + ghost['update_interval'])
+        self.ghost_scheduler.start()
     
     def check_collisions(self):
         """Kiểm tra va chạm giữa người chơi và ma"""
-        with self.game_lock:
-            for ghost in self.ghosts.values():
-                if self.player_pos == ghost['pos']:
-                    self.game_over = True
-                    return True
-            return False
+        world = self.world.snapshot
+        if self.grid.cell(world.player_pos) in world.occupancy:
+            self.game_over = True
+            if self.ghost_scheduler:
+                self.ghost_scheduler.notify()
+            return True
+        return False
     
-    def draw(self):
-        """Vẽ game lên màn hình"""
-        # Xóa màn hình
-        self.screen.fill((0, 0, 0))
-        
-        # Vẽ bản đồ
+    def build_background(self):
+        """Vẽ sẵn mê cung tĩnh (tường, haunted point, tất cả các điểm) vào một surface"""
+        background = pygame.Surface((self.window_width, self.window_height))
+        background.fill((0, 0, 0))
         for y in range(self.game_map.height):
             for x in range(self.game_map.width):
                 pos = (x, y)
@@ -534,19 +594,51 @@ class PacmanGame2D:
                 
                 # Vẽ tường
                 if self.game_map.layout[y][x] == '#':
-                    self.screen.blit(self.wall_img, (screen_x, screen_y))
+                    background.blit(self.wall_img, (screen_x, screen_y))
                 
                 # Vẽ haunted points
-                elif pos in self.game_map.haunted_points:
-                    self.screen.blit(self.haunted_img, 
+                elif pos in self.game_map.haunted_set:
+                    background.blit(self.haunted_img, 
                                   (screen_x + (self.cell_size - self.haunted_img.get_width())//2, 
                                    screen_y + (self.cell_size - self.haunted_img.get_height())//2))
                 
-                # Vẽ điểm thường (chỉ nếu chưa thu thập)
-                elif pos in self.points and pos not in self.collected_points:
-                    self.screen.blit(self.point_img, 
+                # Vẽ điểm thường
+                elif pos in self.points:
+                    background.blit(self.point_img, 
                                   (screen_x + (self.cell_size - self.point_img.get_width())//2, 
                                    screen_y + (self.cell_size - self.point_img.get_height())//2))
+        return background
+    
+    def draw(self):
+        """Vẽ game lên màn hình, chỉ cập nhật các vùng đã thay đổi"""
+        draw_start = time.perf_counter()
+        if self.background is None:
+            # Các điểm đã thu thập được xóa dần bên dưới, bản gốc giữ lại cho lượt sau
+            self.clean_background = self.build_background()
+            self.background = self.clean_background.copy()
+            self.drawn_dots = self.grid.dots
+            self.full_redraw = True
+        # Cả frame vẽ từ một bản chụp trạng thái, không cần lock
+        world = self.world.snapshot
+        full_redraw = self.full_redraw or world.game_over
+        dirty_rects = []
+        
+        # Xóa các điểm vừa thu thập khỏi nền
+        if self.drawn_dots is not world.dots_left:
+            for x, y in map(self.grid.position, cells_of(self.drawn_dots & ~world.dots_left)):
+                rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+                self.background.fill((0, 0, 0), rect)
+                dirty_rects.append(rect)
+            self.drawn_dots = world.dots_left
+        
+        # Khôi phục nền dưới các sprite của frame trước (hoặc toàn bộ màn hình)
+        if full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            dirty_rects.extend(self.sprite_rects)
+            for rect in dirty_rects:
+                self.screen.blit(self.background, rect, rect)
+        sprite_rects = []
         
         # Cập nhật hoạt hình chỉ khi có frames hoạt hình
         current_time = time.time()
@@ -555,127 +647,147 @@ class PacmanGame2D:
             self.last_animation_time = current_time
         
         # Vẽ người chơi với hoạt hình
-        player_screen_x = self.player_pos[0] * self.cell_size + (self.cell_size - self.player_img.get_width())//2
-        player_screen_y = self.player_pos[1] * self.cell_size + (self.cell_size - self.player_img.get_height())//2
-        
-        # Xác định hướng để xoay Pacman
-        if hasattr(self, 'player_direction'):
-            angle = 0
-            if self.player_direction == LEFT:
-                angle = 180
-            elif self.player_direction == UP:
-                angle = 90
-            elif self.player_direction == DOWN:
-                angle = 270
-            
-            # Xoay hoạt hình theo hướng di chuyển
+        player_screen_x = world.player_pos[0] * self.cell_size + (self.cell_size - self.player_img.get_width())//2
+        player_screen_y = world.player_pos[1] * self.cell_size + (self.cell_size - self.player_img.get_height())//2
+        
+        # Lấy ảnh Pacman đã xoay sẵn theo hướng di chuyển
+        if world.player_direction is not None:
             if self.pacman_animation:
-                rotated_frame = pygame.transform.rotate(self.pacman_animation[self.animation_frame], angle)
-                self.screen.blit(rotated_frame, (player_screen_x, player_screen_y))
+                rotated_img = self.animation_rotations[self.animation_frame][world.player_direction]
             else:
-                rotated_img = pygame.transform.rotate(self.player_img, angle)
-                self.screen.blit(rotated_img, (player_screen_x, player_screen_y))
+                rotated_img = self.player_rotations[world.player_direction]
+            sprite_rects.append(self.screen.blit(rotated_img, (player_screen_x, player_screen_y)))
         else:
             # Nếu không có hướng, sử dụng hình mặc định
-            self.screen.blit(self.player_img, (player_screen_x, player_screen_y))
+            sprite_rects.append(self.screen.blit(self.player_img, (player_screen_x, player_screen_y)))
         
         # Vẽ các con ma
-        for ghost_type, ghost in self.ghosts.items():
-            ghost_screen_x = ghost['pos'][0] * self.cell_size + (self.cell_size - self.ghost_imgs[ghost_type].get_width())//2
-            ghost_screen_y = ghost['pos'][1] * self.cell_size + (self.cell_size - self.ghost_imgs[ghost_type].get_height())//2
+        for ghost_type, ghost in world.ghosts.items():
+            ghost_screen_x = ghost.pos[0] * self.cell_size + (self.cell_size - self.ghost_imgs[ghost_type].get_width())//2
+            ghost_screen_y = ghost.pos[1] * self.cell_size + (self.cell_size - self.ghost_imgs[ghost_type].get_height())//2
             
             # Nếu ma đang bị ám, thêm hiệu ứng nhấp nháy
-            if ghost.get('is_haunted', False):
-                # Tạo hiệu ứng nhấp nháy với alpha thay đổi
-                alpha = 128 + int(127 * abs(time.time() % 1 - 0.5) / 0.5)  # Dao động từ 128-255
-                ghost_img_copy = self.ghost_imgs[ghost_type].copy()
-                ghost_img_copy.set_alpha(alpha)
-                self.screen.blit(ghost_img_copy, (ghost_screen_x, ghost_screen_y))
+            if ghost.is_haunted:
+                # Hiệu ứng nhấp nháy: chọn mức alpha (128-255) đã tính sẵn
+                ramp = self.haunted_ghost_imgs[ghost_type]
+                level = round(abs(time.time() % 1 - 0.5) / 0.5 * (len(ramp) - 1))
+                sprite_rects.append(self.screen.blit(ramp[level], (ghost_screen_x, ghost_screen_y)))
             else:
-                self.screen.blit(self.ghost_imgs[ghost_type], (ghost_screen_x, ghost_screen_y))
+                sprite_rects.append(self.screen.blit(self.ghost_imgs[ghost_type], (ghost_screen_x, ghost_screen_y)))
+        self.sprite_rects = sprite_rects
+        dirty_rects.extend(sprite_rects)
         
-        # Vẽ thông tin game bên dưới bản đồ
+        # Vẽ thông tin game bên dưới bản đồ, xóa vùng thông tin trước khi vẽ lại
         info_y = self.game_map.height * self.cell_size + 10
+        hud_rect = pygame.Rect(0, self.game_map.height * self.cell_size,
+                               self.window_width, self.window_height - self.game_map.height * self.cell_size)
+        self.screen.fill((0, 0, 0), hud_rect)
+        dirty_rects.append(hud_rect)
         
         # FPS
-        fps_text = self.font.render(f"FPS: {self.fps:.1f}", True, (255, 255, 255))
+        fps_text = self.text_cache.render(self.font, f"FPS: {self.fps:.1f}", (255, 255, 255))
         self.screen.blit(fps_text, (10, info_y))
         
+        # Số lần tìm đường tránh được mỗi giây nhờ đi theo đường đã lưu
+        replan = self.replan_stats.snapshot()
+        jitter = self.ghost_scheduler.jitter_stats() if self.ghost_scheduler else {'mean_ms': 0.0, 'max_ms': 0.0}
+        replan_text = self.text_cache.render(
+            self.small_font,
+            f"Searches avoided: {replan['avoided_per_second']:.1f}/s ({replan['avoided_ratio']:.0%}) | "
+            f"Ghost jitter: {jitter['mean_ms']:.1f}/{jitter['max_ms']:.1f} ms",
+            (255, 255, 255))
+        self.screen.blit(replan_text, (150, info_y + 4))
+        
         # Score & Moves & Points
-        score_text = self.font.render(f"Score: {self.score} | Moves: {self.moves} | Points: {len(self.collected_points)}/{len(self.points)}", True, (255, 255, 255))
+        score_text = self.text_cache.render(self.font, f"Score: {world.score} | Moves: {world.moves} | Points: {world.dots_eaten}/{self.grid.dot_count}", (255, 255, 255))
         self.screen.blit(score_text, (10, info_y + 30))
         
         # Thông tin về tốc độ ma
         ghost_info_y = info_y + 60
-        for i, (ghost_type, ghost) in enumerate(self.ghosts.items()):
-            movement_names = {
-                STRAIGHT_MOVEMENT: "Straight",
-                TURN_MOVEMENT: "Turn",
-                BACK_MOVEMENT: "Back"
-            }
-            movement_type = ghost.get('movement_type', STRAIGHT_MOVEMENT)
-            move_str = movement_names.get(movement_type, "Unknown")
+        movement_names = {
+            STRAIGHT_MOVEMENT: "Straight",
+            TURN_MOVEMENT: "Turn",
+            BACK_MOVEMENT: "Back"
+        }
+        for i, (ghost_type, ghost) in enumerate(world.ghosts.items()):
+            move_str = movement_names.get(ghost.movement_type, "Unknown")
             
             # Màu văn bản giống màu ma
-            ghost_color = ghost['color']
+            ghost_color = self.ghosts[ghost_type]['color']
             
             # Thông tin ma
-            ghost_text = self.small_font.render(
-                f"{ghost_type}: {move_str} {ghost.get('update_interval', 0):.2f}s" + 
-                (f" (Haunted: {ghost.get('haunted_steps_remaining', 0)})" if ghost.get('is_haunted', False) else ""), 
-                True, ghost_color
+            ghost_text = self.text_cache.render(
+                self.small_font,
+                f"{ghost_type}: {move_str} {ghost.update_interval:.2f}s" + 
+                (f" (Haunted: {ghost.haunted_steps_remaining})" if ghost.is_haunted else ""), 
+                ghost_color
             )
             self.screen.blit(ghost_text, (10 + i * 150, ghost_info_y))
+            
+            # Số trạng thái mở rộng và thời gian trung bình của các lần tìm đường gần đây
+            search = self.search_counters.snapshot().get(ghost_type) if self.search_counters else None
+            if search:
+                search_text = self.text_cache.render(
+                    self.small_font,
+                    f"{search['expanded']:.0f} exp, {search['mean_us'] / 1000:.1f} ms",
+                    ghost_color
+                )
+                self.screen.blit(search_text, (10 + i * 150, ghost_info_y + 16))
         
         # Hiển thị màn hình game over
-        if self.game_over:
-            self.draw_game_over()
-        
-        # Cập nhật màn hình
-        pygame.display.flip()
+        if world.game_over:
+            self.draw_game_over(world)
+        
+        # Cập nhật màn hình: toàn bộ khi cần, còn lại chỉ các vùng đã thay đổi
+        flip_start = time.perf_counter()
+        if full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(dirty_rects)
+        if self.telemetry:
+            self.telemetry.record('frame_draw', flip_start - draw_start)
+            self.telemetry.record('frame_flip', time.perf_counter() - flip_start)
     
-    def draw_game_over(self):
+    def draw_game_over(self, world):
         """Vẽ màn hình game over"""
-        # Tạo surface bán trong suốt che phủ toàn màn hình
-        overlay = pygame.Surface((self.window_width, self.window_height), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # RGBA với alpha 180 (bán trong suốt)
-        self.screen.blit(overlay, (0, 0))
-        
-        # Tạo font lớn cho thông báo
-        large_font = pygame.font.SysFont('Arial', 48, bold=True)
+        # Surface bán trong suốt che phủ toàn màn hình, tạo một lần
+        if self.game_over_overlay is None:
+            self.game_over_overlay = pygame.Surface((self.window_width, self.window_height), pygame.SRCALPHA)
+            self.game_over_overlay.fill((0, 0, 0, 180))  # RGBA với alpha 180 (bán trong suốt)
+        self.screen.blit(self.game_over_overlay, (0, 0))
         
         # Hiển thị thông báo game over hoặc victory
-        if self.win:
-            text = large_font.render("YOU WIN!", True, (0, 255, 0))
+        if world.win:
+            text = self.text_cache.render(self.large_font, "YOU WIN!", (0, 255, 0))
         else:
-            text = large_font.render("GAME OVER", True, (255, 0, 0))
+            text = self.text_cache.render(self.large_font, "GAME OVER", (255, 0, 0))
         
         # Vị trí văn bản ở giữa màn hình
         text_rect = text.get_rect(center=(self.window_width/2, self.window_height/2 - 40))
         self.screen.blit(text, text_rect)
         
         # Hiển thị điểm số và số điểm đã thu thập
-        score_font = pygame.font.SysFont('Arial', 36)
-        score_text = score_font.render(f"Score: {self.score} | Points: {len(self.collected_points)}/{len(self.points)}", True, (255, 255, 255))
+        score_text = self.text_cache.render(self.score_font, f"Score: {world.score} | Points: {world.dots_eaten}/{self.grid.dot_count}", (255, 255, 255))
         score_rect = score_text.get_rect(center=(self.window_width/2, self.window_height/2 + 20))
         self.screen.blit(score_text, score_rect)
         
         # Hướng dẫn để chơi lại
-        restart_font = pygame.font.SysFont('Arial', 24)
-        restart_text = restart_font.render("Press SPACE to play again or ESC to quit", True, (255, 255, 255))
+        restart_text = self.text_cache.render(self.restart_font, "Press SPACE to play again or ESC to quit", (255, 255, 255))
         restart_rect = restart_text.get_rect(center=(self.window_width/2, self.window_height/2 + 70))
         self.screen.blit(restart_text, restart_rect)
     
     def run(self):
         """Chạy vòng lặp chính của game"""
-        # Bắt đầu thread cho ma
-        self.start_ghost_threads()
+        # Bắt đầu bộ lập lịch cho ma
+        self.start_ghost_scheduler()
         
         # Vòng lặp chính
         running = True
         while running:
             # Bắt đầu tính thời gian frame
             frame_start = time.time()
+            frame_clock = time.perf_counter()
             
             # Xử lý các sự kiện
             for event in pygame.event.get():
@@ -685,8 +797,9 @@ class PacmanGame2D:
                     # Xử lý khi game over
                     if self.game_over:
                         if event.key == pygame.K_SPACE:
-                            # Khởi tạo lại game
-                            self.__init__()
+                            # Chơi lại: giữ bản đồ, đồ thị và hình ảnh, chỉ khởi tạo lại trạng thái
+                            self.reset()
+                            self.start_ghost_scheduler()
                         elif event.key == pygame.K_ESCAPE:
                             running = False
             
@@ -694,19 +807,26 @@ class PacmanGame2D:
             if not self.game_over:
                 keys = pygame.key.get_pressed()
                 
+                moved = False
                 if keys[pygame.K_UP] or keys[pygame.K_w]:
-                    self.move_player(UP)
+                    moved = self.move_player(UP)
                 elif keys[pygame.K_DOWN] or keys[pygame.K_s]:
-                    self.move_player(DOWN)
+                    moved = self.move_player(DOWN)
                 elif keys[pygame.K_LEFT] or keys[pygame.K_a]:
-                    self.move_player(LEFT)
+                    moved = self.move_player(LEFT)
                 elif keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-                    self.move_player(RIGHT)
+                    moved = self.move_player(RIGHT)
                 elif keys[pygame.K_q]:
                     self.game_over = True
                 
                 # Kiểm tra va chạm
+                collision_start = time.perf_counter()
                 self.check_collisions()
+                if self.telemetry:
+                    if moved:
+                        self.telemetry.input_received(frame_clock)
+                    self.telemetry.record('frame_input', collision_start - frame_clock)
+                    self.telemetry.record('frame_collision', time.perf_counter() - collision_start)
             
             # Cập nhật FPS
             self.frame_count += 1
@@ -718,6 +838,8 @@ class PacmanGame2D:
             
             # Vẽ game
             self.draw()
+            if self.telemetry:
+                self.telemetry.frame_presented(frame_clock)
             
             # Duy trì FPS ổn định
             frame_time = time.time() - frame_start
@@ -726,6 +848,14 @@ class PacmanGame2D:
             self.clock.tick(TARGET_FPS)
         
         # Đóng game
+        if self.ghost_scheduler:
+            self.ghost_scheduler.stop()
+        if self.planner_pool:
+            self.planner_pool.close()
+        if self.search_trace:
+            self.search_trace.close()
+        if self.telemetry:
+            self.telemetry.export()
         pygame.quit()
         sys.exit()
 
@@ -782,7 +912,59 @@ def load_map(cls, file_path):
         print(f"Error loading map from {file_path}: {e}")
         return None
     
-# Khởi chạy game nếu chạy trực tiếp
+def benchmark_draw(map_file=MAP_DIR, scale=4, frames=300):
+    """Đo thời gian draw() mỗi frame trên bản đồ phóng to, người chơi đi ngẫu nhiên"""
+    import tempfile
+    base_map = Map.load_map(map_file)
+    if not base_map:
+        return
+    game_map = base_map.scaled(scale) if scale > 1 else base_map
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(''.join(row) for row in game_map.layout))
+        scaled_file = f.name
+    try:
+        game = PacmanGame2D(map_dir=scaled_file)
+        # Một con ma bị ám để đo cả hiệu ứng nhấp nháy
+        ghost_type, ghost = next(iter(game.ghosts.items()))
+        ghost['is_haunted'] = True
+        game.world.publish_ghost(ghost_type, ghost)
+        rng = random.Random(0)
+        direction = RIGHT
+        draw_times = []
+        for _ in range(frames):
+            # Bỏ qua thời gian chờ để người chơi đi mỗi frame
+            game.last_move_time = 0
+            if not game.move_player(direction):
+                direction = rng.choice(DIRECTIONS)
+            start_time = time.perf_counter()
+            game.draw()
+            draw_times.append(time.perf_counter() - start_time)
+        draw_times.sort()
+        print(f"Map {map_file} x{scale} ({game_map.width}x{game_map.height} cells), {frames} frames: "
+              f"draw p50 {draw_times[len(draw_times) // 2] * 1000:.2f} ms, "
+              f"p95 {draw_times[int(len(draw_times) * 0.95)] * 1000:.2f} ms, "
+              f"mean {sum(draw_times) / len(draw_times) * 1000:.2f} ms, "
+              f"text cache hits {game.text_cache.hits}/{game.text_cache.hits + game.text_cache.misses}")
+        
+        # Chơi lại: khởi tạo lại toàn bộ so với reset() giữ lại tài nguyên
+        start_time = time.perf_counter()
+        PacmanGame2D(map_dir=scaled_file).draw()
+        cold_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        game.reset()
+        game.draw()
+        reset_time = time.perf_counter() - start_time
+        print(f"Restart to first frame: new game {cold_time * 1000:.1f} ms, reset() {reset_time * 1000:.1f} ms")
+        pygame.quit()
+    finally:
+        os.unlink(scaled_file)
+
+# Khởi chạy game nếu chạy trực tiếp; "-bench [map] [scale] [frames]" đo thời gian vẽ
 if __name__ == "__main__":
-    game = PacmanGame2D()
-    game.run()
+    if len(sys.argv) > 1 and sys.argv[1] == '-bench':
+        benchmark_draw(sys.argv[2] if len(sys.argv) > 2 else MAP_DIR,
+                       int(sys.argv[3]) if len(sys.argv) > 3 else 4,
+                       int(sys.argv[4]) if len(sys.argv) > 4 else 300)
+    else:
+        game = PacmanGame2D()
+        game.run()
@@ -0,0 +1,187 @@
+from specification import *
+from game_map import Map
+from compact_graph import CompactMapGraph, CompactGraphView
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import sys
+import tempfile
+import time
+import types
+
+"""
+PlannerPool: ghost path queries answered by worker processes
+
+The CSR buffers of a CompactMapGraph are copied once into one
+multiprocessing.shared_memory block. Each worker attaches to it when it
+starts and wraps the buffers in a SharedCompactGraph, so queries only carry
+(algorithm, start, target, blocked cells) and the graph is never pickled.
+Searches then run outside the game process and its GIL: the ghost scheduler
+waits on a future while the render loop keeps drawing.
+
+After every move a ghost prefetches its next query; at its next tick the
+result is used if the player is still within REPLAN_RADIUS of the target it
+was planned for, otherwise a fresh query is sent. Algorithms that are not
+plain functions (D* Lite keeps state between calls) run in the game
+process as before.
+"""
+
+# CSR buffers copied to shared memory: (attribute, typecode)
+SHARED_BUFFERS = [('offsets', 'l'), ('targets', 'l'), ('weights', 'B'),
+                  ('walkable', 'B'), ('haunted_mask', 'B')]
+
+
+class SharedCompactGraph(CompactMapGraph):
+    """CompactMapGraph whose CSR buffers are views on a shared memory block"""
+
+    def __init__(self, game_map, layout):
+        self.layout = layout            # (block name, [(attribute, typecode, offset, count)], num_states)
+        super().__init__(game_map)
+
+    def _create_weighted_graph(self):
+        name, buffers, num_states = self.layout
+        # Workers share the game process' resource tracker; the game unlinks the block
+        self.shared_memory = shared_memory.SharedMemory(name=name)
+        for attribute, typecode, offset, count in buffers:
+            size = count * array(typecode).itemsize
+            setattr(self, attribute, self.shared_memory.buf[offset:offset + size].cast(typecode))
+
+        self.width = self.map.width
+        self.num_cells = self.map.width * self.map.height
+        self.num_state_ids = self.num_cells * 4
+        self.num_states = num_states
+        self.blocked = bytearray(self.num_cells)     # Temporary obstacles stay per process
+        return CompactGraphView(self)
+
+
+def share_graph(graph):
+    """Copy the CSR buffers of a CompactMapGraph into a new shared memory block, returns (block, layout)"""
+    buffers, offset = [], 0
+    for attribute, typecode in SHARED_BUFFERS:
+        offset = (offset + 7) & ~7      # 8 byte alignment for the integer buffers
+        data = getattr(graph, attribute)
+        buffers.append((attribute, typecode, offset, len(data)))
+        offset += len(data) * array(typecode).itemsize
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for attribute, _, start, count in buffers:
+        raw = memoryview(getattr(graph, attribute)).cast('B')
+        block.buf[start:start + raw.nbytes] = raw
+    return block, (block.name, buffers, graph.num_states)
+
+
+_worker_graph = None
+
+
+def _attach(game_map, layout):
+    global _worker_graph
+    _worker_graph = SharedCompactGraph(game_map, layout)
+
+
+def _plan(algorithm, start_pos, target_pos, blocked):
+    graph = _worker_graph
+    for pos in blocked:
+        graph.add_temporary_obstacle(pos)
+    try:
+        return algorithm(graph, start_pos, target_pos)
+    finally:
+        graph.remove_all_temporary_obstacles()
+
+
+class PlannerPool:
+    def __init__(self, game_map, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        compact_graph = CompactMapGraph(game_map)
+        self.shared_memory, layout = share_graph(compact_graph)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_attach, initargs=(game_map, layout))
+        self.pending = {}               # ghost_type -> (future, start_pos, target_pos)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def can_run(algorithm):
+        """Only stateless module level functions are sent to the workers"""
+        return isinstance(algorithm, types.FunctionType) and algorithm.__name__ != '<lambda>'
+
+    def prefetch(self, ghost_type, algorithm, start_pos, target_pos):
+        """Start the query a ghost will most likely need at its next tick"""
+        if self.can_run(algorithm):
+            future = self.executor.submit(_plan, algorithm, start_pos, target_pos, ())
+            self.pending[ghost_type] = (future, start_pos, target_pos)
+
+    def plan(self, ghost_type, algorithm, graph, start_pos, target_pos):
+        """(path, cost, next_pos, planned_target): the search result, computed in a worker,
+        and the target it was planned for, which differs from target_pos for a prefetched result"""
+        if not self.can_run(algorithm):
+            return (*algorithm(graph, start_pos, target_pos), target_pos)
+
+        blocked = tuple(getattr(graph, 'temporary_obstacles', None) or ())
+        pending = self.pending.pop(ghost_type, None)
+        if pending and not blocked:
+            future, planned_start, planned_target = pending
+            strayed = abs(target_pos[0] - planned_target[0]) + abs(target_pos[1] - planned_target[1])
+            if planned_start == start_pos and strayed <= REPLAN_RADIUS:
+                self.hits += 1
+                return (*future.result(), planned_target)
+            future.cancel()
+        self.misses += 1
+        return (*self.executor.submit(_plan, algorithm, start_pos, target_pos, blocked).result(), target_pos)
+
+    def cancel_pending(self):
+        """Drop the prefetched queries, e.g. when a new game starts"""
+        for future, _, _ in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+# Benchmark: frame time percentiles of the 2D game, ghost searches in threads against the pool
+if __name__ == "__main__":
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from pacman import PacmanGame2D
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    scale = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    base_map = Map.load_map(map_file)
+
+    if base_map:
+        game_map = base_map.scaled(scale) if scale > 1 else base_map
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(''.join(row) for row in game_map.layout))
+            scaled_file = f.name
+
+        def percentile(values, q):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        try:
+            print(f"Map {map_file} x{scale}, {seconds:.0f}s per run, player standing still")
+            for use_process_pool in (False, True):
+                game = PacmanGame2D(map_dir=scaled_file, use_process_pool=use_process_pool)
+                # Ghosts start far away on the scaled map, keep the game running
+                game.start_ghost_scheduler()
+                frame_times = []
+                end = time.time() + seconds
+                while time.time() < end and not game.game_over:
+                    frame_start = time.perf_counter()
+                    game.draw()
+                    frame_times.append(time.perf_counter() - frame_start)
+                game.game_over = True
+                game.ghost_scheduler.stop()
+                searches = game.replan_stats.snapshot()['searches']
+                label = f"process pool ({game.planner_pool.workers} workers)" if use_process_pool else "scheduler thread"
+                print(f"  {label:<28}: {len(frame_times):6d} frames, frame time p50 "
+                      f"{percentile(frame_times, 0.5):6.2f} ms, p95 {percentile(frame_times, 0.95):6.2f} ms, "
+                      f"p99 {percentile(frame_times, 0.99):6.2f} ms, max {max(frame_times) * 1000:7.2f} ms, "
+                      f"{searches} searches")
+                if game.planner_pool:
+                    print(f"  {'':<28}  prefetched results used {game.planner_pool.hits}, "
+                          f"fresh queries {game.planner_pool.misses}")
+                    game.planner_pool.close()
+        finally:
+            os.unlink(scaled_file)
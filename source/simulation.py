@@ -0,0 +1,273 @@
+from specification import *
+from game_map import Map
+from map_implement import MapGraph
+from algorithm import GHOST_ALGORITHMS
+from ghost_route import ReplanStats, cached_next_step, store_route, advance_route
+import random
+import sys
+import time
+
+"""
+Headless deterministic simulation of the game rules
+
+No window, no terminal, no threads: the game advances by fixed steps of a
+virtual clock. Every step the player action is applied (subject to the
+PLAYER_MOVEMENT cooldown), then each ghost makes every move that falls due
+before the end of the step, in order of due time. A ghost that moved at time
+t with interval i moves again at exactly t + i, the STRAIGHT / TURN / BACK *
+BASE_GHOST_UPDATE_INTERVAL rules of the games. The same inputs always give
+the same game, and it runs as fast as the searches allow.
+
+Time is counted in whole steps: the clock, the due times and the cooldown are
+integer ticks, so summing float timesteps cannot drift a move into the next
+step. Intervals are rounded to whole steps, which is exact for the stock
+constants (0.05 s steps, 0.2 s cooldown, 0.5 / 2.5 / 5 s ghost intervals).
+"""
+
+
+def to_ticks(seconds, timestep):
+    """Whole number of timesteps in a duration"""
+    return round(seconds / timestep)
+
+
+class VirtualClock:
+    """Time source of a simulation, an integer tick count that only moves when advanced"""
+
+    def __init__(self, timestep=SIMULATION_TIMESTEP):
+        self.timestep = timestep
+        self.ticks = 0
+
+    @property
+    def now(self):
+        return self.ticks * self.timestep
+
+    def time(self):
+        return self.now
+
+    def advance(self):
+        """Move one timestep forward, returns the new tick"""
+        self.ticks += 1
+        return self.ticks
+
+
+def ghost_move_interval(ghost, new_direction, next_pos, haunted_points):
+    """Update the ghost's haunted state for a move and return its next interval
+
+    Same rules as the ghost threads: standing on a haunted point or still under
+    its effect moves at STRAIGHT speed, otherwise the move type sets the speed.
+    """
+    if next_pos in haunted_points:
+        ghost['is_haunted'] = True
+        ghost['haunted_steps_remaining'] = HAUNTED_POINT_INDEX
+        return STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+    if ghost['haunted_steps_remaining'] > 0:
+        ghost['haunted_steps_remaining'] -= 1
+        return STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+
+    ghost['is_haunted'] = False
+    previous = ghost['previous_direction']
+    if previous == new_direction:
+        ghost['movement_type'] = STRAIGHT_MOVEMENT
+        return STRAIGHT * BASE_GHOST_UPDATE_INTERVAL
+    if previous[0] == -new_direction[0] and previous[1] == -new_direction[1]:
+        ghost['movement_type'] = BACK_MOVEMENT
+        return BACK * BASE_GHOST_UPDATE_INTERVAL
+    ghost['movement_type'] = TURN_MOVEMENT
+    return TURN * BASE_GHOST_UPDATE_INTERVAL
+
+
+class Simulation:
+    def __init__(self, map_dir=MAP_DIR, game_map=None, graph=None, ghost_algorithms=None,
+                 timestep=SIMULATION_TIMESTEP):
+        """Renderer free game; pass graph (or game_map) to share one map between games"""
+        if graph is not None:
+            game_map = graph.map
+        elif game_map is None:
+            game_map = Map.load_map(map_dir)
+            if not game_map:
+                raise FileNotFoundError(map_dir)
+        self.game_map = game_map
+        self.graph = graph if graph is not None else MapGraph(game_map)
+        self.haunted_points = game_map.haunted_set
+        self.points = game_map.dot_positions
+        self.timestep = timestep
+        self.move_cooldown = to_ticks(PLAYER_MOVEMENT, timestep)
+
+        self.ghost_algorithms = dict(GHOST_ALGORITHMS)
+        if ghost_algorithms:
+            self.ghost_algorithms.update(ghost_algorithms)
+        self.reset()
+
+    def reset(self):
+        """Start a new game on the same map, graph and algorithms"""
+        self.clock = VirtualClock(self.timestep)
+        self.player_pos = self.game_map.player_pos
+        self.player_direction = RIGHT
+        self.last_move_tick = -self.move_cooldown   # The player may move right away
+        self.collected_points = set()
+        self.collected_haunted = set()
+        self.score = 0
+        self.moves = 0
+        self.steps = 0
+        self.game_over = False
+        self.win = False
+        self.replan_stats = ReplanStats()
+
+        self.ghosts = {}
+        for ghost_type, pos in self.game_map.ghost_positions.items():
+            if pos is None:
+                continue
+            self.ghosts[ghost_type] = {
+                'pos': pos,
+                'previous_direction': UP,
+                'path': None,
+                'movement_type': STRAIGHT_MOVEMENT,
+                'update_interval': STRAIGHT * BASE_GHOST_UPDATE_INTERVAL,
+                'next_move_tick': to_ticks(STRAIGHT * BASE_GHOST_UPDATE_INTERVAL, self.timestep),
+                'haunted_steps_remaining': 0,
+                'is_haunted': False,
+            }
+        return self
+
+    def _move_player(self, direction):
+        if self.clock.ticks - self.last_move_tick < self.move_cooldown:
+            return 0
+        new_pos = (self.player_pos[0] + direction[0], self.player_pos[1] + direction[1])
+        x, y = new_pos
+        if not (0 <= x < self.game_map.width and 0 <= y < self.game_map.height) or \
+                self.game_map.layout[y][x] == WALL:
+            return 0
+
+        self.last_move_tick = self.clock.ticks
+        self.player_pos = new_pos
+        self.player_direction = direction
+        self.moves += 1
+        reward = 0
+        if new_pos in self.points and new_pos not in self.collected_points:
+            self.collected_points.add(new_pos)
+            reward += 1
+        if new_pos in self.haunted_points and new_pos not in self.collected_haunted:
+            self.collected_haunted.add(new_pos)
+            reward += 10
+        if len(self.collected_points) == len(self.points):
+            self.win = True
+            self.game_over = True
+        return reward
+
+    def _move_ghost(self, ghost_type, ghost):
+        """One ghost update, same rules as the ghost threads"""
+        occupied = {other['pos'] for other_type, other in self.ghosts.items() if other_type != ghost_type}
+        next_pos = cached_next_step(self.graph, ghost, self.player_pos, occupied)
+        self.replan_stats.record(searched=next_pos is None)
+
+        attempt = 0
+        while attempt < 3 and next_pos is None:
+            path, _, candidate = self.ghost_algorithms[ghost_type](self.graph, ghost['pos'], self.player_pos)
+            if candidate and candidate not in occupied:
+                next_pos = candidate
+                store_route(ghost, path, self.player_pos)
+            else:
+                if candidate:
+                    self.graph.add_temporary_obstacle(candidate)
+                attempt += 1
+        if hasattr(self.graph, 'remove_all_temporary_obstacles'):
+            self.graph.remove_all_temporary_obstacles()
+
+        if next_pos and next_pos != ghost['pos']:
+            new_direction = (next_pos[0] - ghost['pos'][0], next_pos[1] - ghost['pos'][1])
+            ghost['update_interval'] = ghost_move_interval(ghost, new_direction, next_pos, self.haunted_points)
+            ghost['previous_direction'] = new_direction
+            ghost['pos'] = next_pos
+            advance_route(ghost, next_pos)
+        if ghost['pos'] == self.player_pos:
+            self.game_over = True
+
+    def step(self, player_action=None):
+        """Advance one timestep; player_action is a direction or None
+
+        Returns (reward, done): points scored during the step and whether the
+        game is over.
+        """
+        if self.game_over:
+            return 0, True
+        end = self.clock.advance()
+        self.steps += 1
+
+        reward = self._move_player(player_action) if player_action else 0
+        if any(ghost['pos'] == self.player_pos for ghost in self.ghosts.values()):
+            self.game_over = True
+
+        # Ghost moves due before the end of the step, earliest first
+        while not self.game_over:
+            ghost_type, ghost = min(self.ghosts.items(), key=lambda item: item[1]['next_move_tick'],
+                                    default=(None, None))
+            if ghost is None or ghost['next_move_tick'] > end:
+                break
+            due = ghost['next_move_tick']
+            self._move_ghost(ghost_type, ghost)
+            ghost['next_move_tick'] = due + to_ticks(ghost['update_interval'], self.timestep)
+
+        self.score += reward
+        return reward, self.game_over
+
+    def snapshot(self):
+        """Plain data view of the game state"""
+        return {
+            'time': self.clock.now,
+            'player': self.player_pos,
+            'ghosts': {ghost_type: ghost['pos'] for ghost_type, ghost in self.ghosts.items()},
+            'score': self.score,
+            'points_left': len(self.points) - len(self.collected_points),
+            'game_over': self.game_over,
+            'win': self.win,
+        }
+
+
+def random_policy(seed=0):
+    """Player that keeps its heading and picks a new one now and then"""
+    rng = random.Random(seed)
+    heading = [rng.choice(DIRECTIONS)]
+
+    def act(simulation):
+        if rng.random() < 0.1:
+            heading[0] = rng.choice(DIRECTIONS)
+        return heading[0]
+    return act
+
+
+# Benchmark: games and virtual seconds simulated per wall clock second
+if __name__ == "__main__":
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    max_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 60.0
+    game_map = Map.load_map(map_file)
+
+    if game_map:
+        simulation = Simulation(game_map=game_map)
+        wins = steps = 0
+        virtual_time = 0.0
+        results = []
+        start_time = time.perf_counter()
+        for seed in range(games):
+            simulation.reset()
+            policy = random_policy(seed)
+            while not simulation.game_over and simulation.clock.now < max_seconds:
+                simulation.step(policy(simulation))
+            wins += simulation.win
+            steps += simulation.steps
+            virtual_time += simulation.clock.now
+            results.append((simulation.score, simulation.clock.now))
+        elapsed = time.perf_counter() - start_time
+
+        # Same seeds, same games
+        simulation.reset()
+        policy = random_policy(0)
+        while not simulation.game_over and simulation.clock.now < max_seconds:
+            simulation.step(policy(simulation))
+        deterministic = (simulation.score, simulation.clock.now) == results[0]
+
+        print(f"Map {map_file}: {games} games of at most {max_seconds:.0f}s, timestep {simulation.timestep}s")
+        print(f"Wall time {elapsed:.2f}s: {games / elapsed:.1f} games/s, {steps / elapsed:.0f} steps/s, "
+              f"{virtual_time / elapsed:.0f}x real time")
+        print(f"Wins: {wins}, mean score {sum(score for score, _ in results) / games:.1f}, "
+              f"replay identical: {deterministic}")
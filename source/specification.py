@@ -50,6 +50,19 @@ TARGET_FPS = 300
 FRAME_TIME = 1.0 / TARGET_FPS
 GHOST_UPDATE_INTERVAL = 0.5
 BASE_GHOST_UPDATE_INTERVAL = 0.25
+LANDMARK_COUNT = 8  # Landmarks of the ALT heuristic
+ORACLE_MAX_CELLS = 2048  # Largest map (walkable cells) given a distance oracle; the table takes 8 * cells^2 bytes
+SIMULATION_TIMESTEP = 0.05  # Virtual seconds per step of the headless simulation
+TEXT_CACHE_SIZE = 64  # Rendered HUD strings kept by the 2D game
+HAUNTED_ALPHA_STEPS = 16  # Precomputed alpha levels of a blinking haunted ghost
+REPLAN_RADIUS = 2  # Steps the player may stray from a ghost's planned target before it replans
+SEARCH_TRACE_SAMPLE = 10  # Every n-th frontier pop of a traced search is written to the trace
+SEARCH_STATS_WINDOW = 50  # Recent searches of each ghost kept by its rolling search counters
+TELEMETRY_RING_SIZE = 4096  # Recent samples kept by every telemetry histogram
+TELEMETRY_EXPORT_INTERVAL = 5.0  # Seconds between two writes of the telemetry file
 
 # Map direction
 MAP_DIR = str(Path(__file__).parent.parent / "map" / "map.txt")
+
+# Cache directory for precomputed map tables
+CACHE_DIR = str(Path(__file__).parent.parent / "map" / ".cache")
@@ -0,0 +1,54 @@
+from specification import *
+from collections import OrderedDict
+import pygame
+
+"""
+Surface caches for the 2D game
+
+Rotating Pacman, fading haunted ghosts and rendering HUD strings each build a
+new Surface. These helpers build them ahead of time (one rotation per
+direction, a fixed ramp of alpha levels) or keep the last renders of each
+string in a bounded LRU cache, so a frame only blits existing surfaces.
+"""
+
+# Rotation angle of the sprites, which face RIGHT
+DIRECTION_ANGLES = {RIGHT: 0, UP: 90, LEFT: 180, DOWN: 270}
+
+
+def rotations(image):
+    """Image rotated towards every direction"""
+    return {direction: pygame.transform.rotate(image, angle) for direction, angle in DIRECTION_ANGLES.items()}
+
+
+def alpha_ramp(image, steps=HAUNTED_ALPHA_STEPS, low=128, high=255):
+    """Copies of image with alpha going from low to high in steps levels"""
+    ramp = []
+    for step in range(steps):
+        faded = image.copy()
+        faded.set_alpha(low + (high - low) * step // (steps - 1))
+        ramp.append(faded)
+    return ramp
+
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, color), least recently used evicted first"""
+
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
@@ -0,0 +1,268 @@
+from specification import *
+from array import array
+from bisect import bisect_left
+import os
+import sys
+import threading
+import time
+
+"""
+Telemetry: latency histograms of the game front-ends
+
+Every metric is a Histogram of durations in seconds: cumulative counts per
+fixed bucket (Prometheus style, for totals since the game started) plus a
+fixed-size ring buffer of the last samples, from which the tail percentiles
+are read. Recording is a few additions and one bisect, so the frame loops
+record every frame. Metrics recorded by the games:
+- frame_input, frame_collision, frame_draw, frame_flip, frame_total:
+  phases of one frame (frame_flip is pygame's flip/update, or the write and
+  flush of the text frame)
+- input_latency: from the frame that read a player move to the end of the
+  first frame that shows it
+- ghost_decision: one move_ghost call of the scheduler
+- game_lock_wait, planned_positions_lock_wait: time waited to acquire the lock
+The histograms are written as CSV or as a Prometheus text file.
+"""
+
+# Upper bounds of the histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """Bucket counts of every sample plus a ring buffer of the last samples"""
+
+    def __init__(self, size=TELEMETRY_RING_SIZE, bounds=LATENCY_BUCKETS):
+        self.lock = threading.Lock()
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)     # The last bucket counts samples above every bound
+        self.samples = array('d', bytes(8 * size))
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples[self.count % self.size] = seconds
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.buckets[bisect_left(self.bounds, seconds)] += 1
+
+    def recent(self):
+        """The samples still in the ring buffer, sorted"""
+        with self.lock:
+            return sorted(self.samples[:min(self.count, self.size)])
+
+    def summary(self):
+        """Count, mean and max of every sample, percentiles of the recent ones, in milliseconds"""
+        recent = self.recent()
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': self.max * 1000,
+        }
+
+
+class TimedLock:
+    """threading.Lock recording in a Histogram how long every acquire waited"""
+
+    def __init__(self, histogram):
+        self._lock = threading.Lock()
+        self.histogram = histogram
+
+    def acquire(self, blocking=True, timeout=-1):
+        start_time = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self.histogram.record(time.perf_counter() - start_time)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+class Telemetry:
+    def __init__(self, export_file=None, interval=TELEMETRY_EXPORT_INTERVAL, size=TELEMETRY_RING_SIZE):
+        self.export_file = export_file  # Rewritten every interval seconds and by export()
+        self.interval = interval
+        self.size = size
+        self.histograms = {}            # name -> Histogram, in creation order
+        self.lock = threading.Lock()
+        self.input_time = None          # Frame start of the oldest move not yet displayed
+        self.next_export = time.perf_counter() + interval
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram(self.size))
+        return histogram
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def lock_for(self, name):
+        """A lock recording its acquire waits as name_wait"""
+        return TimedLock(self.histogram(f"{name}_wait"))
+
+    def timed(self, name, function):
+        """function wrapped to record the duration of every call"""
+        histogram = self.histogram(name)
+
+        def timed_call(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start_time)
+        return timed_call
+
+    def input_received(self, frame_start):
+        """A player move read by the frame that started at frame_start (perf_counter)"""
+        if self.input_time is None:
+            self.input_time = frame_start
+
+    def frame_presented(self, frame_start):
+        """End of a frame on screen: records the frame time, the input latency, exports when due"""
+        now = time.perf_counter()
+        self.record('frame_total', now - frame_start)
+        if self.input_time is not None:
+            self.record('input_latency', now - self.input_time)
+            self.input_time = None
+        if self.export_file and now >= self.next_export:
+            self.next_export = now + self.interval
+            self.export()
+
+    def summary(self):
+        return {name: histogram.summary() for name, histogram in list(self.histograms.items())}
+
+    def write_csv(self, path):
+        with open(path, 'w') as f:
+            f.write("metric,count,mean_ms,p50_ms,p95_ms,p99_ms,max_ms\n")
+            for name, row in self.summary().items():
+                f.write(f"{name},{row['count']},{row['mean_ms']:.4f},{row['p50_ms']:.4f},"
+                        f"{row['p95_ms']:.4f},{row['p99_ms']:.4f},{row['max_ms']:.4f}\n")
+
+    def write_prometheus(self, path, prefix='pacman'):
+        """Text exposition format: one histogram per metric, recent percentiles as a summary"""
+        lines = []
+        for name, histogram in list(self.histograms.items()):
+            metric = f"{prefix}_{name}_seconds"
+            with histogram.lock:
+                buckets, count, total = list(histogram.buckets), histogram.count, histogram.total
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(histogram.bounds, buckets):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum {total}")
+            lines.append(f"{metric}_count {count}")
+
+            summary = histogram.summary()
+            lines.append(f"# TYPE {metric}_recent summary")
+            for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                lines.append(f'{metric}_recent{{quantile="{quantile}"}} {summary[key] / 1000}')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def export(self, path=None):
+        """Write the histograms to path (default export_file): CSV for .csv files, Prometheus text otherwise"""
+        path = path or self.export_file
+        if not path:
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if path.endswith('.csv'):
+            self.write_csv(tmp_path)
+        else:
+            self.write_prometheus(tmp_path)
+        os.replace(tmp_path, path)
+
+    def print_summary(self):
+        print(f"{'Metric':<28} {'count':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, row in self.summary().items():
+            print(f"{name:<28} {row['count']:>8} {row['mean_ms']:>9.3f} {row['p50_ms']:>9.3f} "
+                  f"{row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}")
+
+
+# Benchmark: cost of recording, then the telemetry of a headless 2D game (map, scale, seconds)
+if __name__ == "__main__":
+    import random
+    import tempfile
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from game_map import Map
+    from pacman import PacmanGame2D
+
+    samples = 100000
+    histogram = Histogram()
+    start_time = time.perf_counter()
+    for i in range(samples):
+        histogram.record(i * 1e-7)
+    record_ns = (time.perf_counter() - start_time) / samples * 1e9
+    plain, timed = threading.Lock(), TimedLock(Histogram())
+    start_time = time.perf_counter()
+    for _ in range(samples):
+        with plain:
+            pass
+    plain_ns = (time.perf_counter() - start_time) / samples * 1e9
+    start_time = time.perf_counter()
+    for _ in range(samples):
+        with timed:
+            pass
+    timed_ns = (time.perf_counter() - start_time) / samples * 1e9
+    print(f"Histogram.record {record_ns:.0f} ns, uncontended lock {plain_ns:.0f} ns plain, {timed_ns:.0f} ns timed")
+
+    map_file = sys.argv[1] if len(sys.argv) > 1 else MAP_DIR
+    scale = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    base_map = Map.load_map(map_file)
+    if base_map:
+        game_map = base_map.scaled(scale) if scale > 1 else base_map
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(''.join(row) for row in game_map.layout))
+            scaled_file = f.name
+        try:
+            # The player walks at random; each frame records the phases PacmanGame2D.run records
+            telemetry = Telemetry()
+            game = PacmanGame2D(map_dir=scaled_file, telemetry=telemetry)
+            game.start_ghost_scheduler()
+            rng = random.Random(0)
+            direction = RIGHT
+            end = time.time() + seconds
+            while time.time() < end and not game.game_over:
+                frame_start = time.perf_counter()
+                game.last_move_time = 0
+                if game.move_player(direction):
+                    telemetry.input_received(frame_start)
+                else:
+                    direction = rng.choice(DIRECTIONS)
+                input_end = time.perf_counter()
+                telemetry.record('frame_input', input_end - frame_start)
+                game.check_collisions()
+                telemetry.record('frame_collision', time.perf_counter() - input_end)
+                game.draw()
+                telemetry.frame_presented(frame_start)
+            game.game_over = True
+            game.ghost_scheduler.stop()
+            print(f"Map {map_file} x{scale}, {seconds:.0f}s")
+            telemetry.print_summary()
+        finally:
+            os.unlink(scaled_file)
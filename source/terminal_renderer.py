@@ -0,0 +1,181 @@
+from specification import *
+from colorama import Fore, Back, Style
+import re
+import time
+
+"""
+TerminalRenderer: frame buffer renderer for the text mode
+
+The renderer keeps the glyph last sent for every map cell in a preallocated
+buffer and a copy of the map rows it last saw. Each frame only looks at the
+cells of rows that changed and at the cells under the actors (an occupancy
+index of player and ghosts, instead of scanning the ghosts per cell). Changed
+cells are coalesced into runs along a row, so one cursor move is emitted per
+run. Text lines of the side panel are resent only when their content
+changes, padded to the visible width of the text they replace. The frame is returned as one string: one write, one flush.
+"""
+
+HIDE_CURSOR = "\033[?25l"
+PLAYER_GLYPH = Back.GREEN + 'P' + Style.RESET_ALL
+HAUNTED_GLYPH = Back.MAGENTA + 'H' + Style.RESET_ALL
+WALL_GLYPH = Back.WHITE + Fore.BLACK + '#' + Style.RESET_ALL
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+
+def visible_width(text):
+    """Terminal columns of a text, escape sequences excluded"""
+    return len(ANSI_ESCAPE.sub('', text))
+
+
+class TerminalRenderer:
+    def __init__(self, width, height, haunted_points, top=5, left=1):
+        self.width = width
+        self.height = height
+        self.top = top                  # Terminal row of map row 0
+        self.left = left                # Terminal column of map column 0
+        self.haunted = {y * width + x for x, y in haunted_points}
+        self.glyphs = [None] * (width * height)     # Glyph on screen per cell
+        self.rows = [None] * height                 # Map rows as last rendered
+        self.actor_cells = []                       # Cells under actors last frame
+        self.lines = {}                             # (row, col) -> (text on screen, visible width)
+
+        # Frame statistics
+        self.frames = 0
+        self.total_bytes = 0
+        self.total_time = 0.0
+        self.last_bytes = 0
+        self.last_time = 0.0
+
+    def base_glyph(self, index, cell):
+        if index in self.haunted:
+            return HAUNTED_GLYPH
+        if cell == WALL:
+            return WALL_GLYPH
+        return cell
+
+    def render(self, map_display, actors, lines=()):
+        """Frame string for the map and the panel lines
+
+        actors maps a position to its glyph, lines holds (row, col, text).
+        """
+        start_time = time.perf_counter()
+        width = self.width
+        candidates = set(self.actor_cells)
+
+        # Cells of the map rows that changed since the last frame
+        for y, row in enumerate(map_display):
+            previous = self.rows[y]
+            if previous == row:
+                continue
+            base = y * width
+            if previous is None:
+                candidates.update(range(base, base + width))
+            else:
+                candidates.update(base + x for x in range(width) if row[x] != previous[x])
+            self.rows[y] = list(row)
+
+        # Occupancy index of the actors
+        occupancy = {pos[1] * width + pos[0]: glyph for pos, glyph in actors.items()}
+        candidates.update(occupancy)
+        self.actor_cells = list(occupancy)
+
+        changed = []
+        glyphs = self.glyphs
+        for index in candidates:
+            glyph = occupancy.get(index)
+            if glyph is None:
+                glyph = self.base_glyph(index, self.rows[index // width][index % width])
+            if glyphs[index] != glyph:
+                glyphs[index] = glyph
+                changed.append(index)
+
+        # One cursor move per run of adjacent changed cells in a row
+        parts = [HIDE_CURSOR]
+        changed.sort()
+        run_end = None
+        for index in changed:
+            if index != run_end or index % width == 0:
+                parts.append(f"\033[{index // width + self.top};{index % width + self.left}H")
+            parts.append(glyphs[index])
+            run_end = index + 1
+
+        for row, col, text in lines:
+            previous, previous_width = self.lines.get((row, col), (None, 0))
+            if previous != text:
+                # Pad with spaces to clear a wider previous text
+                text_width = visible_width(text)
+                padding = ' ' * max(0, previous_width - text_width)
+                parts.append(f"\033[{row};{col}H{text}{padding}")
+                self.lines[(row, col)] = (text, text_width)
+
+        frame = ''.join(parts)
+        self.frames += 1
+        self.last_bytes = len(frame.encode())
+        self.last_time = time.perf_counter() - start_time
+        self.total_bytes += self.last_bytes
+        self.total_time += self.last_time
+        return frame
+
+    def stats(self):
+        """Frames rendered, mean bytes and milliseconds per frame"""
+        frames = self.frames
+        return {
+            'frames': frames,
+            'bytes_per_frame': self.total_bytes / frames if frames else 0.0,
+            'ms_per_frame': self.total_time / frames * 1000 if frames else 0.0,
+            'last_bytes': self.last_bytes,
+            'last_ms': self.last_time * 1000,
+        }
+
+
+# Benchmark: bytes, writes and time per frame of GamePlay.display_map
+if __name__ == "__main__":
+    import io
+    import random
+    import sys
+    from game_play import GamePlay
+
+    class CountingStream(io.TextIOBase):
+        """stdout replacement counting what the renderer sends"""
+
+        def __init__(self):
+            self.bytes = self.writes = self.flushes = 0
+
+        def write(self, text):
+            self.bytes += len(text.encode())
+            self.writes += 1
+            return len(text)
+
+        def flush(self):
+            self.flushes += 1
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    game = GamePlay()
+    rng = random.Random(0)
+    direction = RIGHT
+    stream = CountingStream()
+    display_times = []
+    stdout, sys.stdout = sys.stdout, stream
+    try:
+        for frame in range(frames):
+            # The player walks every frame and one ghost steps every third frame
+            game.last_move_time = 0
+            if not game.move_player(direction):
+                direction = rng.choice(DIRECTIONS)
+            if frame % 3 == 0:
+                ghost_type, ghost = list(game.ghosts.items())[frame % len(game.ghosts)]
+                x, y = ghost['pos']
+                ghost['pos'] = next((x + dx, y + dy) for dx, dy in DIRECTIONS if game.is_valid_move((x + dx, y + dy)))
+                game.world.publish_ghost(ghost_type, ghost)
+            start_time = time.perf_counter()
+            game.display_map()
+            display_times.append(time.perf_counter() - start_time)
+    finally:
+        sys.stdout = stdout
+
+    stats = game.renderer.stats()
+    display_times.sort()
+    print(f"{frames} frames: {stream.bytes / frames:.0f} bytes, {stream.writes / frames:.1f} writes, "
+          f"{stream.flushes / frames:.1f} flushes per frame")
+    print(f"display_map p50 {display_times[frames // 2] * 1000:.3f} ms, "
+          f"renderer {stats['ms_per_frame']:.3f} ms per frame")
@@ -11,17 +11,18 @@ def test_algorithm(name, algorithm, graph, start_pos, target_pos):
     """Test pathfinding algorithm and display results"""
     print(f"Testing {name}...")
     
-    # Bắt đầu theo dõi bộ nhớ
-    tracemalloc.start()
-    start_time = time.time()
+    # Đo thời gian khi tracemalloc chưa chạy để không làm sai lệch kết quả
+    start_time = time.perf_counter()
     
     # Updated to handle the third return value (next position)
     path, cost, next_pos = algorithm(graph, start_pos, target_pos)
     
     # Lấy thời gian thực thi
-    execution_time = time.time() - start_time
+    execution_time = time.perf_counter() - start_time
     
-    # Lấy thông tin sử dụng bộ nhớ
+    # Chạy lại một lần riêng để đo bộ nhớ
+    tracemalloc.start()
+    algorithm(graph, start_pos, target_pos)
     current, peak = tracemalloc.get_traced_memory()
     tracemalloc.stop()  # Dừng theo dõi bộ nhớ
     
@@ -43,7 +44,7 @@ def test_algorithm(name, algorithm, graph, start_pos, target_pos):
         print(f"  Memory usage: current={current_mb:.4f} MB, peak={peak_mb:.4f} MB")
         path_list = []
     
-    return path, cost, path_list, next_pos, current_mb, peak_mb
+    return path, cost, path_list, next_pos, execution_time, current_mb, peak_mb
 
 def visualize_path_on_map(game_map, path, ghost_pos, player_pos, next_pos=None):
     """
@@ -140,21 +141,15 @@ def test_interface():
         if hasattr(graph, 'haunted_points'):
             graph.haunted_points = set(test_map.haunted_points)
             
-        path, cost, path_list, next_pos, current_mb, peak_mb = test_algorithm(name, algo, graph, ghost_pos, player_pos)
+        path, cost, path_list, next_pos, exec_time, current_mb, peak_mb = test_algorithm(name, algo, graph, ghost_pos, player_pos)
         
         # Hiển thị kết quả trong bảng - chuyển next_pos thành chuỗi để tránh lỗi định dạng
         next_pos_str = str(next_pos) if next_pos else 'N/A'
         unique_pos = len(set(path_list)) if path_list else 0
         steps = len(path) if path else 'N/A'
         
-        # Tính thời gian thực thi (giả định là bạn đã tính trong test_algorithm)
-        if hasattr(algo, 'execution_time'):
-            exec_time = algo.execution_time
-        else:
-            exec_time = 'N/A'
-            
         # Format chuỗi hiển thị
-        print(f"{name:<8} {steps:<8} {cost if cost else 'N/A':<12} {next_pos_str:<15} {unique_pos:<12} {exec_time:<12} {peak_mb:.4f}")
+        print(f"{name:<8} {steps:<8} {cost if cost else 'N/A':<12} {next_pos_str:<15} {unique_pos:<12} {exec_time:<12.6f} {peak_mb:.4f}")
         
         # Visualize path on map with colors
         if path:
@@ -0,0 +1,189 @@
+from specification import *
+from collections import namedtuple
+import sys
+import threading
+import time
+
+"""
+World snapshots: lock-free reads of the shared game state
+
+The state the input loop, the ghost scheduler and the renderer share
+(player, score, remaining dots, ghost positions and speeds, end of the game)
+is an immutable WorldSnapshot. A writer builds the next snapshot from the
+published one and swaps it in with a single reference assignment, which is
+atomic in CPython: at any time there is the published snapshot the readers
+hold and the next one being built. Readers (draw, display_map, the collision
+check, ghost planning) take world.snapshot once and see one consistent state
+for the whole frame or decision without taking any lock.
+
+The two writers, the input loop (player moves) and the scheduler thread
+(ghost moves, one publish per ghost tick), go through World.update, whose
+lock only covers building and publishing the next snapshot. The per-ghost
+planning state (cached path, previous direction) stays in the ghost dicts,
+which only the scheduler thread touches.
+"""
+
+GhostState = namedtuple('GhostState', ['pos', 'movement_type', 'update_interval',
+                                       'is_haunted', 'haunted_steps_remaining'])
+
+# dots_left is a bitboard of the GridLayer cells; occupancy maps the cell of every ghost to its type
+WorldSnapshot = namedtuple('WorldSnapshot', ['tick', 'player_pos', 'player_direction', 'score', 'moves',
+                                             'dots_left', 'dots_eaten', 'collected_haunted', 'ghosts',
+                                             'occupancy', 'game_over', 'win'])
+
+
+def ghost_state(ghost):
+    """Published part of a ghost dict"""
+    return GhostState(ghost['pos'], ghost['movement_type'], ghost['update_interval'],
+                      ghost['is_haunted'], ghost['haunted_steps_remaining'])
+
+
+def initial_snapshot(grid, player_pos, ghosts):
+    """Snapshot of a new game on a GridLayer, ghosts being the ghost dicts of the game"""
+    return WorldSnapshot(
+        tick=0,
+        player_pos=player_pos,
+        player_direction=None,
+        score=0,
+        moves=0,
+        dots_left=grid.dots,
+        dots_eaten=0,
+        collected_haunted=frozenset(),
+        ghosts={ghost_type: ghost_state(ghost) for ghost_type, ghost in ghosts.items()},
+        occupancy={grid.cell(ghost['pos']): ghost_type for ghost_type, ghost in ghosts.items()},
+        game_over=False,
+        win=False)
+
+
+class World:
+    def __init__(self, grid, snapshot, lock=None):
+        self.grid = grid                # GridLayer giving the cell index of a position
+        self.snapshot = snapshot        # Published snapshot, never mutated
+        self.lock = lock or threading.Lock()
+
+    def update(self, change):
+        """Publish the snapshot with the fields change(snapshot) returns; None if it returns None"""
+        with self.lock:
+            current = self.snapshot
+            fields = change(current)
+            if fields is None:
+                return None
+            self.snapshot = current._replace(tick=current.tick + 1, **fields)
+            return self.snapshot
+
+    def set(self, **fields):
+        return self.update(lambda snapshot: fields)
+
+    def publish_ghost(self, ghost_type, ghost):
+        """Publish the state of a ghost after its tick; it catches the player if they share a cell"""
+        state = ghost_state(ghost)
+        cell = self.grid.cell(state.pos)
+
+        def place(snapshot):
+            ghosts = dict(snapshot.ghosts)
+            ghosts[ghost_type] = state
+            occupancy = snapshot.occupancy
+            if occupancy.get(cell) != ghost_type:
+                occupancy = {other: other_type for other, other_type in occupancy.items() if other_type != ghost_type}
+                occupancy[cell] = ghost_type
+            return {'ghosts': ghosts, 'occupancy': occupancy,
+                    'game_over': snapshot.game_over or state.pos == snapshot.player_pos}
+        return self.update(place)
+
+
+class WorldView:
+    """Game attributes read from the published snapshot, for the game classes"""
+
+    @property
+    def player_pos(self):
+        return self.world.snapshot.player_pos
+
+    @property
+    def player_direction(self):
+        return self.world.snapshot.player_direction
+
+    @property
+    def score(self):
+        return self.world.snapshot.score
+
+    @property
+    def moves(self):
+        return self.world.snapshot.moves
+
+    @property
+    def dots_eaten(self):
+        return self.world.snapshot.dots_eaten
+
+    @property
+    def win(self):
+        return self.world.snapshot.win
+
+    @property
+    def game_over(self):
+        return self.world.snapshot.game_over
+
+    @game_over.setter
+    def game_over(self, value):
+        self.world.set(game_over=value)
+
+
+# Benchmark: reads per second of one locked reader against snapshot reads, while a writer updates
+if __name__ == "__main__":
+    from game_map import Map
+    from occupancy_grid import GridLayer
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    ghosts = {ghost: {'pos': (ghost, 0), 'movement_type': STRAIGHT_MOVEMENT, 'update_interval': 0.5,
+                      'is_haunted': False, 'haunted_steps_remaining': 0} for ghost in range(4)}
+
+    def run(read, write):
+        stop = threading.Event()
+        reads = writes = 0
+
+        def writer():
+            nonlocal writes
+            while not stop.is_set():
+                write(writes)
+                writes += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            read()
+            reads += 1
+        stop.set()
+        thread.join()
+        return reads / seconds, writes / seconds
+
+    # Shared mutable state behind one lock, as the games did
+    lock = threading.Lock()
+    state = {'player_pos': (0, 0), 'ghosts': ghosts}
+
+    def locked_read():
+        with lock:
+            player_pos = state['player_pos']
+            positions = [ghost['pos'] for ghost in state['ghosts'].values()]
+        return player_pos, positions
+
+    def locked_write(step):
+        with lock:
+            state['player_pos'] = (step % 50, 0)
+            state['ghosts'][step % 4]['pos'] = (step % 50, 1)
+
+    grid = GridLayer(Map(['.' * 50] * 2))
+    world = World(grid, initial_snapshot(grid, (0, 0), ghosts))
+
+    def snapshot_read():
+        snapshot = world.snapshot
+        return snapshot.player_pos, [ghost.pos for ghost in snapshot.ghosts.values()]
+
+    def snapshot_write(step):
+        ghost = dict(ghosts[step % 4], pos=(step % 50, 1))
+        world.set(player_pos=(step % 50, 0))
+        world.publish_ghost(step % 4, ghost)
+
+    for label, read, write in (("game_lock", locked_read, locked_write),
+                               ("snapshots", snapshot_read, snapshot_write)):
+        reads, writes = run(read, write)
+        print(f"{label:<10}: {reads:10.0f} reads/s, {writes:9.0f} writes/s")